@@ -0,0 +1,40 @@
+"""Hot-path schema: device_connections.hits + index relay_client_id
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-15
+
+Additive only (ADD COLUMN IF NOT EXISTS / CREATE INDEX IF NOT EXISTS): safe to
+run against an existing database, reversible by dropping the added objects.
+Mirrors db/schema.sql for installs migrated by `alembic upgrade head`
+(job-migrate Helm).
+
+- device_connections.hits : occurrences fusionnées par le writer groupé
+  (connection_log) ; INSERT, COPY et le SUM(hits) du dashboard en dépendent.
+- idx_relay_client_id : auth relay par relay_client_id, révoqués compris
+  (uq_relay_active_id, partiel, ne couvre que les actifs).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE device_connections "
+        "ADD COLUMN IF NOT EXISTS hits INTEGER NOT NULL DEFAULT 1"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_relay_client_id "
+        "ON relay_clients(relay_client_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_relay_client_id")
+    op.execute("ALTER TABLE device_connections DROP COLUMN IF EXISTS hits")
@@ -5,6 +5,7 @@ Architecture: routes delegate to services, never run SQL directly.
 """
 
 import csv
+import functools
 import io
 import json
 import logging
@@ -79,6 +80,7 @@ from .services import (
 from .services import runtime_config as rcfg_svc
 
 logger = logging.getLogger("dm-admin-router")
+_auth_logger = logging.getLogger("dm-admin-auth")
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/admin/templates")
@@ -146,11 +148,62 @@ def _strip_dm_metadata_from_zip(data: bytes) -> bytes:
 
 # ─── OIDC callback / logout ──────────────────────────────────────────────
 
+@functools.lru_cache(maxsize=4)
+def _admin_jwks_client(jwks_uri: str):
+    """PyJWKClient partagé par jwks_uri : JWK Set gardé 5 min et clés PyJWK
+    (objets cryptography déjà construits) réutilisées d'un login à l'autre.
+    Un kid inconnu (rotation) déclenche un refetch côté PyJWKClient."""
+    from jwt import PyJWKClient as _PyJWKClient
+
+    return _PyJWKClient(jwks_uri, cache_keys=True)
+
+
+def _exchange_code_and_verify(
+    token_url: str, token_params: dict, jwks_uri: str, expected_iss: str | None,
+) -> tuple[dict, dict]:
+    """Échange du code + vérification de l'ID Token — (tokens, claims).
+
+    Entièrement bloquant (urlopen, fetch JWKS, vérif RSA) : appelé via
+    run_in_threadpool pour ne pas geler la boucle pendant un login admin.
+    """
+    import urllib.request
+
+    data = urllib.parse.urlencode(token_params).encode()
+    req = urllib.request.Request(
+        token_url, data=data,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=10) as r:
+            tokens = json.loads(r.read())
+    except Exception:
+        raise HTTPException(502, "Token exchange failed") from None
+
+    # Verify the ID Token as a JWS (VULN-017 / PA-080 R26/R28): JWKS signature
+    # plus issuer/audience/expiry. HTTPS alone does NOT guarantee the integrity
+    # of the token issued by Keycloak.
+    import jwt as _jwt
+    id_token = tokens.get("id_token") or ""
+    try:
+        signing_key = _admin_jwks_client(jwks_uri).get_signing_key_from_jwt(id_token)
+        claims = _jwt.decode(
+            id_token,
+            signing_key.key,
+            algorithms=["RS256"],
+            audience=CLIENT_ID,
+            issuer=expected_iss,
+            options={"verify_aud": True, "verify_iss": bool(expected_iss)},
+        )
+    except Exception as exc:
+        _auth_logger.warning("admin ID token verification failed: %s", exc)
+        raise HTTPException(401, "ID token verification failed") from exc
+    return tokens, claims
+
+
 @router.get("/callback")
 async def oidc_callback(request: Request, code: str = "", state: str = ""):
     """Exchange authorization code for tokens, verify group, set session cookie."""
-    import urllib.parse
-    import urllib.request
+    from starlette.concurrency import run_in_threadpool
 
     stored_state = request.cookies.get("dm_oidc_state")
     if state != stored_state:
@@ -174,48 +227,19 @@ async def oidc_callback(request: Request, code: str = "", state: str = ""):
     code_verifier = request.cookies.get("dm_pkce_verifier")
     if code_verifier:
         token_params["code_verifier"] = code_verifier
-    data = urllib.parse.urlencode(token_params).encode()
-    req = urllib.request.Request(
-        token_url, data=data,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=10) as r:
-            tokens = json.loads(r.read())
-    except Exception:
-        raise HTTPException(502, "Token exchange failed") from None
 
-    # Verify the ID Token as a JWS (VULN-017 / PA-080 R26/R28): JWKS signature
-    # plus issuer/audience/expiry. HTTPS alone does NOT guarantee the integrity
-    # of the token issued by Keycloak.
-    import logging as _logging
-
-    import jwt as _jwt
-    from jwt import PyJWKClient as _PyJWKClient
-    id_token = tokens.get("id_token") or ""
     # JWKS récupéré server-side → URL interne (wireguard-proxy) si dispo, sinon le
     # jwks_uri public est injoignable depuis le pod (Connection reset by peer).
     jwks_uri = cfg.get("_internal_jwks_uri") or cfg.get("jwks_uri")
-    expected_iss = cfg.get("issuer")
     if not jwks_uri:
         raise HTTPException(502, "OIDC discovery missing jwks_uri")
-    try:
-        signing_key = _PyJWKClient(jwks_uri).get_signing_key_from_jwt(id_token)
-        claims = _jwt.decode(
-            id_token,
-            signing_key.key,
-            algorithms=["RS256"],
-            audience=CLIENT_ID,
-            issuer=expected_iss,
-            options={"verify_aud": True, "verify_iss": bool(expected_iss)},
-        )
-    except Exception as exc:
-        _logging.getLogger("dm-admin-auth").warning("admin ID token verification failed: %s", exc)
-        raise HTTPException(401, "ID token verification failed") from exc
+    tokens, claims = await run_in_threadpool(
+        _exchange_code_and_verify, token_url, token_params, jwks_uri, cfg.get("issuer"),
+    )
 
     if not _has_admin_group(claims):
         # Ne pas révéler le nom du groupe requis au client (issue #1) — détail en log serveur.
-        _logging.getLogger("dm-admin-auth").warning(
+        _auth_logger.warning(
             "acces admin refuse pour %s : groupe %r manquant",
             claims.get("email") or claims.get("sub"), REQUIRED_GROUP,
         )
@@ -302,7 +326,7 @@ def _compute_dashboard_metrics(cur) -> dict:
     """)
     active_devices = cur.fetchone()[0]
     cur.execute("""
-        SELECT COUNT(*) FROM device_connections
+        SELECT COALESCE(SUM(hits), 0) FROM device_connections
         WHERE created_at > NOW() - INTERVAL '7 days'
     """)
     interactions_7d = cur.fetchone()[0]
@@ -1647,25 +1671,16 @@ async def api_upload_chunk(request: Request,
     # comme nom de répertoire (cf. app/pathsafe.py).
     upload_id = safe_segment(upload_id, "upload_id")
     upload_dir = safe_path_join(_CHUNK_DIR, upload_id)
-    os.makedirs(upload_dir, exist_ok=True)
 
-    # Save chunk
     data = await chunk.read()
     if len(data) > _CHUNK_MAX_SIZE:
         raise HTTPException(413, f"Chunk too large ({len(data)} > {_CHUNK_MAX_SIZE})")
 
-    chunk_path = os.path.join(upload_dir, f"{chunk_index:06d}")
-    with open(chunk_path, "wb") as f:
-        f.write(data)
+    from starlette.concurrency import run_in_threadpool
 
-    # Save metadata
-    meta_path = os.path.join(upload_dir, "_meta.json")
+    # Disque (chunk + méta + listdir) hors event-loop.
     meta = {"filename": filename, "total_chunks": total_chunks, "upload_id": upload_id}
-    with open(meta_path, "w") as f:
-        json.dump(meta, f)
-
-    # Check if all chunks received
-    received = len([f for f in os.listdir(upload_dir) if f != "_meta.json"])
+    received = await run_in_threadpool(_save_upload_chunk, upload_dir, chunk_index, data, meta)
     complete = received >= total_chunks
 
     return JSONResponse({
@@ -1677,6 +1692,16 @@ async def api_upload_chunk(request: Request,
     })
 
 
+def _save_upload_chunk(upload_dir: str, chunk_index: int, data: bytes, meta: dict) -> int:
+    """Écrit un chunk et les métadonnées ; renvoie le nombre de chunks reçus."""
+    os.makedirs(upload_dir, exist_ok=True)
+    with open(os.path.join(upload_dir, f"{chunk_index:06d}"), "wb") as f:
+        f.write(data)
+    with open(os.path.join(upload_dir, "_meta.json"), "w") as f:
+        json.dump(meta, f)
+    return len([f for f in os.listdir(upload_dir) if f != "_meta.json"])
+
+
 def _reassemble_upload(upload_id: str) -> tuple[bytes, str] | None:
     """Reassemble chunks into a single file. Returns (data, filename) or None."""
     upload_dir = os.path.join(_CHUNK_DIR, upload_id)
@@ -3408,17 +3433,25 @@ def _files_token_check(request: Request) -> bool:
     )
 
 
+def _write_upload_file(full: str, data: bytes) -> None:
+    """Partie bloquante de PUT /api/files/upload — exécutée en threadpool."""
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "wb") as f:
+        f.write(data)
+
+
 @router.put("/api/files/upload/{path:path}")
 async def admin_files_upload(request: Request, path: str, file: UploadFile = File(...)):
     """Store a binary file on the admin persistent volume (token-secured)."""
     if not _files_token_check(request):
         raise HTTPException(403, "Invalid token")
+    from starlette.concurrency import run_in_threadpool
+
     base = os.getenv("DM_LOCAL_BINARIES_DIR", "/data/content/binaries")
     full = safe_path_join(base, path)
-    os.makedirs(os.path.dirname(full), exist_ok=True)
     data = await file.read()
-    with open(full, "wb") as f:
-        f.write(data)
+    # Binaire jusqu'à ~100 Mo : écriture disque hors event-loop.
+    await run_in_threadpool(_write_upload_file, full, data)
     return JSONResponse({"ok": True, "path": path, "size": len(data)})
 
 
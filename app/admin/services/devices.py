@@ -2,6 +2,17 @@
 
 from __future__ import annotations
 
+import uuid
+
+
+def _as_uuid(value: str) -> str | None:
+    """Canonical UUID text, or None: lets the WHERE compare the uuid column
+    directly (index-usable) instead of casting every row to text."""
+    try:
+        return str(uuid.UUID(str(value)))
+    except (TypeError, ValueError):
+        return None
+
 
 def list_devices(cur, *, owner: str = None, platform: str = None,
                  health: str = None, enrollment: str = None,
@@ -92,6 +103,9 @@ def health_summary(cur) -> dict:
 
 def get_device_detail(cur, client_uuid: str) -> dict | None:
     """Get device detail info."""
+    client_uuid = _as_uuid(client_uuid)
+    if client_uuid is None:
+        return None
     cur.execute("""
         SELECT
             dc.client_uuid::text,
@@ -105,8 +119,8 @@ def get_device_detail(cur, client_uuid: str) -> dict | None:
         FROM device_connections dc
         LEFT JOIN provisioning p ON p.client_uuid = dc.client_uuid
             AND p.status IN ('PENDING', 'ENROLLED')
-        WHERE dc.client_uuid::text = %s
-        ORDER BY dc.created_at DESC
+        WHERE dc.client_uuid = %s::uuid
+        ORDER BY dc.connected_at DESC
         LIMIT 1
     """, (client_uuid,))
     row = cur.fetchone()
@@ -117,13 +131,21 @@ def get_device_detail(cur, client_uuid: str) -> dict | None:
 
 
 def get_device_connections(cur, client_uuid: str, limit: int = 20) -> list[dict]:
-    """Get recent connections for a device."""
+    """Get recent connections for a device.
+
+    Ordered by connected_at (captured at submit time by the connection log
+    writer) so idx_dc_client (client_uuid, connected_at DESC) serves the
+    LIMIT without sorting the device's history.
+    """
+    client_uuid = _as_uuid(client_uuid)
+    if client_uuid is None:
+        return []
     cur.execute("""
         SELECT created_at, source_ip::text, user_agent, action,
                encryption_key_fingerprint
         FROM device_connections
-        WHERE client_uuid::text = %s
-        ORDER BY created_at DESC
+        WHERE client_uuid = %s::uuid
+        ORDER BY connected_at DESC
         LIMIT %s
     """, (client_uuid, limit))
     cols = [d[0] for d in cur.description]
@@ -0,0 +1,54 @@
+"""JSON rapide (orjson) pour les chemins chauds, avec repli stdlib.
+
+orjson sérialise 3 à 10× plus vite que ``json`` et produit directement des
+``bytes`` (pas de ``str`` intermédiaire). Optionnel : absent, tout retombe sur
+la stdlib avec une sortie équivalente.
+
+- ``loads`` accepte ``bytes`` tels quels (corps de requête) ;
+- ``FastJSONResponse`` remplace ``JSONResponse`` : mêmes en-têtes, même forme
+  compacte UTF-8. Les valeurs qu'orjson refuse et que la stdlib accepte
+  (entier > 64 bits…) repassent par la stdlib, donc aucun 500 nouveau.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ModuleNotFoundError:  # pragma: no cover - dépendance optionnelle
+    orjson = None  # type: ignore[assignment]
+
+# Clés non-str (int…) converties comme le fait json.dumps.
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def loads(data: bytes | str) -> Any:
+    """json.loads ; ``bytes`` décodés par orjson sans passer par ``str``."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Sérialisation compacte UTF-8 (séparateurs ``,`` / ``:`` sans espace).
+
+    orjson lève ``TypeError`` sur ce qu'il refuse (clé non-str, entier > 64
+    bits…) : à l'appelant de choisir son repli.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(content, option=_ORJSON_OPTS)
+            except TypeError:
+                pass
+        return super().render(content)
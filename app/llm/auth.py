@@ -23,13 +23,14 @@ from dataclasses import dataclass
 import anyio.to_thread
 from fastapi import Request
 
+from ..services.db import db_url_bootstrap
 from .errors import LlmProxyError
 from .tokens import verify_llm_token
 
 logger = logging.getLogger("device-management.llm")
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class LlmIdentity:
     client_uuid: str
     email: str
@@ -57,7 +58,6 @@ def _client_uuid_is_active(client_uuid: str) -> bool:
     if not client_uuid:
         return False
     psycopg2 = _get_psycopg2()
-    from ..services.db import db_url_bootstrap  # noqa: PLC0415
     db_url = db_url_bootstrap()
     if psycopg2 is not None and db_url:
         conn = psycopg2.connect(db_url)
@@ -14,13 +14,15 @@ LLM_BACKENDS (JSON) :
 
 ``token_env`` est une INDIRECTION (nom de variable d'environnement) : aucun
 secret ne transite dans le JSON ni dans l'UI admin. Le registry est reconstruit
-à chaque requête (lecture cfg() triviale) → ajout/bascule/failover de backend
+à chaque requête (lecture cfg() triviale, JSON décodé une fois par valeur
+brute) → ajout/bascule/failover de backend
 sans redéploiement ni changement de code. Principe directeur (ADR) : le DM
 évolue, le backend LLM reste un fournisseur d'inférence banalisé.
 """
 from __future__ import annotations
 
 import fnmatch
+import functools
 import json
 import logging
 import os
@@ -46,6 +48,27 @@ def public_llm_proxy_url() -> str:
     return f"{public_base}/llm/v1" if public_base else ""
 
 
+@functools.lru_cache(maxsize=8)
+def _parse_backends_spec(
+    raw: str,
+) -> tuple[tuple[tuple[str, str, str], ...], dict[str, str]] | None:
+    """LLM_BACKENDS décodé une fois par valeur brute : ((nom, base_url,
+    token_env), …) + model_map. None si JSON invalide (loggé une seule fois).
+    Les tokens ne sont PAS lus ici : os.getenv reste fait à chaque requête."""
+    try:
+        spec = json.loads(raw)
+        entries = []
+        for name, entry in (spec.get("backends") or {}).items():
+            entry_url = str(entry.get("base_url") or "").strip().rstrip("/")
+            if entry_url:
+                entries.append((str(name), entry_url, str(entry.get("token_env") or "").strip()))
+        model_map = {str(k): str(v) for k, v in (spec.get("model_map") or {}).items()}
+    except Exception:
+        logger.warning("LLM_BACKENDS: JSON invalide, registry par défaut seul")
+        return None
+    return tuple(entries), model_map
+
+
 @dataclass(frozen=True)
 class Backend:
     name: str
@@ -77,19 +100,14 @@ class BackendRegistry:
 
         model_map: dict[str, str] = {}
         raw = str(runtime_config.cfg("LLM_BACKENDS", "") or "").strip()
-        if raw:
-            try:
-                spec = json.loads(raw)
-                for name, entry in (spec.get("backends") or {}).items():
-                    entry_url = str(entry.get("base_url") or "").strip().rstrip("/")
-                    if not entry_url:
-                        continue
-                    token_env = str(entry.get("token_env") or "").strip()
-                    entry_token = os.getenv(token_env, "") if token_env else ""
-                    backends[str(name)] = Backend(str(name), entry_url, entry_token)
-                model_map = {str(k): str(v) for k, v in (spec.get("model_map") or {}).items()}
-            except Exception:
-                logger.warning("LLM_BACKENDS: JSON invalide, registry par défaut seul")
+        parsed = _parse_backends_spec(raw) if raw else None
+        if parsed is not None:
+            entries, cached_map = parsed
+            environ = os.environ
+            for name, entry_url, token_env in entries:
+                entry_token = environ.get(token_env, "") if token_env else ""
+                backends[name] = Backend(name, entry_url, entry_token)
+            model_map = dict(cached_map)
 
         return cls(backends, model_map)
 
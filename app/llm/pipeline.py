@@ -26,7 +26,7 @@ from fastapi.responses import JSONResponse
 from .auth import LlmIdentity
 
 
-@dataclass
+@dataclass(slots=True)
 class LlmRequestContext:
     identity: LlmIdentity
     trace_id: str
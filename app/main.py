@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import base64
+import contextlib
+import functools
 import hashlib
 import hmac
+import http.client
 import json
 import logging
 import os
@@ -13,7 +17,10 @@ import sys
 import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
 from datetime import UTC, datetime
+from email.utils import format_datetime
 from typing import Any
 from urllib import error as urllib_error
 from urllib import request as urllib_request
@@ -23,24 +30,30 @@ import boto3
 import httpx
 import uvicorn
 from botocore.client import Config
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from starlette.concurrency import run_in_threadpool
 
 try:
     import psycopg2  # type: ignore
     import psycopg2.pool  # type: ignore
+    from psycopg2.extras import RealDictCursor, execute_values  # type: ignore
 except ModuleNotFoundError:  # pragma: no cover
     psycopg2 = None  # type: ignore
+    RealDictCursor = None  # type: ignore
+    execute_values = None  # type: ignore
 
 try:
     import jwt  # type: ignore
     from jwt import PyJWKClient  # type: ignore
-    from jwt.exceptions import PyJWTError  # type: ignore
+    from jwt.exceptions import PyJWKClientConnectionError, PyJWKClientError, PyJWTError  # type: ignore
 except ModuleNotFoundError:  # pragma: no cover
     jwt = None  # type: ignore
     PyJWKClient = None  # type: ignore
+    PyJWKClientConnectionError = Exception  # type: ignore
+    PyJWKClientError = Exception  # type: ignore
     PyJWTError = Exception  # type: ignore
 
 if os.getenv("RELOAD", "").lower() == "true" and "DATABASE_URL" not in os.environ:
@@ -49,8 +62,12 @@ if os.getenv("RELOAD", "").lower() == "true" and "DATABASE_URL" not in os.enviro
 from . import observability as _observability
 from . import resilience as _resilience
 from . import runtime_config
+from .fastjson import FastJSONResponse
+from .fastjson import dumps as _fast_json_dumps
+from .fastjson import loads as _fast_json_loads
 from .postgres_queue import PostgresQueue, QueueJob
 from .s3 import s3_client
+from .services import connection_log as _connection_log
 from .services import health as _health
 from .services.crypto import (
     SECRET_CONFIG_KEYS as _SVC_SECRET_CONFIG_KEYS,
@@ -64,6 +81,9 @@ from .services.crypto import (
 from .services.crypto import (
     hash_relay_secret as _svc_hash_relay_secret,
 )
+from .services.db import (
+    _reset_url_cache as _svc_reset_url_cache,
+)
 from .services.db import (
     _with_db,
 )
@@ -73,6 +93,9 @@ from .services.db import (
 from .services.db import (
     apply_schema as _svc_apply_schema,
 )
+from .services.db import (
+    close_pool as _svc_close_pool,
+)
 from .services.db import (
     db_url as _svc_db_url,
 )
@@ -88,6 +111,12 @@ from .services.db import (
 from .services.db import (
     ensure_dev_role as _svc_ensure_dev_role,
 )
+from .services.db import (
+    execute_prepared as _svc_execute_prepared,
+)
+from .services.db import (
+    get_pool as _svc_get_pool,
+)
 from .services.db import (
     pooled_conn as _svc_pooled_conn,
 )
@@ -102,7 +131,7 @@ from .settings import settings
 # Best-effort (DB down / schema absent → ENV baseline; the sync loop retries).
 runtime_config.bootstrap_env_overrides()
 
-app = FastAPI(title="Device Management API", version="0.1.0")
+app = FastAPI(title="Device Management API", version="0.1.0", default_response_class=FastJSONResponse)
 logger = logging.getLogger("device-management")
 
 
@@ -191,19 +220,6 @@ if _RUNTIME_MODE in ("api", "all"):
         return RedirectResponse(f"{prefix}/catalog/", status_code=307)
 
 
-# ---- Trace-id (corrélation de bout en bout) ---------------------------------
-# Chaque requête porte un X-Request-Id (repris du client s'il en fournit un,
-# généré sinon), exposé dans request.state.trace_id (audit LLM, logs) et rendu
-# au client — prêt pour OpenTelemetry.
-@app.middleware("http")
-async def trace_id_middleware(request: Request, call_next):
-    trace_id = (request.headers.get("x-request-id") or "").strip()[:64] or uuid.uuid4().hex
-    request.state.trace_id = trace_id
-    response = await call_next(request)
-    response.headers.setdefault("X-Request-Id", trace_id)
-    return response
-
-
 # ---- Mode runtime "llm" : deployment dédié au proxy LLM ----------------------
 # Les routes du monolithe sont déclarées au niveau module ; en mode llm on ne
 # sert QUE le proxy + sondes + métriques (pod stateless scalable, sans PVC).
@@ -215,7 +231,7 @@ if _RUNTIME_MODE == "llm":
     @app.middleware("http")
     async def _llm_mode_allowlist(request: Request, call_next):
         if not request.url.path.startswith(_LLM_MODE_ALLOWED_PREFIXES):
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=404,
                 content={"ok": False, "error": "Not available in llm runtime mode."},
             )
@@ -253,7 +269,7 @@ async def security_headers(request: Request, call_next):
     if runtime_config.should_gate_requests() and not any(
         path.startswith(p) for p in _CONFIG_GATE_EXEMPT_PREFIXES
     ):
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=503,
             headers={"Retry-After": "3"},
             content={"status": "starting", "detail": "config not loaded", "retry": True},
@@ -306,8 +322,8 @@ def validate_security_config(app_env: str | None = None) -> list[str]:
         problems.append("ADMIN_SESSION_SECRET is the insecure default 'changeme-dev-only'")
     if str(settings.relay_secret_pepper or "") == _DEFAULT_RELAY_SECRET_PEPPER:
         problems.append("DM_RELAY_SECRET_PEPPER is the insecure default 'change-me-relay-pepper'")
-    origins_raw = str(settings.allow_origins or "").strip()
-    if origins_raw == "*" or not origins_raw:
+    origins = settings.allow_origins_list
+    if origins == ("*",) or not origins:
         problems.append("CORS allow_origins is '*' — set DM_ALLOW_ORIGINS to an explicit allowlist")
     if _dev_autologin_enabled():
         problems.append("DM_DEV_AUTOLOGIN is enabled outside development")
@@ -329,16 +345,91 @@ if _security_problems:
 
 # ---- CORS — no wildcard fallback in prod-like environments (the boot gate above
 # already blocks that case; here we just avoid silently widening origins).
-_cors_origins = [o.strip() for o in (settings.allow_origins or "").split(",") if o.strip()]
+_cors_origins = list(settings.allow_origins_list)
 if not _cors_origins:
     _cors_origins = ["*"] if (settings.app_env or "").strip().lower() not in _PROD_LIKE_ENVS else []
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=_cors_origins,
-    allow_credentials=False,
-    allow_methods=["GET", "POST", "PUT", "OPTIONS"],
-    allow_headers=["*"],
-)
+_CORS_ALLOW_METHODS = ("GET", "POST", "PUT", "OPTIONS")
+
+
+class _WildcardCorsMiddleware:
+    """CORS `*` sans credentials, en ASGI pur : mêmes réponses que
+    CORSMiddleware(allow_origins=["*"], allow_headers=["*"]) mais en-têtes
+    précalculés et aucun parsing/enrobage de `send` pour les requêtes sans
+    `Origin` (sondes, /binaries, clients natifs — l'essentiel du trafic)."""
+
+    _ALLOW_ORIGIN = (b"access-control-allow-origin", b"*")
+
+    def __init__(self, app, allow_methods=_CORS_ALLOW_METHODS):
+        self.app = app
+        self._methods = frozenset(allow_methods)
+        self._preflight_headers = {
+            "Vary": "Origin, Access-Control-Request-Method, Access-Control-Request-Headers, "
+                    "Access-Control-Request-Private-Network",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": ", ".join(allow_methods),
+            "Access-Control-Max-Age": "600",
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        has_origin = False
+        req_method = req_headers = None
+        private_network = False
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                has_origin = True
+            elif name == b"access-control-request-method":
+                req_method = value.decode("latin-1")
+            elif name == b"access-control-request-headers":
+                req_headers = value.decode("latin-1")
+            elif name == b"access-control-request-private-network":
+                private_network = True
+        if not has_origin:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and req_method is not None:
+            headers = dict(self._preflight_headers)
+            if req_headers is not None:
+                headers["Access-Control-Allow-Headers"] = req_headers
+            failures = []
+            if req_method not in self._methods:
+                failures.append("method")
+            if private_network:
+                failures.append("private-network")
+            if failures:
+                response = PlainTextResponse(
+                    "Disallowed CORS " + ", ".join(failures), status_code=400, headers=headers
+                )
+            else:
+                response = PlainTextResponse("OK", status_code=200, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                headers = [h for h in message.get("headers", ()) if h[0] != b"access-control-allow-origin"]
+                headers.append(self._ALLOW_ORIGIN)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+# `*` seul (cas dev/local par défaut) → variante allégée ; liste vide → aucun
+# origin autorisé, inutile d'installer quoi que ce soit.
+if _cors_origins == ["*"]:
+    app.add_middleware(_WildcardCorsMiddleware, allow_methods=_CORS_ALLOW_METHODS)
+elif _cors_origins:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=_cors_origins,
+        allow_credentials=False,
+        allow_methods=list(_CORS_ALLOW_METHODS),
+        allow_headers=["*"],
+    )
 
 # ---- Request-ID de corrélation (toujours actif — ne dépend d'aucun service
 # externe) : honore X-Request-ID si fourni, sinon en génère un ; le renvoie en
@@ -355,6 +446,10 @@ _observability.configure_otel(app)
 MAX_BODY_BYTES = settings.max_body_size_mb * 1024 * 1024
 TELEMETRY_MAX_BODY_BYTES = settings.telemetry_max_body_size_mb * 1024 * 1024
 S3_BINARIES_PREFIX = settings.s3_prefix_binaries
+# Préfixe de clé normalisé une fois (chemin chaud GET /binaries/...).
+_S3_BINARIES_KEY_PREFIX = S3_BINARIES_PREFIX.rstrip("/") + "/"
+# Idem pour les payloads enroll (DM_S3_PREFIX_ENROLL, non rechargeable à chaud).
+_S3_ENROLL_KEY_PREFIX = settings.s3_prefix_enroll.rstrip("/") + "/"
 _telemetry_signing_warning_emitted = False
 _queue_manager: PostgresQueue | None = None
 _queue_lock = threading.Lock()
@@ -362,22 +457,50 @@ _embedded_worker_thread: threading.Thread | None = None
 _embedded_worker_stop: threading.Event | None = None
 
 
+# Répertoires déjà créés : makedirs (stat + mkdir) une fois par process et non
+# à chaque enroll / sonde. Retiré du set si une écriture y échoue (répertoire
+# supprimé sous nos pieds) pour être recréé au prochain appel.
+_READY_DIRS: set[str] = set()
+
+
 def _ensure_dir(path: str) -> None:
+    if path in _READY_DIRS:
+        return
     os.makedirs(path, exist_ok=True)
+    _READY_DIRS.add(path)
+
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    """Équivalent de ``open(path, "wb").write(data)`` en appels système bruts :
+    open/write/close, sans l'objet fichier bufferisé (ni ses fstat, isatty et
+    lseek d'ouverture) ni copie dans son tampon — le corps est écrit tel quel."""
+    fd = os.open(path, _WRITE_FLAGS, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 
 # Supports env-var placeholders in config templates.
 # Preferred syntax: ${{VARNAME}}
 # Backward-compatible syntax: ${VARNAME}
-_TEMPLATE_VAR_RE = re.compile(r"\$\{\{([A-Z0-9_]+)\}\}|\$\{([A-Z0-9_]+)\}")
+_TEMPLATE_VAR_RE = re.compile(r"\$\{\{([A-Z0-9_]+)\}\}|\$\{([A-Z0-9_]+)\}", re.ASCII)
+
+
+# app/ is a package folder; repo root is one level above (resolved once).
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
 
 def _repo_root() -> str:
-    # app/ is a package folder; repo root is one level above
-    return os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    return _REPO_ROOT
 
 
-SCHEMA_SQL_PATH = os.path.join(_repo_root(), "db", "schema.sql")
+SCHEMA_SQL_PATH = os.path.join(_REPO_ROOT, "db", "schema.sql")
 
 
 # ── DB helpers (delegated to app/services/db.py) ──
@@ -386,24 +509,72 @@ _db_url_bootstrap = _svc_db_url_bootstrap
 _pooled_conn = _svc_pooled_conn
 
 
+@contextlib.contextmanager
+def _db_conn():
+    """Connexion autocommit empruntée au pool (créé paresseusement au premier
+    appel), sinon connexion directe — pool indisponible ou épuisé.
+    RuntimeError si aucune base n'est configurée : jamais de no-op silencieux."""
+    try:
+        pool_ctx = _pooled_conn()
+    except Exception:
+        logger.warning("DB pool unavailable; using a direct connection", exc_info=True)
+        pool_ctx = None
+    if pool_ctx is not None:
+        with pool_ctx as conn:
+            yield conn
+        return
+    db_url = _db_url_bootstrap() or _db_url()
+    if psycopg2 is None or not db_url:
+        raise RuntimeError("Database is not configured.")
+    conn = psycopg2.connect(db_url)
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
 # ---- Config response cache (P2 performance) ----
-_CONFIG_CACHE: dict[str, tuple[float, dict]] = {}
+# Valeur = (corps JSON déjà encodé, ETag) : un HIT ne ré-sérialise rien.
+_CONFIG_CACHE: dict[str, tuple[float, bytes, str]] = {}
 _CONFIG_CACHE_LOCK = threading.Lock()
 _CONFIG_CACHE_TTL = 60.0  # seconds
 
 
-def _config_cache_get(key: str) -> dict | None:
-    """Return cached config response or None if expired/missing."""
-    with _CONFIG_CACHE_LOCK:
-        entry = _CONFIG_CACHE.get(key)
-        if entry and entry[0] > time.time():
-            return entry[1]
+def _config_cache_get(key: str) -> tuple[bytes, str] | None:
+    """Return the cached (encoded body, ETag) or None if expired/missing.
+
+    Lecture sans verrou : dict.get est atomique sous le GIL et les entrées sont
+    des tuples immuables remplacés d'un bloc — le verrou ne sert qu'aux écritures.
+    """
+    entry = _CONFIG_CACHE.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1], entry[2]
     return None
 
 
-def _config_cache_set(key: str, value: dict) -> None:
+def _config_cache_set(key: str, body: bytes, etag: str) -> None:
     with _CONFIG_CACHE_LOCK:
-        _CONFIG_CACHE[key] = (time.time() + _CONFIG_CACHE_TTL, value)
+        _CONFIG_CACHE[key] = (time.monotonic() + _CONFIG_CACHE_TTL, body, etag)
+
+
+def _config_etag(response: FastJSONResponse, response_body: dict) -> str:
+    """ETag faible (W/) du rendu /config, calculé sur la structure sans
+    meta.generated_at : un rendu identique au précédent garde le même ETag,
+    mais les octets diffèrent (horodatage), d'où un validateur faible."""
+    meta = {k: v for k, v in response_body["meta"].items() if k != "generated_at"}
+    digest = hashlib.blake2b(response.render({**response_body, "meta": meta}), digest_size=16)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _if_none_match(header: str | None, etag: str) -> bool:
+    """If-None-Match : liste d'ETags ou "*", comparaison faible (préfixe W/ ignoré)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
 
 
 def _pull_binary_from_admin(s3_path: str) -> bool:
@@ -459,7 +630,7 @@ def _persist_plugin_binary(data: bytes, rel_path: str, filename: str, device_typ
             raise RuntimeError(
                 f"S3 bucket not configured (DM_S3_BUCKET) for DM_BINARIES_MODE={settings.binaries_mode}"
             )
-        key = f"{S3_BINARIES_PREFIX.rstrip('/')}/{rel_path}"
+        key = _S3_BINARIES_KEY_PREFIX + rel_path
         s3_client().put_object(Bucket=settings.s3_bucket, Key=key, Body=data, ContentType="application/octet-stream")
         return key
 
@@ -494,6 +665,11 @@ def _config_cache_clear() -> None:
     """Flush the entire config cache (call after deploy)."""
     with _CONFIG_CACHE_LOCK:
         _CONFIG_CACHE.clear()
+    with _TEMPLATE_FILE_CACHE_LOCK:
+        _TEMPLATE_FILE_CACHE.clear()
+    with _CONFIG_PATH_CACHE_LOCK:
+        _CONFIG_PATH_CACHE.clear()
+    _render_json_template.cache_clear()
 
 
 # Hot-reload : quand une nouvelle génération de config runtime est appliquée
@@ -501,6 +677,9 @@ def _config_cache_clear() -> None:
 # ont été bâties avec l'ancienne valeur → invalidation immédiate sur chaque pod
 # (supprime la fenêtre de staleness du TTL 60s).
 runtime_config.register_reload_hook(_config_cache_clear)
+# URLs DB mémoïsées (clé = valeurs d'env) : purge au reload pour ne pas garder
+# en mémoire d'anciens mots de passe après rotation.
+runtime_config.register_reload_hook(_svc_reset_url_cache)
 
 
 def _queue_db_url() -> str | None:
@@ -541,33 +720,102 @@ _ensure_dev_role = _svc_ensure_dev_role
 _ensure_dev_privileges = _svc_ensure_dev_privileges
 
 
-def _apply_schema(db_url_str: str) -> None:
-    _svc_apply_schema(db_url_str, SCHEMA_SQL_PATH)
+def _apply_schema(db_url_str: str, *, conn=None) -> None:
+    _svc_apply_schema(db_url_str, SCHEMA_SQL_PATH, conn=conn)
+
+
+def _wait_for_db(db_url_str: str, timeout_seconds: int = 30, interval_seconds: float = 2.0,
+                 *, keep_open: bool = False):
+    return _svc_wait_for_db(db_url_str, timeout_seconds, interval_seconds, keep_open=keep_open)
+
+
+# Repli partagé (lecture seule) : pas d'allocation de dict vide par appel.
+_NO_BODY: dict = {}
+
+
+_IDENTITY_HEADERS = {b"x-user-email": 0, b"x-client-uuid": 1, b"x-encryption-key-fingerprint": 2}
+
 
+def _scan_headers(request: Request, wanted: dict[bytes, int]) -> list[str | None]:
+    """Valeurs des en-têtes ``wanted`` (nom → index) en un seul parcours des
+    en-têtes bruts (noms déjà en minuscules en ASGI) au lieu d'un Headers.get
+    par nom, qui re-parcourt chacun toute la liste. Première occurrence
+    retenue, comme Headers.get."""
+    found: list[str | None] = [None] * len(wanted)
+    for name, value in request.scope["headers"]:
+        idx = wanted.get(name)
+        if idx is not None and found[idx] is None:
+            found[idx] = value.decode("latin-1")
+    return found
 
-def _wait_for_db(db_url_str: str, timeout_seconds: int = 30, interval_seconds: float = 1.0) -> None:
-    _svc_wait_for_db(db_url_str, timeout_seconds, interval_seconds)
+
+# Identité anonyme (ni en-tête ni champ de body) : un seul tuple partagé.
+_ANONYMOUS_IDENTITY = ("unknown@local", "00000000-0000-0000-0000-000000000000", "unknown")
 
 
 def _extract_identity(request: Request, body_obj: dict | None = None) -> tuple[str, str, str]:
-    email = request.headers.get("X-User-Email") or (body_obj or {}).get("email") or "unknown@local"
+    body = body_obj or _NO_BODY
+    found = _scan_headers(request, _IDENTITY_HEADERS)
+    if not body and not any(found):
+        return _ANONYMOUS_IDENTITY
+    email = found[0] or body.get("email") or "unknown@local"
     client_uuid = (
-        request.headers.get("X-Client-UUID")
-        or (body_obj or {}).get("client_uuid")
-        or (body_obj or {}).get("plugin_uuid")
+        found[1]
+        or body.get("client_uuid")
+        or body.get("plugin_uuid")
         or "00000000-0000-0000-0000-000000000000"
     )
-    fingerprint = request.headers.get("X-Encryption-Key-Fingerprint") or (body_obj or {}).get("encryption_key_fingerprint") or "unknown"
+    fingerprint = found[2] or body.get("encryption_key_fingerprint") or "unknown"
     return email, client_uuid, fingerprint
 
 
-def _validate_enroll_payload(body_obj: dict) -> list[str]:
+_ENROLL_REQUIRED_FIELDS = ("device_name", "plugin_uuid")
+_TELEMETRY_HEADERS = {
+    b"x-client-uuid": 0,
+    b"x-plugin-uuid": 1,
+    b"content-type": 2,
+    b"user-agent": 3,
+    b"x-idempotency-key": 4,
+    b"x-request-id": 5,
+}
+_ENROLL_HEADERS = {
+    b"x-encryption-key-fingerprint": 0,
+    b"user-agent": 1,
+    b"x-idempotency-key": 2,
+    b"x-request-id": 3,
+}
+
+# Corps d'erreur constants de /enroll et du relais télémétrie, encodés une fois
+# (même principe que _CONFIG_BAD_PROFILE_BODY) : ni dict ni sérialisation par rejet.
+_ENROLL_TOO_LARGE_BODY = _fast_json_dumps({"ok": False, "error": "Body too large"})
+_ENROLL_EMPTY_BODY = _fast_json_dumps({"ok": False, "error": "Empty body"})
+_ENROLL_INVALID_JSON_BODY = _fast_json_dumps({"ok": False, "error": "Body is not valid JSON"})
+_ENROLL_NOT_OBJECT_BODY = _fast_json_dumps({"ok": False, "error": "Body must be a JSON object"})
+# Premier octet significatif possible d'un texte JSON (RFC 8259 §2) : objet,
+# tableau, chaîne ("), nombre, true/false/null ; précédé d'espaces JSON.
+_JSON_WHITESPACE = frozenset(b" \t\r\n")
+_JSON_VALUE_START = frozenset(b'{["-0123456789tfn')
+_ENROLL_UNAUTHORIZED_BODY = _fast_json_dumps({"ok": False, "error": "Missing or invalid PKCE access token."})
+_TELEMETRY_TOO_LARGE_BODY = _fast_json_dumps({"ok": False, "error": "Telemetry payload too large"})
+_TELEMETRY_EMPTY_BODY = _fast_json_dumps({"ok": False, "error": "Empty telemetry payload"})
+
+
+def _json_error(body: bytes, status_code: int) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+def _validate_enroll_payload(body_obj: dict) -> tuple[dict[str, str], list[str]]:
+    """Champs requis normalisés (strip) + liste des champs manquants, en une passe."""
+    fields: dict[str, str] = {}
     missing: list[str] = []
-    for field in ("device_name", "plugin_uuid"):
+    for field in _ENROLL_REQUIRED_FIELDS:
         val = body_obj.get(field)
-        if not isinstance(val, str) or not val.strip():
+        val = val.strip() if isinstance(val, str) else ""
+        if val:
+            fields[field] = val
+        else:
             missing.append(field)
-    return missing
+    return fields, missing
 
 
 def _upsert_provisioning(*, email: str, client_uuid: str, device_name: str, encryption_key: str) -> None:
@@ -576,11 +824,10 @@ def _upsert_provisioning(*, email: str, client_uuid: str, device_name: str, encr
     db_url = _db_url_bootstrap()
     if not db_url:
         return
-    conn = psycopg2.connect(db_url)
-    conn.autocommit = True
-    try:
+    with _db_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
+            _svc_execute_prepared(
+                cur, "dm_upsert_provisioning",
                 """
                 INSERT INTO provisioning (email, device_name, client_uuid, status, encryption_key, comments)
                 VALUES (%s, %s, %s, 'ENROLLED', %s, %s)
@@ -594,8 +841,10 @@ def _upsert_provisioning(*, email: str, client_uuid: str, device_name: str, encr
                 """,
                 (email, device_name, client_uuid, encryption_key, "enroll"),
             )
-    finally:
-        conn.close()
+
+
+# Actions jamais journalisées dans device_connections (testées avant tout travail).
+_CONNECTION_LOG_SKIP_ACTIONS: frozenset[str] = frozenset({"HEALTHZ"})
 
 
 def _log_device_connection(
@@ -607,7 +856,7 @@ def _log_device_connection(
     source_ip: str | None,
     user_agent: str | None,
 ) -> None:
-    if action == "HEALTHZ":
+    if action in _CONNECTION_LOG_SKIP_ACTIONS:
         return
     if psycopg2 is None:
         # DB logging is optional; if psycopg2 isn't installed, just skip.
@@ -615,11 +864,15 @@ def _log_device_connection(
     db_url = _db_url_bootstrap()
     if not db_url:
         return
-    conn = psycopg2.connect(db_url)
-    conn.autocommit = True
-    try:
+    # Chemin nominal : file en mémoire, flush groupé par le writer de fond.
+    if _connection_log.submit(
+        email, client_uuid, action, encryption_key_fingerprint, source_ip, user_agent,
+    ):
+        return
+    with _db_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
+            _svc_execute_prepared(
+                cur, "dm_log_connection",
                 """
                 INSERT INTO device_connections (
                     email, client_uuid, action, encryption_key_fingerprint,
@@ -628,12 +881,10 @@ def _log_device_connection(
                 """,
                 (email, client_uuid, action, encryption_key_fingerprint, source_ip, user_agent),
             )
-    finally:
-        conn.close()
 
 
 # Legacy fallback — only used when DB is unreachable
-_DEVICE_TYPE_FALLBACK = {"matisse", "libreoffice", "mirai-libreoffice"}
+_DEVICE_TYPE_FALLBACK = frozenset({"matisse", "libreoffice", "mirai-libreoffice"})
 
 
 def _resolve_device(device: str, cur) -> tuple[str | None, str | None, int | None, str]:
@@ -641,28 +892,20 @@ def _resolve_device(device: str, cur) -> tuple[str | None, str | None, int | Non
 
     resolved_via: 'slug' | 'alias' | 'fallback' | 'unknown'
     """
-    # 1. Slug exact (= device_name)
+    # 1+2. Slug exact (= device_name) puis alias, en un seul aller-retour : le
+    # slug est prioritaire (ORDER BY), un alias ne sert que s'il n'y a pas de
+    # plugin actif de ce slug (alias = clé primaire → au plus une ligne).
     try:
-        cur.execute(
-            "SELECT slug, device_type, id FROM plugins WHERE slug = %s AND status = 'active'",
-            (device,),
-        )
-        row = cur.fetchone()
-        if row:
-            return row[0], row[1], row[2], "slug"
-    except Exception:
-        pass
-
-    # 2. Alias
-    try:
-        cur.execute("""
-            SELECT p.slug, p.device_type, p.id
-            FROM plugin_aliases a JOIN plugins p ON p.id = a.plugin_id
-            WHERE a.alias = %s AND p.status = 'active'
-        """, (device,))
+        _svc_execute_prepared(cur, "dm_resolve_device", """
+            SELECT slug, device_type, id FROM plugins
+            WHERE (slug = %s OR id = (SELECT plugin_id FROM plugin_aliases WHERE alias = %s))
+              AND status = 'active'
+            ORDER BY slug = %s DESC
+            LIMIT 1
+        """, (device, device, device))
         row = cur.fetchone()
         if row:
-            return row[0], row[1], row[2], "alias"
+            return row[0], row[1], row[2], "slug" if row[0] == device else "alias"
     except Exception:
         pass
 
@@ -720,6 +963,26 @@ def _apply_catalog_overrides(cfg: dict, *, plugin_id: int, profile: str, cur) ->
     return cfg
 
 
+@functools.lru_cache(maxsize=256)
+def _jwt_payload_groups(payload_b64: str) -> frozenset[str]:
+    """Claim ``groups`` d'un segment payload JWT (non vérifié), en ensemble.
+
+    Un client rejoue le même token à chaque /config : décodage base64 + JSON
+    une seule fois par token, puis test d'appartenance O(1). Clé = segment
+    payload seul — sans la signature, l'entrée n'est pas un credential.
+    """
+    try:
+        claims = _fast_json_loads(base64.urlsafe_b64decode(payload_b64 + "=="))
+    except Exception:
+        return frozenset()
+    groups = claims.get("groups") if isinstance(claims, dict) else None
+    if isinstance(groups, str):
+        return frozenset((groups,))
+    if isinstance(groups, list):
+        return frozenset(g for g in groups if isinstance(g, str))
+    return frozenset()
+
+
 def _check_plugin_access(plugin_row: dict | None, request: Request, cur) -> bool:
     """Check if the caller has access to a restricted plugin. Returns True if access OK."""
     if not plugin_row:
@@ -735,14 +998,9 @@ def _check_plugin_access(plugin_row: dict | None, request: Request, cur) -> bool
         # Try to extract groups from Bearer token (unverified, best-effort)
         auth = request.headers.get("authorization", "")
         if auth.lower().startswith("bearer "):
-            try:
-                token_str = auth[7:]
-                payload_b64 = token_str.split(".")[1] + "=="
-                claims = json.loads(base64.urlsafe_b64decode(payload_b64))
-                user_groups = claims.get("groups", [])
-                return required in user_groups
-            except Exception:
-                pass
+            parts = auth[7:].split(".")
+            if len(parts) >= 2:
+                return required in _jwt_payload_groups(parts[1])
         return False
 
     if access_mode == "waitlist":
@@ -783,6 +1041,40 @@ def _build_config_from_template(template: dict, profile: str) -> dict:
     return {"configVersion": template.get("configVersion", 1), "config": merged}
 
 
+# Templates fichier parsés, par chemin, invalidés sur changement de mtime.
+_TEMPLATE_FILE_CACHE: dict[str, tuple[int, dict]] = {}
+_TEMPLATE_FILE_CACHE_LOCK = threading.Lock()
+
+
+def _load_template_file(path: str) -> dict:
+    """Parse (orjson, octets bruts) d'un template, mémoïsé sur (chemin, st_mtime_ns).
+
+    L'objet renvoyé est PARTAGÉ entre requêtes : ne pas le muter —
+    _substitute_env en construit une copie avant toute modification.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    with _TEMPLATE_FILE_CACHE_LOCK:
+        entry = _TEMPLATE_FILE_CACHE.get(path)
+    if entry and entry[0] == mtime:
+        return entry[1]
+    with open(path, "rb") as f:
+        data = _fast_json_loads(f.read())
+    with _TEMPLATE_FILE_CACHE_LOCK:
+        _TEMPLATE_FILE_CACHE[path] = (mtime, data)
+    return data
+
+
+# Chemin du template fichier résolu (ou None : aucun) par (config_dir, profil,
+# device, device_name) : la cascade de os.path.isfile (jusqu'à 12 stats) ne tourne
+# qu'une fois par TTL, il ne reste que le stat mtime de _load_template_file.
+# TTL court : un fichier plus prioritaire ajouté à chaud (ConfigMap) est vu.
+# Borné : device peut venir tel quel de la query string quand la DB est absente.
+_CONFIG_PATH_TTL_SECONDS = 30.0
+_CONFIG_PATH_CACHE_MAX = 256
+_CONFIG_PATH_CACHE: dict[tuple, tuple[float, str | None]] = {}
+_CONFIG_PATH_CACHE_LOCK = threading.Lock()
+
+
 def _load_config_template(profile: str, device: str | None = None,
                           device_name: str | None = None,
                           cur=None) -> dict:
@@ -815,7 +1107,7 @@ def _load_config_template(profile: str, device: str | None = None,
                 )
                 row = cur.fetchone()
                 if row and row[0]:
-                    template = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+                    template = row[0] if isinstance(row[0], dict) else _fast_json_loads(row[0])
                     result = _build_config_from_template(template, profile)
                     logger.info("Config loaded from DB (plugins.config_template) for %s profile=%s", slug, profile)
                     return result
@@ -823,6 +1115,37 @@ def _load_config_template(profile: str, device: str | None = None,
             logger.warning("DB config_template load failed (non-fatal): %s", e)
 
     # 2. Filesystem fallback (legacy)
+    key = (settings.config_dir, profile, device, device_name)
+    now = time.monotonic()
+    with _CONFIG_PATH_CACHE_LOCK:
+        entry = _CONFIG_PATH_CACHE.get(key)
+    if entry and entry[0] > now:
+        if entry[1] is None:
+            return {"configVersion": 1, "config": {}}
+        try:
+            return _load_template_file(entry[1])
+        except FileNotFoundError:
+            pass  # fichier retiré entre-temps : re-résolution
+    path = _resolve_config_template_path(profile, device, device_name)
+    # Résultat négatif mis en cache aussi : sinon un device sans template
+    # rejoue toute la cascade (et le warning) à chaque requête.
+    with _CONFIG_PATH_CACHE_LOCK:
+        if len(_CONFIG_PATH_CACHE) >= _CONFIG_PATH_CACHE_MAX:
+            _CONFIG_PATH_CACHE.clear()
+        _CONFIG_PATH_CACHE[key] = (now + _CONFIG_PATH_TTL_SECONDS, path)
+    if path:
+        return _load_template_file(path)
+
+    # No DB template and no filesystem fallback — return a minimal empty config
+    # This happens when no device is specified or the plugin has no config_template yet
+    logger.warning("No config template found for device=%s device_name=%s profile=%s — returning minimal config",
+                   device, device_name, profile)
+    return {"configVersion": 1, "config": {}}
+
+
+def _resolve_config_template_path(profile: str, device: str | None,
+                                  device_name: str | None) -> str | None:
+    """Premier template fichier existant, dans l'ordre de _load_config_template."""
     bases: list[str] = []
     if settings.config_dir:
         bases.append(settings.config_dir)
@@ -846,14 +1169,8 @@ def _load_config_template(profile: str, device: str | None = None,
         ])
         for p in candidates:
             if os.path.isfile(p):
-                with open(p, encoding="utf-8") as f:
-                    return json.load(f)
-
-    # No DB template and no filesystem fallback — return a minimal empty config
-    # This happens when no device is specified or the plugin has no config_template yet
-    logger.warning("No config template found for device=%s device_name=%s profile=%s — returning minimal config",
-                   device, device_name, profile)
-    return {"configVersion": 1, "config": {}}
+                return p
+    return None
 
 
 # Jointure de chemin sûre : helper unifié (cf. app/pathsafe.py). Alias conservés
@@ -862,27 +1179,149 @@ from app.pathsafe import safe_path_join as _safe_path_join  # noqa: E402 (alias
 from app.pathsafe import safe_segment as _safe_segment  # noqa: E402 (alias historique placé près des appelants)
 
 
-def _substitute_env_in_str(value: str) -> str:
-    """Replace ${{VARNAME}} (or legacy ${VARNAME}) with os.environ['VARNAME'] if set, else empty string."""
+@functools.lru_cache(maxsize=4096)
+def _compile_template_str(value: str) -> tuple[tuple[bool, str], ...]:
+    """Segments (is_var, texte) d'une chaîne de template, calculés une fois.
 
-    def repl(m: re.Match[str]) -> str:
+    Les positions des placeholders d'un template sont statiques : la regex ne
+    tourne qu'au premier rendu de chaque chaîne distincte, ensuite le rendu
+    n'est plus qu'un join + lectures d'environnement.
+    """
+    segments: list[tuple[bool, str]] = []
+    pos = 0
+    for m in _TEMPLATE_VAR_RE.finditer(value):
+        if m.start() > pos:
+            segments.append((False, value[pos:m.start()]))
         # group(1) matches the preferred ${{VARNAME}} syntax,
         # group(2) matches the legacy ${VARNAME} syntax.
-        var = m.group(1) or m.group(2)
-        return os.getenv(var or "", "")
+        segments.append((True, m.group(1) or m.group(2)))
+        pos = m.end()
+    if not segments:
+        return ()  # "$" sans placeholder : chaîne rendue telle quelle
+    if pos < len(value):
+        segments.append((False, value[pos:]))
+    return tuple(segments)
+
+
+def _render_template_str(value: str) -> str:
+    segments = _compile_template_str(value)
+    if not segments:
+        return value
+    environ = os.environ
+    # join sur une liste (taille connue) plutôt qu'un générateur.
+    return "".join([environ.get(text, "") if is_var else text for is_var, text in segments])
+
+
+def _substitute_env_in_str(value: str) -> str:
+    """Replace ${{VARNAME}} (or legacy ${VARNAME}) with os.environ['VARNAME'] if set, else empty string."""
+    if "$" not in value:
+        return value
+    return _render_template_str(value)
+
+
+# Reste d'une chaîne JSON après un placeholder, jusqu'au guillemet fermant
+# (non échappé) : suivi de ":", c'était une clé. Boucle déroulée
+# (normal* (spécial normal*)*) : les plages sans échappement sont avalées d'un
+# bloc au lieu d'une alternative par caractère (~5x sur une valeur longue,
+# certificat PEM par ex.), sans retour arrière possible.
+_JSON_STRING_REST_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"')
+_JSON_ESCAPE_NEEDED_RE = re.compile(r'["\\\x00-\x1f]')
 
-    return _TEMPLATE_VAR_RE.sub(repl, value)
+
+@functools.lru_cache(maxsize=64)
+def _compile_json_template(text: str) -> tuple[tuple[bool, str], ...]:
+    """Segments (is_var, texte) d'un document JSON sérialisé, calculés une
+    fois par document distinct. Seuls les placeholders des VALEURS sont
+    retenus : ceux d'une clé restent littéraux, comme dans le parcours d'arbre.
+    """
+    segments: list[tuple[bool, str]] = []
+    pos = 0
+    for m in _TEMPLATE_VAR_RE.finditer(text):
+        rest = _JSON_STRING_REST_RE.match(text, m.end())
+        if rest is None or text.startswith(":", rest.end()):
+            continue
+        if m.start() > pos:
+            segments.append((False, text[pos:m.start()]))
+        segments.append((True, m.group(1) or m.group(2)))
+        pos = m.end()
+    if not segments:
+        return ()
+    if pos < len(text):
+        segments.append((False, text[pos:]))
+    return tuple(segments)
+
+
+@functools.lru_cache(maxsize=64)
+def _json_template_vars(text: str) -> tuple[str, ...]:
+    """Variables distinctes référencées par le document, dans l'ordre."""
+    return tuple(dict.fromkeys(t for is_var, t in _compile_json_template(text) if is_var))
+
+
+def _json_escape_value(value: str) -> str:
+    if _JSON_ESCAPE_NEEDED_RE.search(value):
+        return json.dumps(value, ensure_ascii=False)[1:-1]
+    return value
+
+
+@functools.lru_cache(maxsize=64)
+def _render_json_template(text: str, raw_values: tuple[str, ...]) -> str:
+    """Texte rendu pour un jeu de valeurs d'environnement : tant qu'aucune
+    variable référencée ne change, ni échappement ni join ne sont refaits.
+    Purgé par _config_cache_clear (les valeurs peuvent être des secrets)."""
+    values = {name: _json_escape_value(raw) for name, raw in zip(_json_template_vars(text), raw_values, strict=True)}
+    return "".join([values[t] if is_var else t for is_var, t in _compile_json_template(text)])
+
+
+def _substitute_env_json(obj: dict | list) -> dict | list:
+    """Rendu en une passe sur le texte JSON : sérialisation C, rendu mémoïsé
+    par (document, valeurs des variables référencées), puis parse C qui
+    construit directement l'arbre final (copie neuve, le template partagé
+    n'est pas touché)."""
+    text = _fast_json_dumps(obj).decode("utf-8")
+    # Pré-test sous-chaîne (scan C) : un document sans "$" ne paie ni le
+    # hachage de sa clé de cache ni une entrée du LRU des segments.
+    if "$" in text and _compile_json_template(text):
+        # Instantané des seules variables référencées : une lecture par
+        # variable distincte, et un document cohérent même si un reload
+        # runtime_config réécrit os.environ pendant le rendu.
+        environ = os.environ
+        raw_values = tuple([environ.get(name, "") for name in _json_template_vars(text)])
+        text = _render_json_template(text, raw_values)
+    return _fast_json_loads(text)
 
 
 def _substitute_env(obj):
-    """Recursively substitute env vars in any string values."""
-    if isinstance(obj, dict):
-        return {k: _substitute_env(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_substitute_env(v) for v in obj]
+    """Substitute env vars in any string values, returning a copy.
+
+    Containers go through a single pass over their JSON text
+    (_substitute_env_json). Anything the serializer refuses falls back to an
+    iterative walk (explicit stack: no recursion depth limit, no frame per
+    node) where strings without "$" skip the regex. Containers are always
+    copied — the input may be a shared cached template (_load_template_file).
+    Even for a fresh (DB) template, mutating in place with a Python walk is
+    slower than the JSON pass (~1.5x on a 40-object config): the copy made by
+    the C parser is cheaper than visiting each node from Python.
+    """
     if isinstance(obj, str):
         return _substitute_env_in_str(obj)
-    return obj
+    if not isinstance(obj, (dict, list)):
+        return obj
+    try:
+        return _substitute_env_json(obj)
+    except Exception:  # clé non-str, entier > 64 bits, surrogate… → parcours d'arbre
+        pass
+    root = obj.copy()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for k, v in (node.items() if isinstance(node, dict) else enumerate(node)):
+            if isinstance(v, str):
+                if "$" in v:
+                    node[k] = _render_template_str(v)
+            elif isinstance(v, (dict, list)):
+                node[k] = child = v.copy()
+                stack.append(child)
+    return root
 
 
 # ── Crypto helpers (delegated to app/services/crypto.py) ──
@@ -891,7 +1330,14 @@ _b64url_decode = _svc_b64url_decode
 
 
 def _resolve_public_telemetry_endpoint() -> str:
-    endpoint = (settings.telemetry_public_endpoint or "").strip() or "/telemetry/v1/traces"
+    # Résolu à chaque rendu /config : mémoïsé sur les valeurs brutes (réglage +
+    # PUBLIC_BASE_URL), qui restent modifiables à chaud.
+    return _public_telemetry_endpoint(settings.telemetry_public_endpoint, os.getenv("PUBLIC_BASE_URL"))
+
+
+@functools.lru_cache(maxsize=16)
+def _public_telemetry_endpoint(configured: str | None, public_base_raw: str | None) -> str:
+    endpoint = (configured or "").strip() or "/telemetry/v1/traces"
     if endpoint.startswith("http://") or endpoint.startswith("https://"):
         return endpoint
     if not endpoint.startswith("/"):
@@ -904,7 +1350,7 @@ def _resolve_public_telemetry_endpoint() -> str:
     # (POST .../bootstrap/bootstrap/telemetry/v1/traces → 404, constaté DGX).
     # L'ancienne préservation du chemin (« 502 ») datait d'un plugin qui ne
     # re-basait pas. Un endpoint configuré en ABSOLU reste servi verbatim.
-    public_base = (os.getenv("PUBLIC_BASE_URL") or "").strip().rstrip("/")
+    public_base = (public_base_raw or "").strip().rstrip("/")
     if public_base:
         parsed = urlparse(public_base)
         if parsed.scheme and parsed.netloc:
@@ -913,10 +1359,28 @@ def _resolve_public_telemetry_endpoint() -> str:
     return endpoint
 
 
+@functools.lru_cache(maxsize=4)
+def _telemetry_signer(raw_key: str | None) -> hmac.HMAC | None:
+    """HMAC-SHA256 pré-initialisé avec la clé de signature télémétrie (None si
+    absente). Mémoïsé sur la valeur brute du réglage — une rotation à chaud
+    est prise en compte — : chaque mint/vérification fait un ``copy()`` au
+    lieu de re-dériver les blocs ipad/opad de la clé."""
+    secret = (raw_key or "").strip()
+    if not secret:
+        return None
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def _telemetry_sig(signer: hmac.HMAC, payload_b64: str) -> bytes:
+    mac = signer.copy()
+    mac.update(payload_b64.encode("utf-8"))
+    return mac.digest()
+
+
 def _mint_telemetry_token(*, device: str | None, profile: str,
                           client_uuid: str = "") -> tuple[str, int | None]:
-    secret = (settings.telemetry_token_signing_key or "").strip()
-    if not secret:
+    signer = _telemetry_signer(settings.telemetry_token_signing_key)
+    if signer is None:
         return "", None
 
     now = int(time.time())
@@ -936,14 +1400,14 @@ def _mint_telemetry_token(*, device: str | None, profile: str,
         payload["cuid"] = client_uuid
     payload_raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
     payload_b64 = _b64url_encode(payload_raw)
-    sig = hmac.new(secret.encode("utf-8"), payload_b64.encode("utf-8"), hashlib.sha256).digest()
+    sig = _telemetry_sig(signer, payload_b64)
     token = f"{payload_b64}.{_b64url_encode(sig)}"
     return token, int(payload["exp"])
 
 
 def _verify_telemetry_token(token: str) -> dict:
-    secret = (settings.telemetry_token_signing_key or "").strip()
-    if not secret:
+    signer = _telemetry_signer(settings.telemetry_token_signing_key)
+    if signer is None:
         raise HTTPException(status_code=503, detail="Telemetry token verification key is not configured.")
 
     try:
@@ -951,7 +1415,7 @@ def _verify_telemetry_token(token: str) -> dict:
     except ValueError:
         raise HTTPException(status_code=401, detail="Malformed telemetry token.") from None
 
-    expected_sig = hmac.new(secret.encode("utf-8"), payload_b64.encode("utf-8"), hashlib.sha256).digest()
+    expected_sig = _telemetry_sig(signer, payload_b64)
     try:
         provided_sig = _b64url_decode(sig_b64)
     except Exception:
@@ -960,7 +1424,7 @@ def _verify_telemetry_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid telemetry token signature.")
 
     try:
-        payload = json.loads(_b64url_decode(payload_b64).decode("utf-8"))
+        payload = _fast_json_loads(_b64url_decode(payload_b64))
     except Exception:
         raise HTTPException(status_code=401, detail="Malformed telemetry token payload.") from None
     if not isinstance(payload, dict):
@@ -1000,17 +1464,32 @@ def _queue_worker_id(role: str) -> str:
 _SECRET_CONFIG_KEYS = _SVC_SECRET_CONFIG_KEYS
 
 _RELAY_MEMORY_STORE: dict[str, dict] = {}
+# Échéances en time.monotonic() : un saut d'horloge murale (NTP, VM restaurée)
+# ne vide ni ne fige les caches JWKS.
 _AUTH_JWKS_CLIENT_CACHE: dict[str, tuple[float, Any]] = {}
 _AUTH_JWKS_URI_CACHE: dict[str, tuple[float, str]] = {}
 _AUTH_CACHE_LOCK = threading.Lock()
+# Publication du client JWKS : les requêtes concurrentes repartent avec le même
+# client (et donc un seul fetch du JWK Set, sérialisé par le client lui-même).
+# Aucune I/O réseau sous ce verrou : découverte OIDC et fetch se font hors de lui.
+_AUTH_JWKS_BUILD_LOCK = threading.Lock()
 
 # ---- Keycloak group membership cache (for cohort resolution)
-# Structure: {group_name: (expiry_timestamp, set_of_emails)}
-_KC_GROUP_CACHE: dict[str, tuple[float, set]] = {}
+# Structure: {group_name: (expiry_timestamp, frozenset_of_lowercased_emails)}
+_KC_GROUP_CACHE: dict[str, tuple[float, frozenset[str]]] = {}
 _KC_GROUP_CACHE_TTL = 300.0  # 5 minutes
 _KC_GROUP_CACHE_LOCK = threading.Lock()
 
 
+def _kc_group_cache_store(group_name: str, emails, *, now: float | None = None) -> frozenset[str]:
+    """Cache the members of a Keycloak group, lowercased once at store time."""
+    members = frozenset(e.lower() for e in emails)
+    expiry = (time.time() if now is None else now) + _KC_GROUP_CACHE_TTL
+    with _KC_GROUP_CACHE_LOCK:
+        _KC_GROUP_CACHE[group_name] = (expiry, members)
+    return members
+
+
 # ---- Enriched config helpers
 
 def _parse_version_tuple(v: str) -> tuple:
@@ -1038,6 +1517,19 @@ def _infer_platform_variant(platform_type: str, platform_version: str, manifest_
     return None
 
 
+@functools.lru_cache(maxsize=256)
+def _cohort_email_regex(pattern: str) -> re.Pattern | None:
+    """Motif email_pattern compilé une fois ; None si invalide (un motif cassé
+    n'est plus recompilé — et rejeté — à chaque résolution de cohortes).
+    Motif vide : None aussi (il matcherait tout le monde)."""
+    if not pattern:
+        return None
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+
+
 def _resolve_device_cohorts(cur, *, email: str, client_uuid: str) -> list[int]:
     """Return a list of cohort IDs the device belongs to.
 
@@ -1079,7 +1571,7 @@ def _resolve_device_cohorts(cur, *, email: str, client_uuid: str) -> list[int]:
         cohort_id, ctype, cconfig = row[0], row[1], row[2] or {}
         if isinstance(cconfig, str):
             try:
-                cconfig = json.loads(cconfig)
+                cconfig = _fast_json_loads(cconfig)
             except Exception:
                 cconfig = {}
 
@@ -1095,29 +1587,25 @@ def _resolve_device_cohorts(cur, *, email: str, client_uuid: str) -> list[int]:
                     matched.append(cohort_id)
 
         elif ctype == "email_pattern":
-            pattern = str(cconfig.get("pattern", ""))
-            if pattern:
-                try:
-                    if re.match(pattern, email or "", re.IGNORECASE):
-                        matched.append(cohort_id)
-                except Exception:
-                    pass
+            regex = _cohort_email_regex(str(cconfig.get("pattern", "")))
+            if regex is not None and regex.match(email or ""):
+                matched.append(cohort_id)
 
         elif ctype == "keycloak_group":
             group_name = str(cconfig.get("group_name", ""))
             if group_name and email:
                 now = time.time()
-                group_emails: set | None = None
+                group_emails: frozenset[str] | None = None
                 with _KC_GROUP_CACHE_LOCK:
                     cached = _KC_GROUP_CACHE.get(group_name)
                     if cached and cached[0] > now:
                         group_emails = cached[1]
                 if group_emails is None:
                     # No live fetch in this implementation — cache miss yields empty set
-                    group_emails = set()
-                    with _KC_GROUP_CACHE_LOCK:
-                        _KC_GROUP_CACHE[group_name] = (now + _KC_GROUP_CACHE_TTL, group_emails)
-                if email.lower() in {e.lower() for e in group_emails}:
+                    group_emails = _kc_group_cache_store(group_name, (), now=now)
+                # Membres déjà en minuscules dans le cache : un lookup O(1),
+                # sans reconstruire l'ensemble à chaque résolution.
+                if email.lower() in group_emails:
                     matched.append(cohort_id)
 
     return matched
@@ -1338,7 +1826,6 @@ def _resolve_active_campaign(cur, *, device_cohort_ids: list[int], device_type:
 
 def _get_current_rollout_percent(campaign: dict, stages: list) -> int:
     """Return the active rollout percent based on elapsed time since campaign start."""
-    import datetime
     start = campaign.get("campaign_created_at")
     if start is None:
         return 100
@@ -1346,7 +1833,7 @@ def _get_current_rollout_percent(campaign: dict, stages: list) -> int:
         start_ts = start.timestamp()
     else:
         try:
-            start_ts = datetime.datetime.fromisoformat(str(start)).timestamp()
+            start_ts = datetime.fromisoformat(str(start)).timestamp()
         except Exception:
             return 100
     elapsed_hours = (time.time() - start_ts) / 3600
@@ -1461,8 +1948,7 @@ def _parse_unverified_jwt_payload(token: str) -> dict:
         parts = token.split(".")
         if len(parts) < 2:
             return {}
-        payload_raw = _b64url_decode(parts[1]).decode("utf-8")
-        data = json.loads(payload_raw)
+        data = _fast_json_loads(_b64url_decode(parts[1]))
         return data if isinstance(data, dict) else {}
     except Exception:
         return {}
@@ -1488,6 +1974,23 @@ def _resolve_allowed_auth_algorithms() -> list[str]:
     return values or ["RS256"]
 
 
+# (valeurs brutes des settings, (issuer, audience, algorithmes)) : dérivés une
+# fois puis relus sans verrou (tuple remplacé d'un bloc) ; recalculés dès
+# qu'une valeur brute change (reload de config runtime).
+_AUTH_PARAMS: tuple[tuple, tuple[str, str, tuple[str, ...]]] | None = None
+
+
+def _auth_verification_params() -> tuple[str, str, tuple[str, ...]]:
+    global _AUTH_PARAMS
+    raw = (settings.auth_issuer_url, settings.auth_audience, settings.auth_allowed_algorithms_csv)
+    cached = _AUTH_PARAMS
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+    params = (_resolve_auth_issuer_url(), _resolve_auth_audience(), tuple(_resolve_allowed_auth_algorithms()))
+    _AUTH_PARAMS = (raw, params)
+    return params
+
+
 @_resilience.retry_transient()
 def _fetch_oidc_discovery(url: str) -> bytes:
     """GET (idempotent) → retry bornée sur erreur réseau transitoire."""
@@ -1502,12 +2005,129 @@ def _fetch_jwks_signing_key(jwks_client, token: str):
     return jwks_client.get_signing_key_from_jwt(token)
 
 
+# JWK Set mis en cache par _JwksClient (celui de PyJWKClient est coupé) pour
+# la durée annoncée par l'IdP (Cache-Control: max-age, moins l'Age ajouté par
+# un cache intermédiaire), bornée à _JWKS_LIFETIME_BOUNDS ; sans max-age,
+# DM_AUTH_JWKS_CACHE_TTL_SECONDS. IdP injoignable → dernier JWK Set valide
+# resservi (borné à _JWKS_STALE_MAX_SECONDS) et re-tenté au bout de
+# _JWKS_STALE_RETRY_SECONDS. Fetch forcé (kid inconnu, tâche de fond) → au plus
+# un par _JWKS_REFRESH_MIN_INTERVAL ; les appels concurrents attendent le fetch
+# en cours au lieu d'en lancer un chacun.
+_JWKS_STALE_MAX_SECONDS = 86400
+_JWKS_STALE_RETRY_SECONDS = 60
+_JWKS_REFRESH_MIN_INTERVAL = 10.0
+_JWKS_MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.IGNORECASE | re.ASCII)
+_JWKS_LIFETIME_BOUNDS = (60, 86400)
+
+
+def _jwks_cache_lifetime(headers) -> int | None:
+    m = _JWKS_MAX_AGE_RE.search(headers.get("Cache-Control") or "")
+    if m is None:
+        return None
+    try:
+        age = max(0, int(headers.get("Age") or 0))
+    except ValueError:
+        age = 0
+    low, high = _JWKS_LIFETIME_BOUNDS
+    return min(max(int(m.group(1)) - age, low), high)
+
+
+class _NoRedirect(urllib_request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+if PyJWKClient is not None:
+    class _JwksClient(PyJWKClient):
+        """PyJWKClient dont le JWK Set est mis en cache ici avec un index
+        kid → clé : fetchs forcés espacés et mutualisés, dernier set valide
+        resservi quand l'IdP est injoignable (stale-if-error)."""
+
+        def __init__(self, uri: str, *, lifespan: float = 300, **kwargs):
+            super().__init__(uri, cache_jwk_set=False, **kwargs)
+            self._lifespan = float(lifespan)
+            self._fetch_lock = threading.Lock()
+            self._last_attempt = float("-inf")
+            self._fetched_lifetime: int | None = None
+            # (échéance, date du fetch réussi, PyJWKSet, {kid: PyJWK}), publié
+            # d'un bloc : lu sans verrou par get_signing_key.
+            self._current: tuple[float, float, Any, dict[str, Any]] | None = None
+
+        def get_signing_key_from_jwt(self, token: str | bytes) -> Any:
+            # En-tête seul pour le kid : PyJWT décode ici tout le token (payload
+            # JSON compris), que jwt.decode re-décode ensuite.
+            return self.get_signing_key(jwt.get_unverified_header(token).get("kid"))
+
+        def get_signing_key(self, kid: str) -> Any:
+            # Kid du JWK Set courant : un accès dict, sans le verrou de
+            # PyJWKClient ni reconstruction/parcours de la liste des clés.
+            # Kid inconnu ou set expiré : chemin PyJWKClient (refetch espacé).
+            current = self._current
+            if current is not None and current[0] > time.monotonic():
+                key = current[3].get(kid)
+                if key is not None:
+                    return key
+            return super().get_signing_key(kid)
+
+        def fetch_data(self) -> Any:
+            # Même requête que PyJWKClient.fetch_data (pas de redirection
+            # suivie), en gardant les en-têtes pour la durée du cache. Le
+            # payload est validé par PyJWKClient.get_jwk_set, l'appelant.
+            handlers: list[Any] = [_NoRedirect()]
+            if self.ssl_context is not None:
+                handlers.append(urllib_request.HTTPSHandler(context=self.ssl_context))
+            req = urllib_request.Request(url=self.uri, headers=self.headers)
+            try:
+                with urllib_request.build_opener(*handlers).open(req, timeout=self.timeout) as resp:
+                    self._fetched_lifetime = _jwks_cache_lifetime(resp.headers)
+                    return json.load(resp)
+            except (urllib_error.URLError, TimeoutError, http.client.HTTPException) as e:
+                if isinstance(e, urllib_error.HTTPError):
+                    e.close()
+                raise PyJWKClientConnectionError(f'Fail to fetch data from the url, err: "{e}"') from e
+
+        def _cached_jwk_set(self, refresh: bool) -> Any:
+            current = self._current
+            if current is None:
+                return None
+            now = time.monotonic()
+            if refresh:
+                return current[2] if now - self._last_attempt < _JWKS_REFRESH_MIN_INTERVAL else None
+            return current[2] if current[0] > now else None
+
+        def get_jwk_set(self, refresh: bool = False) -> Any:
+            jwk_set = self._cached_jwk_set(refresh)
+            if jwk_set is not None:
+                return jwk_set
+            with self._fetch_lock:
+                # Re-vérifié sous le verrou : un autre thread vient peut-être de fetcher.
+                jwk_set = self._cached_jwk_set(refresh)
+                if jwk_set is not None:
+                    return jwk_set
+                self._last_attempt = time.monotonic()
+                self._fetched_lifetime = None
+                try:
+                    jwk_set = super().get_jwk_set(refresh=True)
+                except PyJWKClientConnectionError as e:
+                    current, now = self._current, time.monotonic()
+                    if current is None or now - current[1] > _JWKS_STALE_MAX_SECONDS:
+                        raise
+                    logger.warning("JWKS fetch failed, serving last known key set: %s", e)
+                    self._current = (now + _JWKS_STALE_RETRY_SECONDS, *current[1:])
+                    return current[2]
+                # Même filtre que PyJWKClient.get_signing_keys (use sig, kid présent).
+                index = {k.key_id: k for k in jwk_set.keys if k.public_key_use in ("sig", None) and k.key_id}
+                now = time.monotonic()
+                self._current = (now + (self._fetched_lifetime or self._lifespan), now, jwk_set, index)
+                return jwk_set
+
+
 def _resolve_jwks_uri(issuer: str) -> str:
     explicit_jwks_url = str(settings.auth_jwks_url or "").strip()
     if explicit_jwks_url:
         return explicit_jwks_url
 
-    now = time.time()
+    now = time.monotonic()
     ttl = max(60, int(settings.auth_jwks_cache_ttl_seconds or 0))
     with _AUTH_CACHE_LOCK:
         cached = _AUTH_JWKS_URI_CACHE.get(issuer)
@@ -1533,27 +2153,110 @@ def _resolve_jwks_uri(issuer: str) -> str:
     return jwks_uri
 
 
-def _get_jwks_client(issuer: str):
+def _get_jwks_client(issuer: str, *, refresh: bool = False):
+    """Client JWKS de l'issuer (caché ``auth_jwks_cache_ttl_seconds``).
+
+    ``refresh=True`` (tâche de fond) : redécouvre l'URI et recharge le JWK Set
+    même si l'entrée est encore valide, pour que les requêtes ne paient jamais
+    le fetch à l'expiration. Un échec de ce rechargement est levé à l'appelant.
+    """
     if PyJWKClient is None:
         raise HTTPException(status_code=503, detail="JWT verification backend is unavailable.")
 
-    now = time.time()
     ttl = max(60, int(settings.auth_jwks_cache_ttl_seconds or 0))
     with _AUTH_CACHE_LOCK:
         cached = _AUTH_JWKS_CLIENT_CACHE.get(issuer)
-        if cached and cached[0] > now:
+        if not refresh and cached and cached[0] > time.monotonic():
             return cached[1]
 
+    # Découverte OIDC (réseau, URI mise en cache) avant de prendre le verrou.
     jwks_uri = _resolve_jwks_uri(issuer)
-    # timeout=60 : le fetch JWKS passe par le proxy WireGuard ; un connect à froid
-    # dans le tunnel peut prendre ~20-30s. Le défaut (30s) était limite et pouvait
-    # faire échouer la vérif (401 sur /enroll). 60s couvre le cold-connect.
-    client = PyJWKClient(jwks_uri, cache_keys=True, timeout=60)
-    with _AUTH_CACHE_LOCK:
-        _AUTH_JWKS_CLIENT_CACHE[issuer] = (now + ttl, client)
+    with _AUTH_JWKS_BUILD_LOCK:
+        # Re-vérifié sous le verrou : un autre thread a pu publier entre-temps.
+        with _AUTH_CACHE_LOCK:
+            cached = _AUTH_JWKS_CLIENT_CACHE.get(issuer)
+            if not refresh and cached and cached[0] > time.monotonic():
+                return cached[1]
+        if cached and cached[1].uri == jwks_uri:
+            # URI inchangée : on garde le client, son cache de JWK Set (durée
+            # dictée par le Cache-Control de l'IdP) décide seul du refetch.
+            client = cached[1]
+        else:
+            # timeout=60 : le fetch JWKS passe par le proxy WireGuard ; un connect à froid
+            # dans le tunnel peut prendre ~20-30s. Le défaut (30s) était limite et pouvait
+            # faire échouer la vérif (401 sur /enroll). 60s couvre le cold-connect.
+            client = _JwksClient(jwks_uri, timeout=60, lifespan=ttl)
+        with _AUTH_CACHE_LOCK:
+            _AUTH_JWKS_CLIENT_CACHE[issuer] = (time.monotonic() + ttl, client)
+    if refresh:
+        # Hors verrou ; l'erreur remonte à _jwks_refresher qui la journalise.
+        client.get_jwk_set(refresh=True)
     return client
 
 
+# Rafraîchissement JWKS en tâche de fond (démarrée au startup) : tous les
+# 80 % du TTL, l'URI et le JWK Set sont rechargés hors chemin de requête ; la
+# vérification d'un token reste une lecture mémoire.
+_jwks_refresher_task: asyncio.Task | None = None
+
+
+async def _jwks_refresher() -> None:
+    while True:
+        ttl = max(60, int(settings.auth_jwks_cache_ttl_seconds or 0))
+        issuer = _resolve_auth_issuer_url()
+        if issuer and settings.auth_verify_access_token and PyJWKClient is not None:
+            try:
+                await run_in_threadpool(functools.partial(_get_jwks_client, issuer, refresh=True))
+            except Exception as exc:
+                logger.warning("Background JWKS refresh failed: %s: %s", exc.__class__.__name__, exc)
+        await asyncio.sleep(ttl * 0.8)
+
+
+# Claims vérifiés, mémoïsés par empreinte du token (jamais le token lui-même)
+# jusqu'à son exp, 5 min au plus : un même bearer réutilisé (retries, relais
+# successifs d'un poste) ne repaie pas la vérification RSA. La clé inclut
+# issuer/audience/algorithmes ; purge complète au reload de config runtime.
+_AUTH_TOKEN_CACHE: dict[tuple, tuple[float, dict]] = {}
+_AUTH_TOKEN_CACHE_MAX = 4096
+_AUTH_TOKEN_CACHE_TTL = 300.0
+_AUTH_TOKEN_CACHE_LOCK = threading.Lock()
+
+
+def _auth_token_cache_put(key: tuple, payload: dict) -> None:
+    now = time.time()
+    exp = payload.get("exp")
+    expires_at = now + _AUTH_TOKEN_CACHE_TTL
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, float(exp))
+    if expires_at <= now:
+        return
+    with _AUTH_TOKEN_CACHE_LOCK:
+        if len(_AUTH_TOKEN_CACHE) >= _AUTH_TOKEN_CACHE_MAX:
+            for k in [k for k, (e, _p) in _AUTH_TOKEN_CACHE.items() if e <= now]:
+                del _AUTH_TOKEN_CACHE[k]
+            while len(_AUTH_TOKEN_CACHE) >= _AUTH_TOKEN_CACHE_MAX:
+                del _AUTH_TOKEN_CACHE[next(iter(_AUTH_TOKEN_CACHE))]
+        _AUTH_TOKEN_CACHE[key] = (expires_at, payload)
+
+
+def _auth_token_cache_clear() -> None:
+    with _AUTH_TOKEN_CACHE_LOCK:
+        _AUTH_TOKEN_CACHE.clear()
+
+
+runtime_config.register_reload_hook(_auth_token_cache_clear)
+
+
+# Décodeurs PyJWT pré-configurés (avec / sans vérification d'audience) : les
+# options sont fusionnées une fois ici, decode() ne reconstruit ni ne
+# refusionne de dict d'options à chaque token.
+_JWT_DECODE_OPTIONS = {"verify_exp": True, "verify_iat": False, "verify_nbf": True, "verify_iss": False}
+_JWT_DECODERS = (
+    {aud: jwt.PyJWT({**_JWT_DECODE_OPTIONS, "verify_aud": aud}) for aud in (False, True)}
+    if jwt is not None else {}
+)
+
+
 def _verify_access_token(token: str) -> dict:
     if not token:
         return {}
@@ -1565,28 +2268,37 @@ def _verify_access_token(token: str) -> dict:
     if jwt is None:
         raise HTTPException(status_code=503, detail="JWT verification backend is unavailable.")
 
-    issuer = _resolve_auth_issuer_url()
+    issuer, audience, algorithms = _auth_verification_params()
     if not issuer:
         raise HTTPException(status_code=503, detail="Auth issuer URL is not configured.")
-    audience = _resolve_auth_audience()
-    algorithms = _resolve_allowed_auth_algorithms()
+    cache_key = (hashlib.blake2b(token.encode(), digest_size=16).digest(), issuer, audience, algorithms)
+    cached = _AUTH_TOKEN_CACHE.get(cache_key)
+    if cached is not None and cached[0] > time.time():
+        return cached[1]
+
+    # Rejets bon marché AVANT le JWKS et la vérification RSA : sur des claims
+    # non vérifiés, un token périmé ou d'un autre issuer ne pourrait de toute
+    # façon qu'échouer — inutile de payer la crypto asymétrique pour le dire.
+    # Token illisible ({}) : laissé à PyJWT, qui le rejette sans crypto.
+    leeway = max(0, int(settings.auth_leeway_seconds))
+    unverified = _parse_unverified_jwt_payload(token)
+    if unverified:
+        if _normalized_url(unverified.get("iss")) != issuer:
+            raise HTTPException(status_code=401, detail="Invalid PKCE access token issuer.")
+        exp = unverified.get("exp")
+        if isinstance(exp, int | float) and not isinstance(exp, bool) and exp + leeway <= time.time():
+            logger.warning("JWT verification failed (pre-check): token expired")
+            raise HTTPException(status_code=401, detail="Invalid PKCE access token.")
 
     try:
         jwks_client = _get_jwks_client(issuer)
         signing_key = _fetch_jwks_signing_key(jwks_client, token)
-        payload = jwt.decode(
+        payload = _JWT_DECODERS[bool(audience)].decode(
             token,
             signing_key.key,
             algorithms=algorithms,
             audience=audience if audience else None,
-            options={
-                "verify_aud": bool(audience),
-                "verify_exp": True,
-                "verify_iat": False,
-                "verify_nbf": True,
-                "verify_iss": False,
-            },
-            leeway=max(0, int(settings.auth_leeway_seconds)),
+            leeway=leeway,
         )
     except PyJWTError as exc:
         logger.warning("JWT verification failed (PyJWTError): %s: %s", exc.__class__.__name__, exc)
@@ -1600,6 +2312,7 @@ def _verify_access_token(token: str) -> dict:
     token_issuer = _normalized_url(payload.get("iss"))
     if not token_issuer or token_issuer != issuer:
         raise HTTPException(status_code=401, detail="Invalid PKCE access token issuer.")
+    _auth_token_cache_put(cache_key, payload)
     return payload
 
 
@@ -1644,22 +2357,23 @@ def _mint_or_rotate_relay_credentials(*, client_uuid: str, email: str) -> dict:
         conn.autocommit = True
         try:
             with conn.cursor() as cur:
+                # Révocation + insertion envoyées dans UNE requête : un seul
+                # aller-retour, et (autocommit) une seule transaction implicite —
+                # pas de fenêtre sans credential actif. Pas de CTE : l'ordre
+                # UPDATE → INSERT doit être garanti (index unique partiel
+                # uq_relay_active_client).
                 cur.execute(
                     """
                     UPDATE relay_clients
                     SET revoked_at = now(), comments = 'rotated'
-                    WHERE client_uuid = %s AND revoked_at IS NULL
-                    """,
-                    (client_uuid,),
-                )
-                cur.execute(
-                    """
+                    WHERE client_uuid = %s AND revoked_at IS NULL;
                     INSERT INTO relay_clients (
                         client_uuid, email, relay_client_id, relay_key_hash,
                         allowed_targets, expires_at, comments
                     ) VALUES (%s, %s, %s, %s, %s, to_timestamp(%s), %s)
                     """,
                     (
+                        client_uuid,
                         client_uuid,
                         email,
                         relay_client_id,
@@ -1690,6 +2404,51 @@ def _mint_or_rotate_relay_credentials(*, client_uuid: str, email: str) -> dict:
     }
 
 
+@functools.lru_cache(maxsize=64)
+def _effective_relay_targets(raw_targets: tuple) -> tuple[frozenset[str], tuple[str, ...]]:
+    """Targets normalisés d'un credential relay → (ensemble pour le test
+    d'appartenance, tuple trié pour la réponse). Peu de combinaisons distinctes
+    en base : calculé une fois par combinaison, pas à chaque requête relayée."""
+    targets = {str(t).strip().lower() for t in raw_targets} - {""}
+    # Backward compatibility: existing credentials with 'config' are also allowed for telemetry relay.
+    # Rétrocompat proxy LLM : un plugin déjà enrôlé (target 'config') bascule sur
+    # /llm/v1 sans ré-enrôlement, juste via le llmEndpoint reçu au prochain /config.
+    if "config" in targets:
+        targets |= {"telemetry", "llm"}
+    return frozenset(targets), tuple(sorted(targets))
+
+
+def _lookup_relay_client(relay_client_id: str) -> dict | None:
+    db_url = _db_url_bootstrap()
+    if psycopg2 is None or not db_url:
+        return _RELAY_MEMORY_STORE.get(relay_client_id)
+    # Connexion du pool : appelé à chaque requête relay, /config et LLM.
+    with _db_conn() as conn, conn.cursor() as cur:
+        # relay_client_id est tiré au hasard à chaque mint (jamais
+        # réutilisé) : au plus une ligne, pas de tri (idx_relay_client_id).
+        cur.execute(
+            """
+            SELECT client_uuid::text, email::text, relay_key_hash, allowed_targets,
+                   EXTRACT(EPOCH FROM expires_at)::bigint, revoked_at
+            FROM relay_clients
+            WHERE relay_client_id = %s
+            LIMIT 1
+            """,
+            (relay_client_id,),
+        )
+        item = cur.fetchone()
+    if not item:
+        return None
+    return {
+        "client_uuid": item[0],
+        "email": item[1],
+        "relay_key_hash": item[2],
+        "allowed_targets": list(item[3] or []),
+        "expires_at": int(item[4] or 0),
+        "revoked": item[5] is not None,
+    }
+
+
 def _verify_relay_credentials(relay_client_id: str, relay_key: str, target: str | None = None) -> tuple[bool, dict | str]:
     relay_client_id = str(relay_client_id or "").strip()
     relay_key = str(relay_key or "").strip()
@@ -1698,39 +2457,7 @@ def _verify_relay_credentials(relay_client_id: str, relay_key: str, target: str
         return False, "missing relay headers"
 
     now = int(time.time())
-    row: dict | None = None
-
-    db_url = _db_url_bootstrap()
-    if psycopg2 is not None and db_url:
-        conn = psycopg2.connect(db_url)
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT client_uuid::text, email::text, relay_key_hash, allowed_targets,
-                           EXTRACT(EPOCH FROM expires_at)::bigint, revoked_at
-                    FROM relay_clients
-                    WHERE relay_client_id = %s
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                    """,
-                    (relay_client_id,),
-                )
-                item = cur.fetchone()
-            if item:
-                row = {
-                    "client_uuid": item[0],
-                    "email": item[1],
-                    "relay_key_hash": item[2],
-                    "allowed_targets": list(item[3] or []),
-                    "expires_at": int(item[4] or 0),
-                    "revoked": item[5] is not None,
-                }
-        finally:
-            conn.close()
-    else:
-        row = _RELAY_MEMORY_STORE.get(relay_client_id)
-
+    row = _lookup_relay_client(relay_client_id)
     if not row:
         return False, "unknown relay client"
     if bool(row.get("revoked")):
@@ -1745,25 +2472,14 @@ def _verify_relay_credentials(relay_client_id: str, relay_key: str, target: str
     if expires_at and expires_at <= now:
         return False, "relay key expired"
 
-    allowed_targets = [str(t).strip().lower() for t in (row.get("allowed_targets") or []) if str(t).strip()]
-    effective_targets = sorted(set(allowed_targets))
-    # Backward compatibility: existing credentials with 'config' are also allowed for telemetry relay.
-    if "config" in effective_targets and "telemetry" not in effective_targets:
-        effective_targets.append("telemetry")
-        effective_targets.sort()
-    # Rétrocompat proxy LLM : un plugin déjà enrôlé (target 'config') bascule sur
-    # /llm/v1 sans ré-enrôlement, juste via le llmEndpoint reçu au prochain /config.
-    if "config" in effective_targets and "llm" not in effective_targets:
-        effective_targets.append("llm")
-        effective_targets.sort()
-
-    if target_norm and effective_targets and target_norm not in effective_targets:
+    target_set, effective_targets = _effective_relay_targets(tuple(row.get("allowed_targets") or ()))
+    if target_norm and target_set and target_norm not in target_set:
         return False, f"target '{target_norm}' not allowed"
 
     return True, {
         "client_uuid": row.get("client_uuid", ""),
         "email": row.get("email", ""),
-        "allowed_targets": effective_targets,
+        "allowed_targets": list(effective_targets),
         "expires_at": expires_at,
     }
 
@@ -1994,6 +2710,35 @@ def _enqueue_telemetry_payload(
     return True, job_id
 
 
+# PUT S3 du payload enroll, parallèle à l'écriture disque (threads créés à la
+# demande par l'executor).
+_ENROLL_S3_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="enroll-s3")
+
+
+def _write_enroll_locally(fname: str, body: bytes) -> str:
+    _ensure_dir(settings.enroll_dir)
+    path = os.path.join(settings.enroll_dir, fname)
+    try:
+        _write_bytes(path, body)
+    except FileNotFoundError:
+        # Répertoire supprimé depuis sa création mémoïsée : on le recrée.
+        _READY_DIRS.discard(settings.enroll_dir)
+        _ensure_dir(settings.enroll_dir)
+        _write_bytes(path, body)
+    return path
+
+
+def _put_enroll_s3(fname: str, body: bytes) -> str:
+    key = _S3_ENROLL_KEY_PREFIX + fname
+    s3_client().put_object(
+        Bucket=settings.s3_bucket,
+        Key=key,
+        Body=body,
+        ContentType="application/json",
+    )
+    return f"s3://{settings.s3_bucket}/{key}"
+
+
 def _persist_enroll_side_effects(
     *,
     body: bytes,
@@ -2003,32 +2748,61 @@ def _persist_enroll_side_effects(
     device_name: str,
     source_ip: str | None,
     user_agent: str | None,
+    record_db: bool = True,
 ) -> dict[str, str | bool]:
-    epoch_ms = int(time.time() * 1000)
-    rid = uuid.uuid4().hex
-    fname = f"{epoch_ms}-{rid}.json"
-    stored: dict[str, str | bool] = {}
-
-    if settings.store_enroll_locally:
-        _ensure_dir(settings.enroll_dir)
-        path = os.path.join(settings.enroll_dir, fname)
-        with open(path, "wb") as f:
-            f.write(body)
-        stored["local"] = path
+    """Persist du payload enroll (disque/S3) puis écritures DB (provisioning +
+    device_connections). ``record_db=False`` : l'appelant planifie lui-même
+    _record_enroll_db (tâche de fond de /enroll, après l'envoi de la réponse)."""
+    # <epoch ms>-<64 bits aléatoires>.json : même préfixe triable qu'avant,
+    # sans flottant ni objet UUID (8 octets d'urandom suffisent à l'unicité
+    # au sein d'une même milliseconde).
+    fname = f"{time.time_ns() // 1_000_000}-{os.urandom(8).hex()}.json"
+    if settings.store_enroll_s3 and not settings.s3_bucket:
+        raise RuntimeError("S3 bucket not configured (DM_S3_BUCKET).")
+
+    # Un littéral par combinaison de cibles : le dict est construit à sa
+    # taille finale plutôt que grossi clé par clé.
+    stored: dict[str, str | bool]
+    if settings.store_enroll_locally and settings.store_enroll_s3:
+        # Disque et S3 indépendants : PUT S3 lancé en parallèle de l'écriture
+        # locale — latence max(local, s3) au lieu de la somme.
+        s3_future = _ENROLL_S3_EXECUTOR.submit(_put_enroll_s3, fname, body)
+        try:
+            local_path = _write_enroll_locally(fname, body)
+        except BaseException:
+            # PUT attendu quand même (pas d'écriture orpheline après la
+            # réponse) ; l'erreur disque reste celle remontée.
+            futures_wait([s3_future])
+            raise
+        stored = {"local": local_path, "s3": s3_future.result()}
+    elif settings.store_enroll_locally:
+        stored = {"local": _write_enroll_locally(fname, body)}
+    elif settings.store_enroll_s3:
+        stored = {"s3": _put_enroll_s3(fname, body)}
+    else:
+        stored = {}
 
-    if settings.store_enroll_s3:
-        if not settings.s3_bucket:
-            raise RuntimeError("S3 bucket not configured (DM_S3_BUCKET).")
-        key = f"{settings.s3_prefix_enroll.rstrip('/')}/{fname}"
-        s3 = s3_client()
-        s3.put_object(
-            Bucket=settings.s3_bucket,
-            Key=key,
-            Body=body,
-            ContentType="application/json",
+    if record_db:
+        _record_enroll_db(
+            email=email,
+            client_uuid=client_uuid,
+            fingerprint=fingerprint,
+            device_name=device_name,
+            source_ip=source_ip,
+            user_agent=user_agent,
         )
-        stored["s3"] = f"s3://{settings.s3_bucket}/{key}"
+    return stored
+
 
+def _record_enroll_db(
+    *,
+    email: str,
+    client_uuid: str,
+    fingerprint: str,
+    device_name: str,
+    source_ip: str | None,
+    user_agent: str | None,
+) -> None:
     encryption_key = fingerprint if fingerprint and fingerprint != "unknown" else "unknown"
     try:
         _upsert_provisioning(
@@ -2052,8 +2826,6 @@ def _persist_enroll_side_effects(
     except Exception:
         logger.exception("Failed to log enroll call")
 
-    return stored
-
 
 def _enqueue_enroll_payload(
     *,
@@ -2104,7 +2876,7 @@ def _persist_telemetry_spans(body: bytes, client_uuid: str) -> None:
     if not dsn or psycopg2 is None:
         return
     try:
-        otlp = json.loads(body)
+        otlp = _fast_json_loads(body)
     except Exception:
         return
     rows: list[tuple] = []
@@ -2127,9 +2899,13 @@ def _persist_telemetry_spans(body: bytes, client_uuid: str) -> None:
         conn = psycopg2.connect(dsn)
         try:
             with conn.cursor() as cur:
-                cur.executemany(
-                    "INSERT INTO device_telemetry_events (client_uuid, email, span_name, span_ts, attributes, plugin_version) VALUES (%s, %s, %s, %s, %s::jsonb, %s)",
+                # Un seul INSERT multi-lignes (executemany = un aller-retour par span).
+                execute_values(
+                    cur,
+                    "INSERT INTO device_telemetry_events (client_uuid, email, span_name, span_ts, attributes, plugin_version) VALUES %s",
                     rows,
+                    template="(%s, %s, %s, %s, %s::jsonb, %s)",
+                    page_size=500,
                 )
             conn.commit()
         finally:
@@ -2267,97 +3043,194 @@ def _s3_connectivity_check_worker() -> None:
         logger.info("S3 startup check: connectivity OK for bucket '%s'.", settings.s3_bucket)
     except Exception as exc:
         logger.warning("S3 startup check failed (non-blocking): %r", exc)
+    # Client partagé (s3_client, mémoïsé) construit ici, hors chemin de
+    # requête : le premier /enroll ou téléchargement ne paie pas la résolution
+    # des credentials ni le chargement des modèles botocore.
+    with contextlib.suppress(Exception):
+        s3_client()
 
 
 def _start_s3_connectivity_check_non_blocking() -> None:
     threading.Thread(target=_s3_connectivity_check_worker, daemon=True).start()
 
 
-@app.get("/healthz")
-def healthz():
-    errors: list[str] = []
-    checks: dict[str, dict[str, str]] = {}
+# Dernier résultat SAIN de /healthz, servi pendant _HEALTHZ_CACHE_TTL : les
+# sondes K8s (toutes les quelques secondes, par pod) ne refont pas à chaque fois
+# head_bucket S3 + SELECT 1 + écriture disque. Un échec n'est jamais mis en
+# cache (la reprise est vue à la sonde suivante) ; la clé inclut la config
+# sondée, donc un changement de réglage invalide l'entrée. ?fresh=1 : bypass.
+_HEALTHZ_CACHE_TTL = 5.0
+_HEALTHZ_CACHE: tuple[float, tuple, bytes] | None = None
 
-    if settings.store_enroll_locally:
-        try:
-            _ensure_dir(settings.enroll_dir)
-            test_path = os.path.join(settings.enroll_dir, ".write_test")
-            with open(test_path, "wb") as f:
-                f.write(b"ok")
-            os.remove(test_path)
-            checks["local_storage"] = {"status": "ok"}
-        except Exception as e:
-            errors.append(f"Local enroll_dir not writable: {e!r}")
-            checks["local_storage"] = {"status": "error", "detail": str(e)}
-    else:
-        checks["local_storage"] = {"status": "skipped"}
 
+def _healthz_cache_key() -> tuple:
+    return (
+        settings.store_enroll_locally, settings.enroll_dir, settings.store_enroll_s3,
+        settings.binaries_mode, settings.s3_bucket, _db_url_bootstrap() or _db_url(),
+    )
+
+
+# Sondes /healthz : indépendantes et bloquantes (disque, boto3, psycopg2) →
+# exécutées en parallèle dans le threadpool ; latence = max, pas somme.
+# Chacune renvoie (check, erreur ou None).
+# Dernière écriture de test réussie : (monotonic, enroll_dir). Le refresher
+# sonde toutes les DM_HEALTHZ_REFRESH_INTERVAL_SECONDS s ; le volume local, lui, n'est ré-écrit
+# que toutes les _LOCAL_PROBE_TTL s tant qu'il est sain (0 syscall entre deux).
+# Les échecs ne sont pas mis en cache : le retour à la normale est vu aussitôt.
+_LOCAL_PROBE_TTL = 30.0
+_LOCAL_PROBE_OK: tuple[float, str] | None = None
+
+
+def _healthz_check_local() -> tuple[dict[str, str], str | None]:
+    global _LOCAL_PROBE_OK
+    if not settings.store_enroll_locally:
+        return {"status": "skipped"}, None
+    enroll_dir = settings.enroll_dir
+    last_ok = _LOCAL_PROBE_OK
+    if (last_ok is not None and last_ok[1] == enroll_dir
+            and time.monotonic() - last_ok[0] < _LOCAL_PROBE_TTL):
+        return {"status": "ok"}, None
+    try:
+        _ensure_dir(enroll_dir)
+        test_path = os.path.join(enroll_dir, ".write_test")
+        with open(test_path, "wb") as f:
+            f.write(b"ok")
+        os.remove(test_path)
+        _LOCAL_PROBE_OK = (time.monotonic(), enroll_dir)
+        return {"status": "ok"}, None
+    except Exception as e:
+        _LOCAL_PROBE_OK = None
+        _READY_DIRS.discard(settings.enroll_dir)
+        return {"status": "error", "detail": str(e)}, f"Local enroll_dir not writable: {e!r}"
+
+
+def _healthz_check_s3() -> tuple[dict[str, str], str | None]:
     s3_required = settings.store_enroll_s3 or settings.binaries_mode in ("presign", "proxy")
-    if s3_required and not settings.s3_bucket:
-        errors.append("S3 bucket is not configured (DM_S3_BUCKET missing).")
-        checks["s3"] = {"status": "error", "detail": "bucket missing"}
-    elif s3_required and settings.s3_bucket:
-        try:
-            s3 = s3_client()
-            s3.head_bucket(Bucket=settings.s3_bucket)
-            checks["s3"] = {"status": "ok"}
-        except Exception as e:
-            errors.append(f"S3 not reachable or unauthorized: {e!r}")
-            checks["s3"] = {"status": "error", "detail": str(e)}
-    else:
-        checks["s3"] = {"status": "skipped"}
+    if not s3_required:
+        return {"status": "skipped"}, None
+    if not settings.s3_bucket:
+        return {"status": "error", "detail": "bucket missing"}, "S3 bucket is not configured (DM_S3_BUCKET missing)."
+    try:
+        s3_client().head_bucket(Bucket=settings.s3_bucket)
+        return {"status": "ok"}, None
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}, f"S3 not reachable or unauthorized: {e!r}"
 
-    db_url = _db_url_bootstrap() or _db_url()
+
+def _healthz_check_db(db_url: str | None) -> tuple[dict[str, str], str | None]:
     if not db_url:
-        errors.append("Database URL is not configured.")
-        checks["db"] = {"status": "error", "detail": "DATABASE_URL missing"}
-    elif psycopg2 is None:
-        errors.append("psycopg2 is not installed; cannot verify DB connection.")
-        checks["db"] = {"status": "error", "detail": "psycopg2 missing"}
-    else:
-        try:
-            conn = psycopg2.connect(db_url, connect_timeout=3)
-            try:
-                with conn.cursor() as cur:
+        return {"status": "error", "detail": "DATABASE_URL missing"}, "Database URL is not configured."
+    if psycopg2 is None:
+        return ({"status": "error", "detail": "psycopg2 missing"},
+                "psycopg2 is not installed; cannot verify DB connection.")
+    # Pool déjà initialisé → SELECT 1 sur une connexion réutilisée (pas de
+    # handshake TCP/TLS/auth par probe). Connexion directe sinon, ou si la
+    # connexion empruntée est cassée (redémarrage PG) : on confirme à neuf.
+    try:
+        pool_ctx = _pooled_conn(create=False)
+        if pool_ctx is not None:
+            with pool_ctx as pconn:
+                with pconn.cursor() as cur:
                     cur.execute("SELECT 1;")
-                checks["db"] = {"status": "ok"}
-            finally:
-                conn.close()
-        except Exception as e:
-            errors.append(f"DB not reachable or unauthorized: {e!r}")
-            checks["db"] = {"status": "error", "detail": str(e)}
+            return {"status": "ok"}, None
+    except Exception:
+        pass
+    try:
+        conn = psycopg2.connect(db_url, connect_timeout=3)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+        finally:
+            conn.close()
+        return {"status": "ok"}, None
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}, f"DB not reachable or unauthorized: {e!r}"
 
-    if errors:
-        return JSONResponse(
-            status_code=200,
-            media_type="application/problem+json",
-            content={
-                "type": "https://example.com/problems/dependency-check",
-                "title": "Dependency check failed",
-                "status": 200,
-                "detail": "One or more dependencies are not healthy.",
-                "checks": checks,
-                "errors": errors,
-            },
-        )
 
-    return JSONResponse(
-        status_code=200,
-        media_type="application/problem+json",
-        content={
-            "type": "https://example.com/problems/dependency-check",
-            "title": "OK",
-            "status": 200,
-            "detail": "All dependencies are healthy.",
-            "checks": checks,
-        },
+async def _healthz_probe() -> tuple[bytes, bool]:
+    """Lance les trois sondes en parallèle ; renvoie (corps JSON, sain)."""
+    results = await asyncio.gather(
+        run_in_threadpool(_healthz_check_local),
+        run_in_threadpool(_healthz_check_s3),
+        run_in_threadpool(_healthz_check_db, _db_url_bootstrap() or _db_url()),
+        return_exceptions=True,
     )
+    checks: dict[str, dict[str, str]] = {}
+    errors: list[str] = []
+    for name, result in zip(("local_storage", "s3", "db"), results, strict=True):
+        # Une sonde qui lève hors de son propre try ne doit ni masquer les
+        # autres résultats ni transformer /healthz en 500 opaque.
+        if isinstance(result, Exception):
+            check, error = {"status": "error", "detail": str(result)}, f"{name} check failed: {result!r}"
+        else:
+            check, error = result
+        checks[name] = check
+        if error:
+            errors.append(error)
+
+    content: dict[str, Any] = {
+        "type": "https://example.com/problems/dependency-check",
+        "title": "Dependency check failed" if errors else "OK",
+        "status": 200,
+        "detail": "One or more dependencies are not healthy." if errors else "All dependencies are healthy.",
+        "checks": checks,
+    }
+    if errors:
+        content["errors"] = errors
+    return FastJSONResponse(content).body, not errors
+
+
+# Rafraîchissement en tâche de fond (démarrée au startup, période
+# DM_HEALTHZ_REFRESH_INTERVAL_SECONDS, 0 = désactivé) : /healthz sert le dernier
+# résultat SAIN sans I/O. Même règle que le chemin en ligne : un échec n'est
+# jamais mis en cache — il purge l'entrée, et l'appel suivant sonde lui-même.
+# La tâche ne sonde que si /healthz a été appelé depuis moins de
+# _HEALTHZ_IDLE_AFTER s : un worker que personne ne sonde ne fait pas de
+# head_bucket S3 + SELECT 1 en continu. Sans la tâche (scripts, TestClient sans
+# lifespan) ou si elle a pris du retard, /healthz sonde en ligne comme avant.
+_HEALTHZ_IDLE_AFTER = 60.0
+_HEALTHZ_LAST_REQUEST: float | None = None
+_healthz_refresher_task: asyncio.Task | None = None
+
+
+async def _healthz_refresher() -> None:
+    global _HEALTHZ_CACHE
+    while True:
+        last = _HEALTHZ_LAST_REQUEST
+        if last is not None and time.monotonic() - last < _HEALTHZ_IDLE_AFTER:
+            try:
+                cache_key = _healthz_cache_key()
+                body, ok = await _healthz_probe()
+                _HEALTHZ_CACHE = (time.monotonic(), cache_key, body) if ok else None
+            except Exception:
+                logger.exception("Background /healthz refresh failed")
+        await asyncio.sleep(settings.healthz_refresh_interval_seconds)
+
+
+@app.get("/healthz")
+async def healthz(fresh: bool = False):
+    global _HEALTHZ_CACHE, _HEALTHZ_LAST_REQUEST
+    _HEALTHZ_LAST_REQUEST = time.monotonic()
+    cache_key = _healthz_cache_key()
+    entry = _HEALTHZ_CACHE
+    # Tâche active : marge d'une période (le résultat suivant est en route).
+    max_age = _HEALTHZ_CACHE_TTL
+    if _healthz_refresher_task is not None:
+        max_age += settings.healthz_refresh_interval_seconds
+    if (not fresh and entry is not None and entry[1] == cache_key
+            and time.monotonic() - entry[0] < max_age):
+        return Response(content=entry[2], media_type="application/problem+json",
+                        headers={"X-Cache": "HIT"})
+
+    body, ok = await _healthz_probe()
+    _HEALTHZ_CACHE = (time.monotonic(), cache_key, body) if ok else None
+    return Response(content=body, media_type="application/problem+json")
 
 
 @app.get("/livez")
 def livez():
     """Lightweight liveness endpoint (no external dependency checks)."""
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         media_type="application/problem+json",
         content={
@@ -2374,12 +3247,12 @@ def readyz():
     """Readiness: 503 until the runtime config has been loaded at least once, so
     a cold-started pod that cannot read its config is kept out of the Service."""
     if runtime_config.should_gate_requests():
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=503,
             headers={"Retry-After": "3"},
             content={"status": "starting", "ready": False, "detail": "config not loaded"},
         )
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={"status": "ok", "ready": True, "generation": runtime_config.applied_generation()},
     )
@@ -2398,7 +3271,7 @@ def internal_config_state(request: Request):
     if not expected or not hmac.compare_digest(provided, expected):
         raise HTTPException(status_code=401, detail="unauthorized")
     ident = runtime_config._pod_identity(str(settings.runtime_mode or "api"))
-    return JSONResponse({
+    return FastJSONResponse({
         "pod_name": ident["pod_name"],
         "node_name": ident["node_name"],
         "runtime_mode": ident["runtime_mode"],
@@ -2414,12 +3287,12 @@ def queue_health(request: Request):
     _queue_admin_guard(request)
     queue = _get_queue_manager()
     if not settings.queue_enabled:
-        return JSONResponse(status_code=200, content={"ok": True, "queue": {"enabled": False, "status": "disabled"}})
+        return FastJSONResponse(status_code=200, content={"ok": True, "queue": {"enabled": False, "status": "disabled"}})
     if not queue:
-        return JSONResponse(status_code=503, content={"ok": False, "queue": {"enabled": True, "status": "unavailable"}})
+        return FastJSONResponse(status_code=503, content={"ok": False, "queue": {"enabled": True, "status": "unavailable"}})
     stats = queue.stats()
     healthy = int(stats.get("stale_processing", 0)) == 0
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200 if healthy else 503,
         content={
             "ok": healthy,
@@ -2437,10 +3310,10 @@ def queue_stats(request: Request):
     _queue_admin_guard(request)
     queue = _get_queue_manager()
     if not settings.queue_enabled:
-        return JSONResponse(status_code=200, content={"ok": True, "queue": {"enabled": False, "stats": {}}})
+        return FastJSONResponse(status_code=200, content={"ok": True, "queue": {"enabled": False, "stats": {}}})
     if not queue:
-        return JSONResponse(status_code=503, content={"ok": False, "error": "queue is unavailable"})
-    return JSONResponse(status_code=200, content={"ok": True, "queue": {"enabled": True, "stats": queue.stats()}})
+        return FastJSONResponse(status_code=503, content={"ok": False, "error": "queue is unavailable"})
+    return FastJSONResponse(status_code=200, content={"ok": True, "queue": {"enabled": True, "stats": queue.stats()}})
 
 
 @app.get("/metrics")
@@ -2539,6 +3412,35 @@ def metrics():
 
 
 
+# Skip cache when enrichment headers are present (update directive is
+# device-specific). Bypass aussi sur présence de credentials relay : la réponse
+# contient alors des valeurs PAR CLIENT (llmToken signé, secrets révélés) qui ne
+# doivent jamais alimenter ni sortir du cache partagé.
+_CONFIG_CACHE_BYPASS_HEADERS = frozenset({
+    b"x-plugin-version", b"x-client-uuid", b"x-user-email",  # enrichissement
+    b"x-relay-client", b"x-client-id",  # credentials relay
+})
+
+
+# Corps des 400 de /config, constants : encodés une fois à l'import.
+_CONFIG_BAD_PROFILE_BODY = _fast_json_dumps({"ok": False, "error": "profile must be 'dev' or 'prod' or 'int' "})
+_CONFIG_UNKNOWN_DEVICE_BODY = _fast_json_dumps({"ok": False, "error": "device inconnu"})
+
+
+def _config_cache_bypassed(request: Request) -> bool:
+    """Un seul parcours des en-têtes bruts au lieu de cinq Headers.get (chacun
+    re-parcourt la liste) avant même de pouvoir servir un HIT du cache."""
+    for name, value in request.scope["headers"]:
+        if name in _CONFIG_CACHE_BYPASS_HEADERS and value.strip():
+            return True
+    return False
+
+
+def _config_profile(profile: str | None) -> str:
+    """Profil demandé, sinon DM_CONFIG_PROFILE (défaut "prod"), normalisé."""
+    return (profile or os.getenv("DM_CONFIG_PROFILE", "prod")).strip().lower()
+
+
 @app.get("/config/config.json")
 def get_config(request: Request, profile: str | None = None, device: str | None = None):
     """Return remote-config JSON (EnrichedConfigResponse v2).
@@ -2550,45 +3452,36 @@ def get_config(request: Request, profile: str | None = None, device: str | None
     - Request: /config/config.json?profile=dev|prod
     - Default: DM_CONFIG_PROFILE (defaults to "prod")
     """
-    prof = (profile or os.getenv("DM_CONFIG_PROFILE", "prod")).strip().lower()
+    prof = _config_profile(profile)
     if not prof or len(prof) > 50:
-        return JSONResponse(status_code=400, content={"ok": False, "error": "profile must be 'dev' or 'prod' or 'int' "})
+        return _json_error(_CONFIG_BAD_PROFILE_BODY, 400)
     dev = (device or "").strip().lower()
 
     # ── P2: Check config cache ──
-    # Skip cache when enrichment headers are present (update directive is device-specific)
-    _has_enrichment = bool(
-        request.headers.get("X-Plugin-Version", "").strip()
-        or request.headers.get("X-Client-UUID", "").strip()
-        or request.headers.get("X-User-Email", "").strip()
-    )
-    # Bypass aussi sur présence de credentials relay : la réponse contient alors
-    # des valeurs PAR CLIENT (llmToken signé, secrets révélés) qui ne doivent
-    # jamais alimenter ni sortir du cache partagé.
-    _has_relay_creds = bool(
-        (request.headers.get("X-Relay-Client") or request.headers.get("X-Client-Id") or "").strip()
-    )
-    _cacheable = not (_has_enrichment or _has_relay_creds)
+    _cacheable = not _config_cache_bypassed(request)
     cache_key = f"{dev or '_'}:{prof}"
     if _cacheable:
         cached = _config_cache_get(cache_key)
         if cached is not None:
-            return JSONResponse(cached, headers={"Cache-Control": "public, max-age=60", "X-Cache": "HIT"})
+            body, etag = cached
+            headers = {"Cache-Control": "public, max-age=60", "X-Cache": "HIT", "ETag": etag}
+            if _if_none_match(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
 
     device_name = dev
     device_type = dev
     plugin_id = None
     resolved_via = "unknown"
 
-    # ── STEPS 1+2: Resolve device + load template (single pooled connection) ──
-    pool_ctx = _pooled_conn()
-    if dev and pool_ctx is not None:
+    # ── STEPS 1+2: Resolve device + load template (single connection) ──
+    if dev and psycopg2 is not None and (_db_url_bootstrap() or _db_url()):
         try:
-            with pool_ctx as pconn:
-                with pconn.cursor() as rcur:
+            with _db_conn() as rconn:
+                with rconn.cursor() as rcur:
                     device_name, device_type, plugin_id, resolved_via = _resolve_device(dev, rcur)
                     if not device_name:
-                        return JSONResponse(status_code=400, content={"ok": False, "error": "device inconnu"})
+                        return _json_error(_CONFIG_UNKNOWN_DEVICE_BODY, 400)
                     if resolved_via == "alias" and plugin_id:
                         client_uuid_hdr = request.headers.get("X-Client-UUID", "")
                         _log_alias_access(rcur, alias=dev, slug=device_name,
@@ -2598,58 +3491,21 @@ def get_config(request: Request, profile: str | None = None, device: str | None
                     try:
                         cfg = _load_config_template(prof, device=device_type or None, device_name=device_name or None, cur=rcur)
                     except FileNotFoundError as e:
-                        return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
+                        return FastJSONResponse(status_code=500, content={"ok": False, "error": str(e)})
         except Exception:
             if dev in _DEVICE_TYPE_FALLBACK:
                 device_name, device_type, plugin_id, resolved_via = dev, dev, None, "fallback"
                 try:
                     cfg = _load_config_template(prof, device=device_type, device_name=device_name)
                 except FileNotFoundError as e:
-                    return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
+                    return FastJSONResponse(status_code=500, content={"ok": False, "error": str(e)})
             else:
-                return JSONResponse(status_code=400, content={"ok": False, "error": "device inconnu"})
-    elif dev:
-        # No pool — raw connect fallback
-        db_url = _db_url_bootstrap() or _db_url()
-        if psycopg2 is not None and db_url:
-            try:
-                resolve_conn = psycopg2.connect(db_url)
-                resolve_conn.autocommit = True
-                with resolve_conn.cursor() as rcur:
-                    device_name, device_type, plugin_id, resolved_via = _resolve_device(dev, rcur)
-                    if not device_name:
-                        resolve_conn.close()
-                        return JSONResponse(status_code=400, content={"ok": False, "error": "device inconnu"})
-                    if resolved_via == "alias" and plugin_id:
-                        client_uuid_hdr = request.headers.get("X-Client-UUID", "")
-                        _log_alias_access(rcur, alias=dev, slug=device_name,
-                                          plugin_id=plugin_id, client_uuid=client_uuid_hdr,
-                                          source_ip=request.client.host if request.client else None)
-                    try:
-                        cfg = _load_config_template(prof, device=device_type or None, device_name=device_name or None, cur=rcur)
-                    except FileNotFoundError as e:
-                        resolve_conn.close()
-                        return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
-                resolve_conn.close()
-            except Exception:
-                if dev in _DEVICE_TYPE_FALLBACK:
-                    device_name, device_type, plugin_id, resolved_via = dev, dev, None, "fallback"
-                else:
-                    return JSONResponse(status_code=400, content={"ok": False, "error": "device inconnu"})
-                try:
-                    cfg = _load_config_template(prof, device=device_type or None, device_name=device_name or None)
-                except FileNotFoundError as e:
-                    return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
-        else:
-            try:
-                cfg = _load_config_template(prof, device=device_type or None, device_name=device_name or None)
-            except FileNotFoundError as e:
-                return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
+                return _json_error(_CONFIG_UNKNOWN_DEVICE_BODY, 400)
     else:
         try:
             cfg = _load_config_template(prof, device=device_type or None, device_name=device_name or None)
         except FileNotFoundError as e:
-            return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
+            return FastJSONResponse(status_code=500, content={"ok": False, "error": str(e)})
 
     # ── STEP 3: Substitution + DM overrides ──
     cfg = _substitute_env(cfg)
@@ -2658,60 +3514,29 @@ def get_config(request: Request, profile: str | None = None, device: str | None
 
     # ── STEPS 4+5: Catalog overrides + access control (pooled connection) ──
     if plugin_id and psycopg2 is not None:
-        cat_ctx = _pooled_conn()
-        if cat_ctx is not None:
-            try:
-                with cat_ctx as cconn:
-                    with cconn.cursor() as ccur:
-                        cfg = _apply_catalog_overrides(cfg, plugin_id=plugin_id, profile=prof, cur=ccur)
-                        try:
-                            ccur.execute("SELECT id, access_mode, required_group FROM plugins WHERE id = %s", (plugin_id,))
-                            plugin_row = None
-                            row = ccur.fetchone()
-                            if row:
-                                plugin_row = {"id": row[0], "access_mode": row[1], "required_group": row[2]}
-                            if not _check_plugin_access(plugin_row, request, ccur):
-                                return JSONResponse({
-                                    "meta": {"schema_version": 2, "access_denied": True},
-                                    "config": {
-                                        "device_name": device_name,
-                                        "access_mode": plugin_row.get("access_mode") if plugin_row else "open",
-                                        "message": "Acces restreint. Contactez votre administrateur.",
-                                    }
-                                })
-                        except Exception:
-                            pass
-            except Exception:
-                pass
-        else:
-            db_url = _db_url_bootstrap() or _db_url()
-            if db_url:
-                try:
-                    cat_conn = psycopg2.connect(db_url)
-                    cat_conn.autocommit = True
-                    with cat_conn.cursor() as ccur:
-                        cfg = _apply_catalog_overrides(cfg, plugin_id=plugin_id, profile=prof, cur=ccur)
-                        try:
-                            ccur.execute("SELECT id, access_mode, required_group FROM plugins WHERE id = %s", (plugin_id,))
-                            plugin_row = None
-                            row = ccur.fetchone()
-                            if row:
-                                plugin_row = {"id": row[0], "access_mode": row[1], "required_group": row[2]}
-                            if not _check_plugin_access(plugin_row, request, ccur):
-                                cat_conn.close()
-                                return JSONResponse({
-                                    "meta": {"schema_version": 2, "access_denied": True},
-                                    "config": {
-                                        "device_name": device_name,
-                                        "access_mode": plugin_row.get("access_mode") if plugin_row else "open",
-                                        "message": "Acces restreint. Contactez votre administrateur.",
-                                    }
-                                })
-                        except Exception:
-                            pass
-                    cat_conn.close()
-                except Exception:
-                    pass
+        try:
+            with _db_conn() as cconn:
+                with cconn.cursor() as ccur:
+                    cfg = _apply_catalog_overrides(cfg, plugin_id=plugin_id, profile=prof, cur=ccur)
+                    try:
+                        ccur.execute("SELECT id, access_mode, required_group FROM plugins WHERE id = %s", (plugin_id,))
+                        plugin_row = None
+                        row = ccur.fetchone()
+                        if row:
+                            plugin_row = {"id": row[0], "access_mode": row[1], "required_group": row[2]}
+                        if not _check_plugin_access(plugin_row, request, ccur):
+                            return FastJSONResponse({
+                                "meta": {"schema_version": 2, "access_denied": True},
+                                "config": {
+                                    "device_name": device_name,
+                                    "access_mode": plugin_row.get("access_mode") if plugin_row else "open",
+                                    "message": "Acces restreint. Contactez votre administrateur.",
+                                }
+                            })
+                    except Exception:
+                        pass
+        except Exception:
+            pass
 
     # ── STEP 6: Inject real device_name + config_path ──
     config_obj = cfg.get("config")
@@ -2726,7 +3551,7 @@ def get_config(request: Request, profile: str | None = None, device: str | None
 
     # ── Proxy LLM : override llmEndpoint (APRÈS catalog overrides + scrub :
     # priorité garantie, et le llmToken par client posé ici n'est pas re-scrubé
-    # ni mis en cache — cf. bypass _has_relay_creds plus haut). ──
+    # ni mis en cache — cf. _CONFIG_CACHE_BYPASS_HEADERS). ──
     cfg = _apply_llm_proxy_overrides(
         cfg,
         relay_ok=bool(relay_ok),
@@ -2765,10 +3590,9 @@ def get_config(request: Request, profile: str | None = None, device: str | None
     flags: dict = {}
     forced_flags: dict = {}
 
-    enrich_ctx = _pooled_conn()
-    if enrich_ctx is not None:
+    if psycopg2 is not None:
         try:
-            with enrich_ctx as econn:
+            with _db_conn() as econn:
                 with econn.cursor() as cur:
                     _upsert_plugin_installation(
                         cur, plugin_id=plugin_id, client_uuid=client_uuid,
@@ -2814,62 +3638,7 @@ def get_config(request: Request, profile: str | None = None, device: str | None
         except Exception:
             update_directive = None
             flags = {}
-    elif psycopg2 is not None:
-        # Fallback: raw connection if pool unavailable
-        db_url = _db_url_bootstrap() or _db_url()
-        if db_url:
-            try:
-                conn = psycopg2.connect(db_url)
-                conn.autocommit = True
-                try:
-                    with conn.cursor() as cur:
-                        _upsert_plugin_installation(
-                            cur, plugin_id=plugin_id, client_uuid=client_uuid,
-                            email=email, version=plugin_version,
-                        )
-                        device_cohort_ids = _resolve_device_cohorts(
-                            cur, email=email, client_uuid=client_uuid
-                        )
-                        flags = _resolve_feature_flags(
-                            cur,
-                            device_cohort_ids=device_cohort_ids,
-                            plugin_version=plugin_version,
-                            plugin_slug=device_name or "",
-                        )
-                        forced_flags = _resolve_forced_flags(
-                            cur,
-                            plugin_version=plugin_version,
-                            plugin_slug=device_name or "",
-                        )
-                        campaign = _resolve_active_campaign(
-                            cur,
-                            device_cohort_ids=device_cohort_ids,
-                            device_type=device_type or "misc",
-                            platform_version=platform_version,
-                        )
-                        update_directive = _build_update_directive(
-                            plugin_version=plugin_version,
-                            campaign=campaign,
-                            client_uuid=client_uuid,
-                            device_name=device_name or "",
-                        )
-                        if update_directive is not None and campaign and client_uuid:
-                            try:
-                                _upsert_campaign_device_status(
-                                    cur,
-                                    campaign_id=campaign["campaign_id"],
-                                    client_uuid=client_uuid,
-                                    email=email,
-                                    version_before=plugin_version,
-                                )
-                            except Exception:
-                                logger.debug("campaign_device_status upsert skipped (table may not exist)")
-                finally:
-                    conn.close()
-            except Exception:
-                update_directive = None
-                flags = {}
-                forced_flags = {}
+            forced_flags = {}
 
     # ---- Step 10: Build final EnrichedConfigResponse
     inner_config = cfg.get("config") if isinstance(cfg.get("config"), dict) else cfg
@@ -2905,13 +3674,20 @@ def get_config(request: Request, profile: str | None = None, device: str | None
 
     # P2: Cache the response only for generic requests (no enrichment headers,
     # no relay credentials — the latter carry per-client tokens/secrets).
-    if _cacheable:
-        _config_cache_set(cache_key, response_body)
-
-    return JSONResponse(response_body, headers={
+    response = FastJSONResponse(response_body, headers={
         "Cache-Control": "public, max-age=60" if _cacheable else "no-store",
         "X-Cache": "MISS",
     })
+    etag = _config_etag(response, response_body)
+    response.headers["ETag"] = etag
+    if _cacheable:
+        _config_cache_set(cache_key, response.body, etag)
+    # Client déjà à jour : 304 sans corps (le rendu a eu lieu, pas le transfert).
+    if _if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={
+            "Cache-Control": response.headers["cache-control"], "X-Cache": "MISS", "ETag": etag,
+        })
+    return response
 
 
 @app.get("/config/{device}/config.json")
@@ -2927,17 +3703,17 @@ def clear_config_cache(request: Request):
     to clear only a specific entry, or no body to flush everything.
     """
     _config_cache_clear()
-    return JSONResponse({"ok": True, "message": "Config cache cleared"})
+    return FastJSONResponse({"ok": True, "message": "Config cache cleared"})
 
 
 @app.get("/telemetry/token")
 def get_telemetry_token(request: Request, profile: str | None = None, device: str | None = None):
-    prof = (profile or os.getenv("DM_CONFIG_PROFILE", "prod")).strip().lower()
+    prof = _config_profile(profile)
     dev = (device or "").strip().lower()
     req_client_uuid = request.headers.get("X-Client-UUID", "").strip()
 
     if not settings.telemetry_enabled:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=200,
             content={
                 "telemetryEnabled": False,
@@ -2949,7 +3725,7 @@ def get_telemetry_token(request: Request, profile: str | None = None, device: st
                                        client_uuid=req_client_uuid)
     if settings.telemetry_require_token and not token:
         raise HTTPException(status_code=503, detail="Telemetry signing key is not configured.")
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={
             "telemetryEnabled": True,
@@ -2973,9 +3749,9 @@ def relay_authorize(request: Request, target: str | None = None):
         require_proxy_token=True,
     )
     if not ok:
-        return JSONResponse(status_code=403, content={"ok": False, "error": str(info)})
+        return FastJSONResponse(status_code=403, content={"ok": False, "error": str(info)})
     meta = info if isinstance(info, dict) else {}
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=200,
         content={
             "ok": True,
@@ -2996,8 +3772,8 @@ def relay_introspect(request: Request, target: str | None = None):
         require_proxy_token=False,
     )
     if not ok:
-        return JSONResponse(status_code=401, content={"ok": False, "error": str(info)})
-    return JSONResponse(status_code=200, content={"ok": True, "relay": info})
+        return FastJSONResponse(status_code=401, content={"ok": False, "error": str(info)})
+    return FastJSONResponse(status_code=200, content={"ok": True, "relay": info})
 
 @app.api_route("/v1/traces", methods=["POST", "OPTIONS"])
 @app.api_route("/telemetry/v1/traces", methods=["POST", "OPTIONS"])
@@ -3007,11 +3783,18 @@ async def telemetry_traces(request: Request):
     if not settings.telemetry_enabled:
         raise HTTPException(status_code=503, detail="Telemetry relay is disabled.")
 
-    body = await request.body()
+    # Même lecture bornée que /enroll : un Content-Length trop grand est
+    # rejeté sans lire le corps, un flux chunked est coupé à la limite.
+    body = await _read_body_limited(request, TELEMETRY_MAX_BODY_BYTES)
+    if body is None:
+        return _json_error(_TELEMETRY_TOO_LARGE_BODY, 413)
     if len(body) == 0:
-        return JSONResponse(status_code=400, content={"ok": False, "error": "Empty telemetry payload"})
-    if len(body) > TELEMETRY_MAX_BODY_BYTES:
-        return JSONResponse(status_code=413, content={"ok": False, "error": "Telemetry payload too large"})
+        return _json_error(_TELEMETRY_EMPTY_BODY, 400)
+
+    # Tous les en-têtes utiles (fallback d'identité compris) en un seul parcours.
+    client_uuid_hdr, plugin_uuid_hdr, content_type, user_agent, idem_header, request_id = (
+        _scan_headers(request, _TELEMETRY_HEADERS)
+    )
 
     if settings.telemetry_require_token:
         token = _extract_bearer_token(request)
@@ -3034,11 +3817,7 @@ async def telemetry_traces(request: Request):
         if not client_uuid:
             # Fallback: accept X-Client-UUID header for pre-enrollment devices,
             # expired tokens, or tokens mintés sans identité (cache partagé).
-            header_uuid = (
-                request.headers.get("x-client-uuid")
-                or request.headers.get("x-plugin-uuid")
-                or ""
-            ).strip()
+            header_uuid = (client_uuid_hdr or plugin_uuid_hdr or "").strip()
             if header_uuid:
                 client_uuid = _normalize_client_uuid(header_uuid)
         if not client_uuid:
@@ -3053,27 +3832,46 @@ async def telemetry_traces(request: Request):
     else:
         client_uuid = "telemetry-open"
 
+    if content_type is None:
+        content_type = "application/json"
+    idempotency_key = (idem_header or request_id or "").strip()
+    dedupe_key = f"telemetry:{client_uuid}:{idempotency_key}" if idempotency_key else None
+
+    # Blocking : log DB + enqueue / forward upstream — hors event-loop.
+    return await run_in_threadpool(
+        _telemetry_relay_sync,
+        body=body,
+        content_type=content_type,
+        user_agent=user_agent,
+        client_uuid=client_uuid,
+        dedupe_key=dedupe_key,
+        source_ip=request.client.host if request.client else None,
+    )
+
+
+def _telemetry_relay_sync(
+    *,
+    body: bytes,
+    content_type: str,
+    user_agent: str | None,
+    client_uuid: str,
+    dedupe_key: str | None,
+    source_ip: str | None,
+) -> Response:
+    """Partie bloquante de /telemetry/v1/traces (log DB, enqueue ou forward
+    upstream + persist des spans) — exécutée en threadpool par l'endpoint async."""
     try:
         _log_device_connection(
             action="TELEMETRY_RELAY",
             email="telemetry@local",
             client_uuid=client_uuid,
             encryption_key_fingerprint="none",
-            source_ip=request.client.host if request.client else None,
-            user_agent=request.headers.get("user-agent"),
+            source_ip=source_ip,
+            user_agent=user_agent,
         )
     except Exception:
         logger.exception("Failed to log telemetry relay call")
 
-    content_type = request.headers.get("content-type", "application/json")
-    user_agent = request.headers.get("user-agent")
-    idempotency_key = (
-        request.headers.get("x-idempotency-key")
-        or request.headers.get("x-request-id")
-        or ""
-    ).strip()
-    dedupe_key = f"telemetry:{client_uuid}:{idempotency_key}" if idempotency_key else None
-
     queued, job_id = _enqueue_telemetry_payload(
         body=body,
         content_type=content_type,
@@ -3082,7 +3880,7 @@ async def telemetry_traces(request: Request):
         dedupe_key=dedupe_key,
     )
     if queued:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=202,
             content={"ok": True, "queued": True, "jobId": job_id},
         )
@@ -3092,12 +3890,18 @@ async def telemetry_traces(request: Request):
         content_type=content_type,
         user_agent=user_agent,
     )
-    # When queue is unavailable, persist spans directly after forwarding
+    # When queue is unavailable, persist spans directly after forwarding —
+    # en tâche de fond, après l'envoi de la réponse : l'INSERT des spans ne
+    # rallonge plus la latence du relais.
+    response.background = BackgroundTask(_persist_telemetry_spans_direct, body, client_uuid)
+    return response
+
+
+def _persist_telemetry_spans_direct(body: bytes, client_uuid: str) -> None:
     try:
         _persist_telemetry_spans(body, client_uuid)
     except Exception:
         logger.exception("Failed to persist telemetry spans (direct path)")
-    return response
 
 
 def _enroll_persist_sync(
@@ -3139,6 +3943,7 @@ def _enroll_persist_sync(
                 device_name=device_name,
                 source_ip=source_ip,
                 user_agent=user_agent,
+                record_db=False,
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Cannot persist enroll payload: {e!r}") from e
@@ -3146,27 +3951,62 @@ def _enroll_persist_sync(
     return relay_data, stored, queued, job_id
 
 
+async def _read_body_limited(request: Request, limit: int) -> bytes | None:
+    """Corps de requête borné : None si > ``limit`` octets.
+
+    Content-Length annoncé trop grand → rejet sans rien lire ; sinon lecture
+    en flux, abandonnée dès le dépassement (un Content-Length absent ou
+    mensonger ne permet pas de faire allouer plus que ``limit``).
+    """
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        return None
+    # Chunks gardés tels quels : un corps reçu en un seul message ASGI (cas
+    # courant d'un payload enroll) est rendu sans aucune copie ; sinon une
+    # seule concaténation finale (pas de bytearray ré-alloué puis recopié).
+    chunks: list[bytes] = []
+    size = 0
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    if len(chunks) == 1:
+        return chunks[0]
+    return b"".join(chunks)
+
+
 @app.api_route("/enroll", methods=["POST", "PUT", "OPTIONS"])
 async def enroll(request: Request):
     if request.method == "OPTIONS":
         return Response(status_code=204)
 
-    body = await request.body()
+    body = await _read_body_limited(request, MAX_BODY_BYTES)
+    if body is None:
+        return _json_error(_ENROLL_TOO_LARGE_BODY, 413)
     if len(body) == 0:
-        return JSONResponse(status_code=400, content={"ok": False, "error": "Empty body"})
-    if len(body) > MAX_BODY_BYTES:
-        return JSONResponse(status_code=413, content={"ok": False, "error": "Body too large"})
+        return _json_error(_ENROLL_EMPTY_BODY, 400)
+    # Corps qui ne peut pas commencer une valeur JSON (formulaires, HTML,
+    # sondes de scanners) : rejeté sans passer par le parseur.
+    # Parcours par index : pas de copie du corps comme avec lstrip().
+    i, n = 0, len(body)
+    while i < n and body[i] in _JSON_WHITESPACE:
+        i += 1
+    if i == n or body[i] not in _JSON_VALUE_START:
+        return _json_error(_ENROLL_INVALID_JSON_BODY, 400)
 
     try:
-        body_obj = json.loads(body.decode("utf-8"))
+        body_obj = _fast_json_loads(body)
     except Exception:
-        return JSONResponse(status_code=400, content={"ok": False, "error": "Body is not valid JSON"})
+        return _json_error(_ENROLL_INVALID_JSON_BODY, 400)
     if not isinstance(body_obj, dict):
-        return JSONResponse(status_code=400, content={"ok": False, "error": "Body must be a JSON object"})
+        return _json_error(_ENROLL_NOT_OBJECT_BODY, 400)
 
-    missing = _validate_enroll_payload(body_obj)
+    fields, missing = _validate_enroll_payload(body_obj)
     if missing:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=400,
             content={
                 "ok": False,
@@ -3186,26 +4026,23 @@ async def enroll(request: Request):
         auth_email = ""
     logger.info("Enroll: auth_email=%r", auth_email)
     if not auth_email:
-        return JSONResponse(
-            status_code=401,
-            content={"ok": False, "error": "Missing or invalid PKCE access token."},
-        )
+        return _json_error(_ENROLL_UNAUTHORIZED_BODY, 401)
 
-    device_name = str(body_obj.get("device_name", "")).strip()
-    plugin_uuid = str(body_obj.get("plugin_uuid", "")).strip()
+    device_name = fields["device_name"]
     email = auth_email
-    _email, client_uuid, fingerprint = _extract_identity(request, body_obj=body_obj)
-    if plugin_uuid:
-        client_uuid = plugin_uuid
-    client_uuid = _normalize_client_uuid(client_uuid)
+    # plugin_uuid (requis, validé ci-dessus) fait office de client_uuid et
+    # l'email vient du jeton : seule l'empreinte reste à lire, avec les autres
+    # en-têtes utiles, en un seul parcours.
+    client_uuid = _normalize_client_uuid(fields["plugin_uuid"])
+    fp_header, user_agent, idem_header, request_id = _scan_headers(request, _ENROLL_HEADERS)
+    fingerprint = fp_header or body_obj.get("encryption_key_fingerprint") or "unknown"
+    # Seuls les octets bruts sont persistés : l'arbre parsé (plusieurs fois la
+    # taille du corps, jusqu'à MAX_BODY_BYTES) est libéré avant l'aller-retour
+    # disque/S3/DB — le pic mémoire par enroll en vol n'en garde qu'une copie.
+    del body_obj
     source_ip = request.client.host if request.client else None
-    user_agent = request.headers.get("user-agent")
 
-    idempotency_key = (
-        request.headers.get("x-idempotency-key")
-        or request.headers.get("x-request-id")
-        or ""
-    ).strip()
+    idempotency_key = (idem_header or request_id or "").strip()
     dedupe_key = f"enroll:{client_uuid}:{idempotency_key}" if idempotency_key else None
 
     # Blocking : DB (relay mint, enqueue) + éventuellement disque/S3 (persist) —
@@ -3224,8 +4061,20 @@ async def enroll(request: Request):
         dedupe_key=dedupe_key,
     )
 
-    return JSONResponse(
+    # Chemin synchrone (pas de file) : provisioning + log DB après l'envoi de
+    # la réponse — aucun aller-retour DB de plus sur le chemin critique.
+    record_db = None if queued else BackgroundTask(
+        _record_enroll_db,
+        email=email,
+        client_uuid=client_uuid,
+        fingerprint=fingerprint,
+        device_name=device_name,
+        source_ip=source_ip,
+        user_agent=user_agent,
+    )
+    return FastJSONResponse(
         status_code=201,
+        background=record_db,
         content={
             "ok": True,
             "stored": stored,
@@ -3277,7 +4126,7 @@ def _update_campaign_device_status_sync(
             )
         conn.close()
     except Exception as e:
-        logger.warning(f"update/status DB error: {e}")
+        logger.warning("update/status DB error: %s", e)
 
 
 @app.post("/update/status")
@@ -3289,11 +4138,13 @@ async def report_update_status(request: Request):
         # Blocking : lookup DB du client relay — hors event-loop.
         ok, relay_info = await run_in_threadpool(_relay_auth_from_request, request)
         if not ok:
-            return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+            return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
     try:
-        body = await request.json()
+        # Parse C (orjson) des octets bruts : request.json() passerait par
+        # json.loads de la stdlib, sur un endpoint appelé par chaque poste.
+        body = _fast_json_loads(await request.body())
     except Exception:
-        return JSONResponse({"ok": False, "error": "Invalid JSON"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "Invalid JSON"}, status_code=400)
 
     campaign_id = body.get("campaign_id")
     client_uuid = body.get("client_uuid", "")
@@ -3304,14 +4155,14 @@ async def report_update_status(request: Request):
 
     allowed = ("installed", "failed", "checksum_error", "download_error", "deferred")
     if status not in allowed:
-        return JSONResponse({"ok": False, "error": f"status must be one of {allowed}"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": f"status must be one of {allowed}"}, status_code=400)
     if not client_uuid:
-        return JSONResponse({"ok": False, "error": "client_uuid required"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "client_uuid required"}, status_code=400)
     # Bind the reported client_uuid to the authenticated relay client.
     if isinstance(relay_info, dict):
         authed_uuid = relay_info.get("client_uuid")
         if authed_uuid and str(client_uuid) != str(authed_uuid):
-            return JSONResponse({"ok": False, "error": "client_uuid mismatch"}, status_code=403)
+            return FastJSONResponse({"ok": False, "error": "client_uuid mismatch"}, status_code=403)
 
     await run_in_threadpool(
         _update_campaign_device_status_sync,
@@ -3323,7 +4174,7 @@ async def report_update_status(request: Request):
         error_detail=error_detail,
     )
 
-    return JSONResponse({"ok": True, "status": status})
+    return FastJSONResponse({"ok": True, "status": status})
 
 
 # ── Campaign REST API ───────────────────────────────────────────────────
@@ -3351,16 +4202,16 @@ async def api_plugin_deploy(slug: str, request: Request):
       - cohort_id (int, optional): target cohort
     """
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
 
     form = await request.form()
     binary = form.get("binary")
     if not binary or not hasattr(binary, "read"):
-        return JSONResponse({"ok": False, "error": "binary file required"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "binary file required"}, status_code=400)
 
     data = await binary.read()
     if not data:
-        return JSONResponse({"ok": False, "error": "empty file"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "empty file"}, status_code=400)
     orig_filename = binary.filename or ""
 
     version = str(form.get("version", "")).strip()
@@ -3370,7 +4221,7 @@ async def api_plugin_deploy(slug: str, request: Request):
 
     db_url = _db_url_bootstrap() or _db_url()
     if not psycopg2 or not db_url:
-        return JSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
 
     # Blocking : DB + parsing zip + persist binaire (disque/S3) — un seul
     # aller-retour dans le threadpool, hors event-loop.
@@ -3395,7 +4246,7 @@ def _deploy_plugin_db_work(
             cur.execute("SELECT id, device_type, name FROM plugins WHERE slug = %s AND status = 'active'", (slug,))
             prow = cur.fetchone()
             if not prow:
-                return JSONResponse({"ok": False, "error": f"Plugin '{slug}' not found"}, status_code=404)
+                return FastJSONResponse({"ok": False, "error": f"Plugin '{slug}' not found"}, status_code=404)
             plugin_id, device_type, plugin_name = prow
 
             # 2. Auto-detect version from package if not provided
@@ -3421,7 +4272,7 @@ def _deploy_plugin_db_work(
                 except Exception:
                     pass
             if not version:
-                return JSONResponse({"ok": False, "error": "version required (not detected in package)"}, status_code=400)
+                return FastJSONResponse({"ok": False, "error": "version required (not detected in package)"}, status_code=400)
 
             # 3. Extract dm-config.json and dm-manifest.json
             deploy_config_template = None
@@ -3556,7 +4407,7 @@ def _deploy_plugin_db_work(
             ))
             campaign_id = cur.fetchone()[0]
 
-        return JSONResponse({
+        return FastJSONResponse({
             "ok": True,
             "plugin_id": plugin_id,
             "version": version,
@@ -3569,7 +4420,7 @@ def _deploy_plugin_db_work(
         }, status_code=201)
     except Exception as e:
         logger.exception("api_plugin_deploy failed")
-        return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": str(e)}, status_code=500)
     finally:
         conn.close()
 
@@ -3578,15 +4429,15 @@ def _deploy_plugin_db_work(
 async def api_create_campaign(request: Request):
     """Create a new campaign via REST API."""
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
     try:
         body = await request.json()
     except Exception:
-        return JSONResponse({"ok": False, "error": "Invalid JSON"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "Invalid JSON"}, status_code=400)
 
     db_url = _db_url_bootstrap() or _db_url()
     if not db_url:
-        return JSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
 
     # Blocking (DB) — hors event-loop.
     return await run_in_threadpool(_create_campaign_db_work, body, db_url)
@@ -3644,43 +4495,44 @@ def _create_campaign_db_work(body: dict, db_url: str):
             )
             campaign_id = cur.fetchone()[0]
         conn.close()
-        return JSONResponse({"ok": True, "campaign_id": campaign_id}, status_code=201)
+        return FastJSONResponse({"ok": True, "campaign_id": campaign_id}, status_code=201)
     except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": str(e)}, status_code=500)
 
 
 @app.patch("/api/campaigns/{campaign_id}/start")
 async def api_start_campaign(campaign_id: int, request: Request):
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
-    return _api_campaign_action(campaign_id, "active")
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+    return await run_in_threadpool(_api_campaign_action, campaign_id, "active")
 
 
 @app.patch("/api/campaigns/{campaign_id}/pause")
 async def api_pause_campaign(campaign_id: int, request: Request):
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
-    return _api_campaign_action(campaign_id, "paused")
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+    return await run_in_threadpool(_api_campaign_action, campaign_id, "paused")
 
 
 @app.patch("/api/campaigns/{campaign_id}/resume")
 async def api_resume_campaign(campaign_id: int, request: Request):
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
-    return _api_campaign_action(campaign_id, "active")
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+    return await run_in_threadpool(_api_campaign_action, campaign_id, "active")
 
 
 @app.patch("/api/campaigns/{campaign_id}/abort")
 async def api_abort_campaign(campaign_id: int, request: Request):
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
-    return _api_campaign_action(campaign_id, "rolled_back")
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+    return await run_in_threadpool(_api_campaign_action, campaign_id, "rolled_back")
 
 
 def _api_campaign_action(campaign_id: int, new_status: str):
+    """Partie bloquante des PATCH /api/campaigns/{id}/* — exécutée en threadpool."""
     db_url = _db_url()
     if not db_url:
-        return JSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
     try:
         conn = psycopg2.connect(db_url)
         conn.autocommit = True
@@ -3692,21 +4544,27 @@ def _api_campaign_action(campaign_id: int, new_status: str):
             row = cur.fetchone()
         conn.close()
         if not row:
-            return JSONResponse({"ok": False, "error": "Campaign not found"}, status_code=404)
-        return JSONResponse({"ok": True, "campaign_id": campaign_id, "status": new_status})
+            return FastJSONResponse({"ok": False, "error": "Campaign not found"}, status_code=404)
+        return FastJSONResponse({"ok": True, "campaign_id": campaign_id, "status": new_status})
     except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": str(e)}, status_code=500)
 
 
 @app.get("/api/campaigns/{campaign_id}/progress")
 async def api_campaign_progress(campaign_id: int, request: Request):
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
 
     db_url = _db_url()
     if not db_url:
-        return JSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
 
+    # Blocking (DB) — hors event-loop.
+    return await run_in_threadpool(_campaign_progress_db_work, campaign_id, db_url)
+
+
+def _campaign_progress_db_work(campaign_id: int, db_url: str):
+    """Partie bloquante de GET /api/campaigns/{id}/progress — exécutée en threadpool."""
     try:
         conn = psycopg2.connect(db_url)
         conn.autocommit = True
@@ -3715,7 +4573,7 @@ async def api_campaign_progress(campaign_id: int, request: Request):
             camp_row = cur.fetchone()
             if not camp_row:
                 conn.close()
-                return JSONResponse({"ok": False, "error": "Campaign not found"}, status_code=404)
+                return FastJSONResponse({"ok": False, "error": "Campaign not found"}, status_code=404)
 
             camp_status, rollout_config = camp_row
 
@@ -3747,7 +4605,7 @@ async def api_campaign_progress(campaign_id: int, request: Request):
                     current_stage = s.get("label", "unknown")
                     break
 
-        return JSONResponse({
+        return FastJSONResponse({
             "ok": True,
             "campaign_id": campaign_id,
             "status": camp_status,
@@ -3760,14 +4618,19 @@ async def api_campaign_progress(campaign_id: int, request: Request):
             "failure_rate": failure_rate,
         })
     except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": str(e)}, status_code=500)
+
+
+# Validateurs des segments de chemin d'un artefact, compilés une fois à l'import.
+_ARTIFACT_DEVICE_TYPE_RE = re.compile(r"[A-Za-z0-9_-]+")
+_ARTIFACT_NAME_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._+-]*")
 
 
 @app.post("/api/artifacts")
 async def api_upload_artifact(request: Request):
     """Upload an artifact binary via REST API."""
     if not _verify_admin_token(request):
-        return JSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
+        return FastJSONResponse({"ok": False, "error": "Unauthorized"}, status_code=401)
 
     form = await request.form()
     device_type = form.get("device_type", "libreoffice")
@@ -3776,20 +4639,28 @@ async def api_upload_artifact(request: Request):
     binary = form.get("binary")
 
     if not version or not binary:
-        return JSONResponse({"ok": False, "error": "version and binary required"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "version and binary required"}, status_code=400)
 
     # VULN-002: validate path components to prevent traversal; reduce filename to
     # its basename and resolve the storage path through _safe_path_join.
-    if not re.fullmatch(r"[A-Za-z0-9_-]+", device_type):
-        return JSONResponse({"ok": False, "error": "invalid device_type"}, status_code=400)
-    if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9._+-]*", version):
-        return JSONResponse({"ok": False, "error": "invalid version"}, status_code=400)
+    if not _ARTIFACT_DEVICE_TYPE_RE.fullmatch(device_type):
+        return FastJSONResponse({"ok": False, "error": "invalid device_type"}, status_code=400)
+    if not _ARTIFACT_NAME_RE.fullmatch(version):
+        return FastJSONResponse({"ok": False, "error": "invalid version"}, status_code=400)
     data = await binary.read()
-    checksum = "sha256:" + hashlib.sha256(data).hexdigest()
     filename = os.path.basename(binary.filename or f"mirai-{version}.oxt")
-    if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9._+-]*", filename):
-        return JSONResponse({"ok": False, "error": "invalid filename"}, status_code=400)
+    if not _ARTIFACT_NAME_RE.fullmatch(filename):
+        return FastJSONResponse({"ok": False, "error": "invalid filename"}, status_code=400)
+
+    # Blocking (hash, disque, DB) — hors event-loop.
+    return await run_in_threadpool(
+        _store_artifact_work, data, device_type, version, filename, changelog_url,
+    )
+
 
+def _store_artifact_work(data: bytes, device_type: str, version: str, filename: str, changelog_url: str):
+    """Partie bloquante de POST /api/artifacts — exécutée en threadpool."""
+    checksum = "sha256:" + hashlib.sha256(data).hexdigest()
     # Save locally
     _binaries_base = os.getenv("DM_LOCAL_BINARIES_DIR", "/data/content/binaries")
     binaries_dir = _safe_path_join(_binaries_base, device_type)
@@ -3801,7 +4672,7 @@ async def api_upload_artifact(request: Request):
 
     db_url = _db_url()
     if not db_url:
-        return JSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": "Database not configured"}, status_code=500)
 
     try:
         conn = psycopg2.connect(db_url)
@@ -3817,9 +4688,9 @@ async def api_upload_artifact(request: Request):
             )
             artifact_id = cur.fetchone()[0]
         conn.close()
-        return JSONResponse({"ok": True, "artifact_id": artifact_id, "checksum": checksum}, status_code=201)
+        return FastJSONResponse({"ok": True, "artifact_id": artifact_id, "checksum": checksum}, status_code=201)
     except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
+        return FastJSONResponse({"ok": False, "error": str(e)}, status_code=500)
 
 
 @app.get("/catalog/icons/{filename}")
@@ -3841,11 +4712,11 @@ def api_public_plugins():
     public_base = (os.getenv("PUBLIC_BASE_URL") or "").rstrip("/")
     db_url = _db_url_bootstrap() or _db_url()
     if not psycopg2 or not db_url:
-        return JSONResponse({"plugins": [], "total": 0}, headers={"Access-Control-Allow-Origin": "*"})
+        return FastJSONResponse({"plugins": [], "total": 0}, headers={"Access-Control-Allow-Origin": "*"})
     conn = psycopg2.connect(db_url)
     conn.autocommit = True
     try:
-        with conn.cursor() as cur:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
                 SELECT p.id, p.slug, p.name, p.intent, p.device_type, p.category, p.publisher,
                        p.maturity, p.access_mode, p.icon_url, p.icon_path, p.key_features, p.source_url,
@@ -3857,8 +4728,7 @@ def api_public_plugins():
                 WHERE p.status = 'active' AND p.visibility IN ('public','internal')
                 GROUP BY p.id ORDER BY p.name
             """)
-            cols = [d[0] for d in cur.description]
-            rows = [dict(zip(cols, r, strict=False)) for r in cur.fetchall()]
+            rows = cur.fetchall()
 
         maturity_labels = {"dev":"Dev","alpha":"Alpha","beta":"Beta","pre-release":"Pre-release","release":"Stable"}
         plugins = []
@@ -3892,7 +4762,7 @@ def api_public_plugins():
                 "detail_url": f"{public_base}/catalog/{p['slug']}",
                 "download_url": f"{public_base}/catalog/{p['slug']}/download",
             })
-        return JSONResponse(
+        return FastJSONResponse(
             {"plugins": plugins, "total": len(plugins),
              "generated_at": datetime.now(UTC).isoformat()},
             headers={"Access-Control-Allow-Origin": "*", "Cache-Control": "public, max-age=300"},
@@ -3941,7 +4811,7 @@ def api_public_plugin_detail(slug: str):
             icon = f"{public_base}/catalog/api/plugins/{p['slug']}/icon"
         else:
             icon = None
-        return JSONResponse({
+        return FastJSONResponse({
             "id": p["id"],
             "slug": p["slug"], "name": p["name"], "description": p.get("description") or "",
             "intent": p.get("intent") or "", "device_type": p["device_type"],
@@ -4047,7 +4917,7 @@ def api_catalog_status():
         except Exception:
             services[name] = "error"
     all_ok = all(v == "ok" for v in services.values())
-    return JSONResponse({
+    return FastJSONResponse({
         "status": "ok" if all_ok else "degraded",
         "status_label": "Tous les services sont operationnels" if all_ok else "Service degrade",
         "services": services,
@@ -4056,22 +4926,24 @@ def api_catalog_status():
 
 # ─── Monitoring Endpoints ────────────────────────────────────────────────
 
+def _ops_timed_probe(fn) -> dict:
+    t0 = time.monotonic()
+    try:
+        detail = fn()
+        return {"status": "ok", "latency_ms": round((time.monotonic()-t0)*1000), "detail": detail}
+    except Exception as e:
+        return {"status": "error", "latency_ms": round((time.monotonic()-t0)*1000), "detail": str(e)[:100]}
+
+
 @app.get("/ops/health/full")
-def ops_health_full():
+async def ops_health_full():
     """Detailed health for Grafana/alerting."""
-    import time as _time
     import urllib.request as urlreq
 
-    checks = {}
     critical_svcs = {"postgres"}
-
-    def _do(name, fn):
-        t0 = _time.monotonic()
-        try:
-            detail = fn()
-            checks[name] = {"status": "ok", "latency_ms": round((_time.monotonic()-t0)*1000), "detail": detail}
-        except Exception as e:
-            checks[name] = {"status": "error", "latency_ms": round((_time.monotonic()-t0)*1000), "detail": str(e)[:100]}
+    # Sondes collectées puis lancées en parallèle (threadpool) : la latence de
+    # l'endpoint est celle de la plus lente, pas la somme des timeouts (5+10+3 s).
+    probes: list[tuple[str, Any]] = []
 
     db_url = _db_url_bootstrap() or _db_url()
     if psycopg2 and db_url:
@@ -4080,7 +4952,7 @@ def ops_health_full():
             c.cursor().execute("SELECT 1")
             c.close()
             return "ok"
-        _do("postgres", _db)
+        probes.append(("postgres", _db))
 
     # Keycloak: probe the endpoint the app ACTUALLY uses for token validation —
     # the JWKS URL (DM_AUTH_JWKS_URL) reached via the WireGuard relay proxy, with
@@ -4095,23 +4967,26 @@ def ops_health_full():
         or (f"{public_issuer}/.well-known/openid-configuration" if public_issuer else "")
     )
     if kc_probe:
-        _do("keycloak", lambda: (urlreq.urlopen(kc_probe, timeout=5).close() or "ok"))
+        probes.append(("keycloak", lambda: (urlreq.urlopen(kc_probe, timeout=5).close() or "ok")))
 
     llm_url = os.getenv("LLM_BASE_URL", "")
     if llm_url:
-        _do("llm", lambda: (urlreq.urlopen(urlreq.Request(f"{llm_url.rstrip('/')}/models",
-             headers={"Authorization": f"Bearer {os.getenv('LLM_API_TOKEN','')}"}), timeout=10).close() or "ok"))
+        probes.append(("llm", lambda: (urlreq.urlopen(urlreq.Request(f"{llm_url.rstrip('/')}/models",
+             headers={"Authorization": f"Bearer {os.getenv('LLM_API_TOKEN','')}"}), timeout=10).close() or "ok")))
 
     # Relay: the relay-assistant K8s Service listens on port 80 (targetPort 8080).
     # Probing :8080 directly bypassed the Service and timed out (false "error").
     relay_base = os.getenv("DM_RELAY_ASSISTANT_URL", "http://relay-assistant").rstrip("/")
-    _do("relay", lambda: (urlreq.urlopen(f"{relay_base}/healthz", timeout=3).close() or "ok"))
+    probes.append(("relay", lambda: (urlreq.urlopen(f"{relay_base}/healthz", timeout=3).close() or "ok")))
+
+    results = await asyncio.gather(*(run_in_threadpool(_ops_timed_probe, fn) for _, fn in probes))
+    checks = {name: result for (name, _), result in zip(probes, results, strict=True)}
 
     has_critical = any(checks.get(s, {}).get("status") == "error" for s in critical_svcs)
     has_any_err = any(v.get("status") == "error" for v in checks.values())
     global_status = "error" if has_critical else ("degraded" if has_any_err else "ok")
 
-    return JSONResponse({
+    return FastJSONResponse({
         "status": global_status,
         "checked_at": datetime.now(UTC).isoformat(),
         "services": checks,
@@ -4212,7 +5087,7 @@ def catalog_index(request: Request, category: str | None = None):
         else:
             conn = psycopg2.connect(db_url)
             conn.autocommit = True
-        with conn.cursor() as cur:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
                 SELECT p.slug, p.name, p.intent, p.device_type, p.category, p.publisher,
                        p.maturity, p.icon_url, p.icon_path, p.key_features,
@@ -4224,8 +5099,7 @@ def catalog_index(request: Request, category: str | None = None):
                 WHERE p.status = 'active' AND p.visibility IN ('public','internal')
                 GROUP BY p.id ORDER BY p.name
             """)
-            cols = [d[0] for d in cur.description]
-            rows = [dict(zip(cols, r, strict=False)) for r in cur.fetchall()]
+            rows = cur.fetchall()
 
         # Build category list and filter
         all_categories = sorted({r.get("category") or "" for r in rows} - {""})
@@ -4493,6 +5367,77 @@ def _with_bootstrap_cursor(fn):
             conn.close()
 
 
+# Proxy S3 : gros chunks = moins d'allers-retours itérateur/boucle par octet
+# servi (chaque chunk d'un itérateur sync = un saut de threadpool). Plancher à
+# 64 KiB contre une valeur DM_S3_STREAM_CHUNK_BYTES aberrante.
+_S3_STREAM_CHUNK_MIN_BYTES = 64 * 1024
+
+
+def _s3_stream_chunk_bytes() -> int:
+    return max(_S3_STREAM_CHUNK_MIN_BYTES, int(settings.s3_stream_chunk_bytes))
+
+
+class _BinaryFileResponse(FileResponse):
+    """FileResponse des binaires locaux : chunks de 1 MiB au lieu de 64 KiB
+    (un read anyio = un saut de threadpool). Si le serveur expose
+    `http.response.pathsend`, Starlette délègue l'envoi au serveur (zero-copy)."""
+
+    chunk_size = 1024 * 1024
+
+
+def _s3_stream_response(obj: dict, headers: dict[str, str] | None = None) -> StreamingResponse:
+    """StreamingResponse d'un get_object S3 : StreamingBody.iter_chunks
+    (DM_S3_STREAM_CHUNK_BYTES, 8 MiB par défaut),
+    Content-Length / ETag / Last-Modified propagés, body fermé en fin de flux."""
+    body = obj["Body"]
+    out = dict(headers or {})
+    if obj.get("ContentLength") is not None:
+        out["Content-Length"] = str(obj["ContentLength"])
+    if obj.get("ETag"):
+        out["ETag"] = obj["ETag"]
+    last_modified = obj.get("LastModified")
+    if isinstance(last_modified, datetime):
+        out["Last-Modified"] = format_datetime(last_modified.astimezone(UTC), usegmt=True)
+    return StreamingResponse(
+        body.iter_chunks(chunk_size=_s3_stream_chunk_bytes()),
+        media_type=obj.get("ContentType") or "application/octet-stream",
+        headers=out,
+        background=BackgroundTask(body.close),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _presign_cached(client, bucket: str, key: str, ttl: int, _window: int) -> tuple[str, float]:
+    """(URL présignée, expiration epoch) — signée une fois par fenêtre de ttl/2."""
+    url = client.generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=ttl,
+    )
+    return url, time.time() + ttl
+
+
+# Les fenêtres passées restent dans le LRU jusqu'à éviction et y épinglent les
+# anciens clients boto3 (donc leurs credentials) : purge au reload de config.
+runtime_config.register_reload_hook(_presign_cached.cache_clear)
+
+
+def _presigned_redirect(client, key: str) -> RedirectResponse:
+    """307 vers une URL S3 présignée, cacheable côté client (privé) tant que la
+    signature reste valide (marge 60 s) : un client qui re-télécharge saute
+    l'aller-retour vers l'API.
+
+    La signature (HMAC + requête canonique) est réutilisée pendant une demi-
+    fenêtre de TTL : une URL servie garde toujours au moins ttl/2 de validité,
+    et max-age suit la validité RESTANTE de l'URL, pas le TTL nominal. La clé
+    inclut le client (donc ses credentials) : une rotation re-signe.
+    """
+    ttl = max(1, int(settings.presign_ttl_seconds))
+    window = int(time.time()) // max(1, ttl // 2)
+    url, expires_at = _presign_cached(client, settings.s3_bucket, key, ttl, window)
+    max_age = max(0, round(expires_at - time.time()) - 60)
+    return RedirectResponse(url, status_code=307,
+                            headers={"Cache-Control": f"private, max-age={max_age}"})
+
+
 def _serve_binary_path(s3_path: str, filename: str):
     """Sert un binaire — depuis le disque (pull-on-miss) en mode local, sinon
     directement depuis S3 (présignée ou proxy), sans jamais toucher le disque."""
@@ -4506,9 +5451,9 @@ def _serve_binary_path(s3_path: str, filename: str):
             except Exception:
                 pass
         if os.path.isfile(s3_path):
-            return FileResponse(s3_path, filename=filename,
-                                media_type="application/octet-stream",
-                                headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+            return _BinaryFileResponse(s3_path, filename=filename,
+                                      media_type="application/octet-stream",
+                                      headers={"Content-Disposition": f'attachment; filename="{filename}"'})
         return None
 
     if not settings.s3_bucket:
@@ -4516,21 +5461,11 @@ def _serve_binary_path(s3_path: str, filename: str):
     try:
         client = s3_client()
         if settings.binaries_mode == "presign":
-            presigned = client.generate_presigned_url(
-                "get_object", Params={"Bucket": settings.s3_bucket, "Key": s3_path},
-                ExpiresIn=settings.presign_ttl_seconds,
-            )
-            return RedirectResponse(presigned, status_code=302)
+            return _presigned_redirect(client, s3_path)
         if settings.binaries_mode == "proxy":
             obj = client.get_object(Bucket=settings.s3_bucket, Key=s3_path)
-            body_stream = obj["Body"]
-            content_type = obj.get("ContentType") or "application/octet-stream"
-
-            def iterfile():
-                yield from iter(lambda: body_stream.read(1024 * 1024), b"")
-
-            return StreamingResponse(iterfile(), media_type=content_type,
-                                     headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+            return _s3_stream_response(
+                obj, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
     except Exception:
         pass
     return None
@@ -4635,7 +5570,7 @@ def updates_manifest_json(request: Request, slug: str, target: str):
             }
         }
     }
-    return JSONResponse(payload)
+    return FastJSONResponse(payload)
 
 
 @app.get("/catalog/{slug}", response_class=Response)
@@ -4750,10 +5685,10 @@ def files_list(request: Request, prefix: str = ""):
     _files_admin_guard(request)
     base = settings.local_binaries_dir
     if not os.path.isdir(base):
-        return JSONResponse({"files": []})
+        return FastJSONResponse({"files": []})
     target = _safe_path_join(base, prefix) if prefix else base
     if not os.path.isdir(target):
-        return JSONResponse({"files": []})
+        return FastJSONResponse({"files": []})
     result = []
     for root, _dirs, files in os.walk(target):
         for fn in files:
@@ -4761,11 +5696,10 @@ def files_list(request: Request, prefix: str = ""):
             rel = os.path.relpath(full, base)
             result.append({"path": rel, "size": os.path.getsize(full)})
     result.sort(key=lambda x: x["path"])
-    return JSONResponse({"files": result, "total": len(result)})
+    return FastJSONResponse({"files": result, "total": len(result)})
 
 
-@app.get("/binaries/{path:path}")
-def get_binary(path: str):
+def _log_binary_get() -> None:
     try:
         _log_device_connection(
             action="BINARY_GET",
@@ -4778,41 +5712,47 @@ def get_binary(path: str):
     except Exception:
         logger.exception("Failed to log binary call")
 
+
+@app.get("/binaries/{path:path}")
+def get_binary(path: str, background_tasks: BackgroundTasks):
+    # Writer de fond actif : submit() = put_nowait, on journalise tout de suite
+    # (404 compris). Writer arrêté : l'INSERT synchrone est différé après
+    # l'envoi de la réponse au lieu de retarder chaque téléchargement.
+    if _connection_log.is_running():
+        _log_binary_get()
+    else:
+        background_tasks.add_task(_log_binary_get)
+
     if settings.binaries_mode == "local":
         local_path = _safe_path_join(settings.local_binaries_dir, path)
         if not os.path.isfile(local_path):
             raise HTTPException(status_code=404, detail="Local binary not found.")
-        return FileResponse(local_path, media_type="application/octet-stream")
+        return _BinaryFileResponse(local_path, media_type="application/octet-stream")
 
     if not settings.s3_bucket:
         raise HTTPException(status_code=500, detail="S3 bucket not configured (DM_S3_BUCKET).")
 
-    key = f"{S3_BINARIES_PREFIX.rstrip('/')}/{path.lstrip('/')}"
+    key = _S3_BINARIES_KEY_PREFIX + path.lstrip("/")
     s3 = s3_client()
 
     if settings.binaries_mode == "presign":
         try:
-            url = s3.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": settings.s3_bucket, "Key": key},
-                ExpiresIn=settings.presign_ttl_seconds,
-            )
-            return RedirectResponse(url=url, status_code=302)
+            return _presigned_redirect(s3, key)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Binary not found or cannot presign: {e!r}") from e
 
     if settings.binaries_mode == "proxy":
         try:
             obj = s3.get_object(Bucket=settings.s3_bucket, Key=key)
-            body_stream = obj["Body"]
-            content_type = obj.get("ContentType") or "application/octet-stream"
-
-            def iterfile():
-                yield from iter(lambda: body_stream.read(1024 * 1024), b"")
-
-            return StreamingResponse(iterfile(), media_type=content_type)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Binary not found: {e!r}") from e
+        response = _s3_stream_response(obj)
+        # FastAPI n'attache background_tasks qu'à une réponse sans tâche : on
+        # chaîne la fermeture du body S3 pour ne pas perdre l'INSERT différé.
+        if background_tasks.tasks:
+            background_tasks.tasks.insert(0, response.background)
+            response.background = background_tasks
+        return response
 
     raise HTTPException(status_code=500, detail="Invalid DM_BINARIES_MODE (must be presign or proxy or local).")
 
@@ -4871,7 +5811,7 @@ async def keycloak_token_proxy(request: Request):
     if not _KEYCLOAK_TOKEN_UPSTREAM:
         raise HTTPException(status_code=503, detail="RELAY_KEYCLOAK_UPSTREAM not configured")
 
-    body = await request.json()
+    body = _fast_json_loads(await request.body())
     encoded_payload = body.get("p")
     if not encoded_payload:
         raise HTTPException(status_code=400, detail="Missing 'p' field (base64 form payload)")
@@ -4974,12 +5914,27 @@ def _get_port() -> int:
         return 8000
 
 
+def _get_workers() -> int:
+    """DM_UVICORN_WORKERS, sinon WEB_CONCURRENCY (convention uvicorn/gunicorn), sinon 1.
+
+    Pas de défaut à os.cpu_count() : en conteneur il renvoie les cœurs du nœud,
+    pas la limite CPU du pod. Le bootstrap DB est sûr en multi-workers (verrou
+    consultatif autour du schéma, étapes idempotentes).
+    """
+    if "DM_UVICORN_WORKERS" not in os.environ:
+        try:
+            return max(1, int(os.getenv("WEB_CONCURRENCY") or 1))
+        except ValueError:
+            return 1
+    return max(1, int(settings.uvicorn_workers or 1))
+
+
 if __name__ == "__main__":
     if str(settings.runtime_mode or "api").strip().lower() == "worker":
         _run_queue_worker_loop(stop_event=None, once=False)
     else:
         reload_enabled = os.getenv("RELOAD", "false").lower() in ("1", "true", "yes")
-        workers = max(1, int(settings.uvicorn_workers or 1))
+        workers = _get_workers()
         if reload_enabled and workers > 1:
             logger.warning("RELOAD=true is incompatible with DM_UVICORN_WORKERS>1; forcing workers=1")
             workers = 1
@@ -4989,6 +5944,11 @@ if __name__ == "__main__":
             port=_get_port(),
             reload=reload_enabled,
             workers=workers,
+            # Parité avec le CMD conteneur : uvloop/httptools imposés (échec au
+            # démarrage plutôt que repli silencieux sur asyncio/h11). uvloop
+            # n'existe pas sous Windows : "auto" (asyncio) pour le dev local.
+            loop="auto" if sys.platform == "win32" else "uvloop",
+            http="httptools",
             log_level=os.getenv("LOG_LEVEL", "info"),
             access_log=bool(settings.uvicorn_access_log),
             timeout_keep_alive=max(1, int(settings.uvicorn_timeout_keep_alive)),
@@ -5018,12 +5978,14 @@ def _startup_db_init() -> None:
         admin_url = _admin_db_url(base_url)
         if admin_url:
             admin_url = _with_db(admin_url, "postgres")
-            _wait_for_db(admin_url, timeout_seconds=30, interval_seconds=1.0)
-            try:
-                _ensure_dev_role(admin_url)
-            except psycopg2.Error:
-                logger.warning("Skipping dev role creation/alter (insufficient privilege)")
-            _ensure_database_exists(admin_url, "bootstrap")
+            # Une seule session admin (autocommit) pour rôle + base : la
+            # connexion de sonde de _wait_for_db, gardée ouverte.
+            with contextlib.closing(_wait_for_db(admin_url, timeout_seconds=30, keep_open=True)) as conn:
+                try:
+                    _ensure_dev_role(admin_url, conn=conn)
+                except psycopg2.Error:
+                    logger.warning("Skipping dev role creation/alter (insufficient privilege)")
+                _ensure_database_exists(admin_url, "bootstrap", conn=conn)
         else:
             logger.warning("No admin database URL available; schema will use app DB credentials only.")
     except Exception:
@@ -5032,16 +5994,59 @@ def _startup_db_init() -> None:
         bootstrap_url = _db_url_bootstrap()
         admin_bootstrap_url = _with_db(admin_url, "bootstrap") if admin_url else None
         if admin_bootstrap_url:
-            _wait_for_db(admin_bootstrap_url, timeout_seconds=30, interval_seconds=1.0)
-            _apply_schema(admin_bootstrap_url)
-            _ensure_dev_privileges(admin_bootstrap_url)
+            # Même session (la sonde) pour schéma + GRANT : le verrou consultatif
+            # pris par apply_schema couvre aussi les GRANT jusqu'à la fermeture.
+            with contextlib.closing(
+                _wait_for_db(admin_bootstrap_url, timeout_seconds=30, keep_open=True)
+            ) as conn:
+                _apply_schema(admin_bootstrap_url, conn=conn)
+                _ensure_dev_privileges(admin_bootstrap_url, conn=conn)
         elif bootstrap_url:
-            _wait_for_db(bootstrap_url, timeout_seconds=30, interval_seconds=1.0)
-            _apply_schema(bootstrap_url)
+            with contextlib.closing(
+                _wait_for_db(bootstrap_url, timeout_seconds=30, keep_open=True)
+            ) as conn:
+                _apply_schema(bootstrap_url, conn=conn)
         else:
             logger.warning("No bootstrap database URL available; skipping schema apply.")
     except Exception:
         logger.exception("Failed to apply DB schema")
+    # Pool ouvert ici, schéma en place : les min_conn handshakes sont payés au
+    # boot plutôt que par la première requête (log de connexion, /healthz…).
+    _svc_get_pool()
+
+
+@app.on_event("startup")
+async def _startup_jwks_refresher() -> None:
+    global _jwks_refresher_task
+    if _jwks_refresher_task is None:
+        _jwks_refresher_task = asyncio.get_running_loop().create_task(_jwks_refresher())
+
+
+@app.on_event("shutdown")
+async def _shutdown_jwks_refresher() -> None:
+    global _jwks_refresher_task
+    task, _jwks_refresher_task = _jwks_refresher_task, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+@app.on_event("startup")
+async def _startup_healthz_refresher() -> None:
+    global _healthz_refresher_task
+    if _healthz_refresher_task is None and settings.healthz_refresh_interval_seconds > 0:
+        _healthz_refresher_task = asyncio.get_running_loop().create_task(_healthz_refresher())
+
+
+@app.on_event("shutdown")
+async def _shutdown_healthz_refresher() -> None:
+    global _healthz_refresher_task
+    task, _healthz_refresher_task = _healthz_refresher_task, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
 
 
 @app.on_event("startup")
@@ -5076,6 +6081,24 @@ def _shutdown_embedded_queue_worker() -> None:
     _embedded_worker_stop = None
 
 
+@app.on_event("startup")
+def _startup_connection_log_writer() -> None:
+    if psycopg2 is None or not _db_url_bootstrap():
+        return
+    _connection_log.start()
+
+
+@app.on_event("shutdown")
+def _shutdown_connection_log_writer() -> None:
+    _connection_log.stop()
+
+
+@app.on_event("shutdown")
+def _shutdown_db_pool() -> None:
+    # Après le flush du writer device_connections, qui emprunte au pool.
+    _svc_close_pool()
+
+
 # ---- Runtime config sync (all FastAPI roles: api / admin / all) -------------
 _config_sync_stop: threading.Event | None = None
 _config_sync_threads: list[threading.Thread] = []
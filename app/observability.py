@@ -60,10 +60,13 @@ async def request_id_middleware(
     """Assign a correlation id to the request: honor `X-Request-ID` if the
     caller supplied one, generate one otherwise. Always returned in the
     response header, always injected into log records via `RequestIdLogFilter`,
-    and attached to the current OTel span (best-effort, no-op if tracing off)."""
-    request_id = (request.headers.get("x-request-id") or "").strip() or uuid.uuid4().hex
+    and attached to the current OTel span (best-effort, no-op if tracing off).
+    Also exposed as `request.state.trace_id` for the LLM audit trail, so logs
+    and audit rows share one id."""
+    request_id = (request.headers.get("x-request-id") or "").strip()[:64] or uuid.uuid4().hex
     token = _REQUEST_ID.set(request_id)
     request.state.request_id = request_id
+    request.state.trace_id = request_id
     try:
         try:
             from opentelemetry import trace
@@ -1,26 +1,56 @@
 from __future__ import annotations
 
 import os
+import threading
+from functools import lru_cache
 
 import boto3
 from botocore.client import Config
 
 from .settings import settings
 
+# Variables lues par la chaîne de credentials par défaut de botocore : une
+# rotation (ou un override runtime) produit une nouvelle clé → nouveau client.
+_CREDENTIAL_ENV_KEYS = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN", "AWS_PROFILE")
+
+_client_lock = threading.Lock()
+
 
 def s3_client():
-    # Compatible AWS S3 et S3 compatibles (MinIO, etc.)
+    """Client S3 partagé par le process (thread-safe côté botocore).
+
+    Construire un client re-parse credentials/config et crée un nouveau pool
+    HTTPS : on le mémoïse sur les paramètres effectifs (endpoint, région,
+    credentials d'environnement), qui peuvent changer à chaud.
+    """
     endpoint_url = settings.s3_endpoint_url or None
     region = settings.aws_region or os.getenv("AWS_REGION") or None
-    return boto3.client(
-        "s3",
-        endpoint_url=endpoint_url,
-        region_name=region,
-        config=Config(
-            signature_version="s3v4",
-            s3={"addressing_style": "virtual"},
-            # Retries bornées côté botocore (connect/timeout/5xx) — "adaptive"
-            # ajoute un rate-limiting client en cas de throttling (503 SlowDown).
-            retries={"max_attempts": 3, "mode": "adaptive"},
-        ),
-    )
+    creds = tuple(os.getenv(k) for k in _CREDENTIAL_ENV_KEYS)
+    return _cached_client(endpoint_url, region, creds)
+
+
+@lru_cache(maxsize=4)
+def _cached_client(endpoint_url: str | None, region: str | None, _creds: tuple):
+    # boto3.client() passe par la session par défaut, qui n'est pas thread-safe
+    # à la création : on sérialise (une fois par jeu de paramètres).
+    with _client_lock:
+        # Compatible AWS S3 et S3 compatibles (MinIO, etc.)
+        return boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(
+                signature_version="s3v4",
+                s3={"addressing_style": "virtual"},
+                # Retries bornées côté botocore (connect/timeout/5xx) — "adaptive"
+                # ajoute un rate-limiting client en cas de throttling (503 SlowDown).
+                retries={"max_attempts": 3, "mode": "adaptive"},
+                # Client partagé par tout le threadpool : le pool par défaut (10)
+                # sérialiserait les rafales de téléchargements/presign.
+                max_pool_connections=50,
+                # Connexions du pool gardées ouvertes entre deux rafales : le
+                # keepalive TCP évite qu'un NAT/LB les coupe silencieusement
+                # (la requête suivante paierait timeout + reconnexion).
+                tcp_keepalive=True,
+            ),
+        )
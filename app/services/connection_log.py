@@ -0,0 +1,279 @@
+"""Batched writer for ``device_connections`` (per-device action audit log).
+
+Each CONFIG_GET / BINARY_GET / ENROLL / TELEMETRY_RELAY used to pay its own
+INSERT round-trip on the request path. The log is fire-and-forget, so rows are
+queued in-process and a daemon thread flushes them with a single multi-row
+INSERT (``execute_values``) every ``FLUSH_MAX_ROWS`` rows or
+``FLUSH_INTERVAL_SECONDS``. ``connected_at`` is captured at submit time, so
+batching does not skew timestamps. Rows identical but for ``connected_at``
+within one batch (anonymous CONFIG_GET / BINARY_GET hits all look alike) are
+coalesced into a single row whose ``hits`` column holds the count; readers
+aggregate with ``SUM(hits)`` rather than ``COUNT(*)``. Batches of
+``COPY_MIN_ROWS`` rows or more go through ``COPY ... FROM STDIN`` instead,
+which skips per-row statement parsing on the server; a single-row flush (the
+usual case at low traffic) runs a per-connection prepared statement.
+
+When the writer is not running (scripts, tests), ``submit``
+returns False and the caller inserts synchronously as before. When the queue is
+full (DB slower than traffic) the OLDEST row is dropped to make room: piling
+synchronous inserts onto a saturated database would only make it worse. Drops
+are counted and reported at the next flush.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import queue
+import threading
+import time
+from datetime import UTC, datetime
+
+from . import db
+
+try:
+    from psycopg2.extras import execute_values  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover
+    execute_values = None  # type: ignore
+
+logger = logging.getLogger("device-management")
+
+FLUSH_MAX_ROWS = 1000
+FLUSH_INTERVAL_SECONDS = 0.25
+QUEUE_MAX_ROWS = 10_000
+COPY_MIN_ROWS = 500
+
+_INSERT_SQL = """
+    INSERT INTO device_connections (
+        email, client_uuid, action, encryption_key_fingerprint,
+        connected_at, source_ip, user_agent, hits
+    ) VALUES %s
+"""
+
+# Flush d'une seule ligne (trafic faible : le cas courant à 250 ms d'intervalle) :
+# instruction préparée par connexion, pas de re-parse du texte SQL.
+_INSERT_ONE_SQL = """
+    INSERT INTO device_connections (
+        email, client_uuid, action, encryption_key_fingerprint,
+        connected_at, source_ip, user_agent, hits
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+_COPY_SQL = """
+    COPY device_connections (
+        email, client_uuid, action, encryption_key_fingerprint,
+        connected_at, source_ip, user_agent, hits
+    ) FROM STDIN
+"""
+# Format texte de COPY : antislash, tabulation et fins de ligne échappés.
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+_queue: queue.Queue = queue.Queue(maxsize=QUEUE_MAX_ROWS)
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_stop: threading.Event | None = None
+_dropped = 0
+
+
+def is_running() -> bool:
+    return _thread is not None and _thread.is_alive()
+
+
+def submit(
+    email: str,
+    client_uuid: str,
+    action: str,
+    encryption_key_fingerprint: str,
+    source_ip: str | None,
+    user_agent: str | None,
+) -> bool:
+    """Queue one row. False = writer stopped (caller inserts synchronously).
+
+    On a full queue the oldest pending row is dropped (drop-oldest).
+    """
+    global _dropped
+    if not is_running():
+        return False
+    # Horodatage brut (float) : converti en datetime au flush, et seulement pour
+    # les lignes qui survivent à la fusion — pas sur le chemin de la requête.
+    row = (
+        email, client_uuid, action, encryption_key_fingerprint,
+        time.time(), source_ip, user_agent,
+    )
+    while True:
+        try:
+            _queue.put_nowait(row)
+            return True
+        except queue.Full:
+            try:
+                _queue.get_nowait()
+            except queue.Empty:
+                continue
+            with _lock:
+                _dropped += 1
+
+
+def _drain(max_rows: int, interval: float) -> list[tuple]:
+    """Block up to ``interval`` for a first row, then gather until size/time cap."""
+    try:
+        batch = [_queue.get(timeout=interval)]
+    except queue.Empty:
+        return []
+    deadline = time.monotonic() + interval
+    while len(batch) < max_rows:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _as_datetime(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=UTC)
+    return value
+
+
+def _coalesce(rows: list[tuple]) -> list[tuple]:
+    """Merge rows equal on every column but ``connected_at`` (kept: the first).
+
+    Returns insert rows with a trailing ``hits`` count, in first-seen order.
+    ``connected_at`` may be an epoch float (as queued by ``submit``) or a
+    datetime; it comes out as a datetime.
+    """
+    merged: dict[tuple, list] = {}
+    for row in rows:
+        key = row[:4] + row[5:]
+        slot = merged.get(key)
+        if slot is None:
+            merged[key] = [row, 1]
+        else:
+            slot[1] += 1
+    return [(*row[:4], _as_datetime(row[4]), *row[5:], hits) for row, hits in merged.values()]
+
+
+def _copy_field(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy_payload(rows: list[tuple]) -> io.StringIO:
+    return io.StringIO("".join(
+        "\t".join(_copy_field(v) for v in row) + "\n" for row in rows
+    ))
+
+
+def _insert(conn, rows: list[tuple]) -> None:
+    merged = _coalesce(rows)
+    with conn.cursor() as cur:
+        if len(merged) == 1:
+            db.execute_prepared(cur, "dm_log_connection_row", _INSERT_ONE_SQL, merged[0])
+        elif len(merged) >= COPY_MIN_ROWS:
+            cur.copy_expert(_COPY_SQL, _copy_payload(merged))
+        else:
+            execute_values(cur, _INSERT_SQL, merged, page_size=FLUSH_MAX_ROWS)
+
+
+def log_many(rows: list[tuple], *, conn=None) -> None:
+    """Insert ``rows`` in one round-trip (bulk API, also used by the writer).
+
+    Row layout: (email, client_uuid, action, encryption_key_fingerprint,
+    connected_at, source_ip, user_agent). ``conn`` lets a caller reuse its own
+    connection; otherwise a pooled one (else standalone) is used.
+    """
+    if not rows or db.psycopg2 is None:
+        return
+    if conn is not None:
+        _insert(conn, rows)
+        return
+    pooled = db.pooled_conn()
+    if pooled is not None:
+        with pooled as pconn:
+            _insert(pconn, rows)
+        return
+    url = db.db_url_bootstrap()
+    if not url:
+        return
+    own = db.psycopg2.connect(url)
+    own.autocommit = True
+    try:
+        _insert(own, rows)
+    finally:
+        own.close()
+
+
+def _take_dropped() -> int:
+    global _dropped
+    with _lock:
+        n, _dropped = _dropped, 0
+    return n
+
+
+def _flush(batch: list[tuple]) -> None:
+    dropped = _take_dropped()
+    if dropped:
+        logger.warning("device_connections queue full: %d oldest rows dropped", dropped)
+    try:
+        log_many(batch)
+    except Exception as exc:
+        # Best-effort audit log: a DB hiccup must never take the writer down.
+        logger.warning("device_connections batch insert failed (%d rows dropped): %s",
+                       len(batch), exc)
+
+
+def _run(stop: threading.Event) -> None:
+    while not stop.is_set():
+        batch = _drain(FLUSH_MAX_ROWS, FLUSH_INTERVAL_SECONDS)
+        if batch:
+            _flush(batch)
+
+
+def flush_pending() -> int:
+    """Synchronously write whatever is still queued. Returns the row count."""
+    total = 0
+    while True:
+        batch: list[tuple] = []
+        while len(batch) < FLUSH_MAX_ROWS:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return total
+        _flush(batch)
+        total += len(batch)
+
+
+def start() -> None:
+    global _thread, _stop
+    with _lock:
+        if is_running():
+            return
+        _stop = threading.Event()
+        _thread = threading.Thread(
+            target=_run, args=(_stop,), daemon=True, name="dm-connection-log-writer",
+        )
+        _thread.start()
+    logger.info("device_connections batch writer started (max_rows=%d, interval=%.2fs)",
+                FLUSH_MAX_ROWS, FLUSH_INTERVAL_SECONDS)
+
+
+def stop(timeout: float = 5.0) -> None:
+    """Stop the writer thread and flush the remaining rows (shutdown hook)."""
+    global _thread, _stop
+    with _lock:
+        thread, stop_event = _thread, _stop
+        _thread = None
+        _stop = None
+    if stop_event is not None:
+        stop_event.set()
+    if thread is not None and thread.is_alive():
+        thread.join(timeout=timeout)
+    flushed = flush_pending()
+    if flushed:
+        logger.info("device_connections batch writer flushed %d rows on shutdown", flushed)
@@ -5,10 +5,18 @@ interaction: connection pooling, schema application, and DB URL resolution.
 """
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
+import random
+import re
+import socket
 import threading
 import time
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Any
 from urllib.parse import urlparse, urlunparse
 
@@ -16,6 +24,7 @@ logger = logging.getLogger("device-management")
 
 try:
     import psycopg2
+    import psycopg2.errors
     import psycopg2.pool
 except ModuleNotFoundError:
     psycopg2 = None  # type: ignore
@@ -25,15 +34,21 @@ except ModuleNotFoundError:
 
 _pool: Any = None
 _pool_lock = threading.Lock()
-_POOL_MIN = 2
-_POOL_MAX = 10
 
 
+# scheme://netloc, then the optional path (= database name) up to ?query/#frag.
+_DB_PATH_RE = re.compile(r"^([A-Za-z][A-Za-z0-9+.-]*://[^/?#]*)(/[^?#]*)?")
+
+
+@lru_cache(maxsize=32)
 def _with_db(url: str, db_name: str) -> str:
-    """Replace the database name in a PostgreSQL URL."""
-    parsed = urlparse(url)
-    path = f"/{db_name}"
-    return urlunparse(parsed._replace(path=path))
+    """Replace the database name in a PostgreSQL URL.
+
+    A precompiled regex swaps the path in place (query/fragment untouched)
+    instead of a urlparse/urlunparse round-trip; memoized on top since
+    ``db_url_bootstrap()`` is resolved on every pooled request.
+    """
+    return _DB_PATH_RE.sub(lambda m: f"{m.group(1)}/{db_name}", url, count=1)
 
 
 def db_url() -> str | None:
@@ -50,6 +65,19 @@ def db_url_bootstrap() -> str | None:
     return _with_db(base, "bootstrap")
 
 
+def pool_bounds() -> tuple[int, int]:
+    """Effective (min, max) pool size from settings, sanitized."""
+    from ..settings import settings
+    max_conn = max(1, int(settings.db_pool_max))
+    min_conn = min(max(0, int(settings.db_pool_min)), max_conn)
+    if min_conn != settings.db_pool_min:
+        logger.warning(
+            "DB pool min (%s) > max (%s) — clamped to %s",
+            settings.db_pool_min, max_conn, min_conn,
+        )
+    return min_conn, max_conn
+
+
 def get_pool():
     """Return (or lazily create) a ThreadedConnectionPool for the bootstrap DB."""
     global _pool
@@ -63,11 +91,13 @@ def get_pool():
     with _pool_lock:
         if _pool is not None:
             return _pool
+        min_conn, max_conn = pool_bounds()
         try:
-            _pool = psycopg2.pool.ThreadedConnectionPool(_POOL_MIN, _POOL_MAX, url)
+            _pool = psycopg2.pool.ThreadedConnectionPool(min_conn, max_conn, url)
         except Exception as exc:
             logger.warning("Connection pool creation failed: %s", exc)
             return None
+        logger.info("DB connection pool created (min=%s, max=%s)", min_conn, max_conn)
     return _pool
 
 
@@ -78,27 +108,106 @@ class PoolConn:
     def __init__(self, pool):
         self._pool = pool
         self._conn = pool.getconn()
-        self._conn.autocommit = True
+        # Pre-ping (client-side, no round-trip): a backend dropped while idle
+        # (server restart, idle timeout) is discarded and replaced once.
+        if self._conn.closed:
+            pool.putconn(self._conn, close=True)
+            self._conn = pool.getconn()
+        # Pooled connections stay autocommit once set: only pay the setter
+        # (a C-level round through libpq state) on a fresh backend.
+        if not self._conn.autocommit:
+            self._conn.autocommit = True
 
     def __enter__(self):
         return self._conn
 
     def __exit__(self, *exc):
+        conn = self._conn
         try:
-            self._pool.putconn(self._conn)
+            if exc[0] is not None and not conn.closed and not conn.autocommit:
+                conn.rollback()
+            # A connection broken mid-request must not go back to the pool.
+            self._pool.putconn(conn, close=bool(conn.closed))
         except Exception:
             pass
         self._conn = None
 
 
-def pooled_conn():
-    """Return a PoolConn context manager, or None if pool unavailable."""
-    pool = get_pool()
+def close_pool() -> None:
+    """Close every pooled connection (shutdown hook); the next use recreates it."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        try:
+            pool.closeall()
+        except Exception as exc:
+            logger.warning("Connection pool close failed: %s", exc)
+
+
+def pooled_conn(create: bool = True):
+    """Return a PoolConn context manager, or None if pool unavailable.
+
+    ``create=False`` only borrows from an already-initialized pool (probes must
+    not pay — or hang on — the pool's initial connections).
+    """
+    pool = get_pool() if create else _pool
     if pool is None:
         return None
     return PoolConn(pool)
 
 
+# ── Prepared statements (per pooled connection) ──────────
+
+_prepared: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+@lru_cache(maxsize=64)
+def _to_dollar_params(sql: str) -> tuple[str, int]:
+    """``%s`` placeholders → ``$1..$n`` (PREPARE syntax). Returns (sql, n)."""
+    parts = sql.split("%s")
+    out = [parts[0]]
+    for i, part in enumerate(parts[1:], start=1):
+        out.append(f"${i}{part}")
+    return "".join(out), len(parts) - 1
+
+
+def execute_prepared(cur, name: str, sql: str, params: tuple) -> None:
+    """Run a hot query as a server-side prepared statement on ``cur``'s connection.
+
+    The statement is PREPAREd once per connection (pooled connections are
+    reused, so parse/plan is paid once), then EXECUTEd. If the server no longer
+    knows the name (session reset, DISCARD ALL, a PgBouncer backend swap), it
+    is forgotten — re-PREPAREd on the next call — and this call runs unprepared.
+    Cursors that are not backed by a real psycopg2 connection (test fakes) get
+    a plain execute.
+    """
+    conn = getattr(cur, "connection", None)
+    conn_type = getattr(getattr(psycopg2, "extensions", None), "connection", None)
+    if conn_type is None or not isinstance(conn, conn_type) or not conn.autocommit:
+        cur.execute(sql, params)
+        return
+    with _prepared_lock:
+        names = _prepared.setdefault(conn, set())
+    if name not in names:
+        prepared_sql, _n = _to_dollar_params(sql)
+        try:
+            cur.execute(f"PREPARE {name} AS {prepared_sql}")
+        except psycopg2.Error as exc:
+            logger.debug("PREPARE %s failed, running unprepared: %s", name, exc)
+            cur.execute(sql, params)
+            return
+        names.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    try:
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        logger.debug("Prepared statement %s lost by the server, re-preparing next time", name)
+        names.discard(name)
+        cur.execute(sql, params)
+
+
 def get_db_connection():
     """Get a standalone (non-pooled) database connection.
 
@@ -116,23 +225,36 @@ def get_db_connection():
 
 # ── DB URL helpers ────────────────────────────────────────
 
+_ADMIN_ENV_KEYS = (
+    "DATABASE_ADMIN_URL",
+    "DM_DATABASE_ADMIN_URL",
+    "DB_ADMIN_USER",
+    "POSTGRES_ADMIN_USER",
+    "POSTGRES_USER",
+    "DB_ADMIN_PASSWORD",
+    "POSTGRES_ADMIN_PASSWORD",
+    "POSTGRES_PASSWORD",
+)
+
+
 def admin_db_url(base_url: str) -> str | None:
     """Resolve admin database URL (with superuser credentials)."""
-    explicit = os.getenv("DATABASE_ADMIN_URL") or os.getenv("DM_DATABASE_ADMIN_URL")
+    # Keyed on the env values (not cached blindly): runtime_config may rewrite
+    # os.environ at runtime, and a changed variable must yield a fresh URL.
+    env = tuple(os.getenv(key) for key in _ADMIN_ENV_KEYS)
+    return _admin_db_url_cached(base_url, env)
+
+
+@lru_cache(maxsize=32)
+def _admin_db_url_cached(base_url: str, env: tuple[str | None, ...]) -> str | None:
+    (explicit_url, explicit_dm_url, db_admin_user, pg_admin_user, pg_user,
+     db_admin_password, pg_admin_password, pg_password) = env
+    explicit = explicit_url or explicit_dm_url
     if explicit:
         return explicit
     parsed = urlparse(base_url)
-    admin_user = (
-        os.getenv("DB_ADMIN_USER")
-        or os.getenv("POSTGRES_ADMIN_USER")
-        or os.getenv("POSTGRES_USER")
-        or "postgres"
-    )
-    admin_password = (
-        os.getenv("DB_ADMIN_PASSWORD")
-        or os.getenv("POSTGRES_ADMIN_PASSWORD")
-        or os.getenv("POSTGRES_PASSWORD")
-    )
+    admin_user = db_admin_user or pg_admin_user or pg_user or "postgres"
+    admin_password = db_admin_password or pg_admin_password or pg_password
     if admin_password:
         netloc = f"{admin_user}:{admin_password}@{parsed.hostname}"
     else:
@@ -142,29 +264,53 @@ def admin_db_url(base_url: str) -> str | None:
     return urlunparse(parsed._replace(netloc=netloc))
 
 
+def _reset_url_cache() -> None:
+    """Drop memoized URL resolutions.
+
+    Lookups are keyed on their inputs, so this is never needed for
+    correctness; it is a runtime-config reload hook so that URLs embedding
+    rotated credentials do not linger in the caches.
+    """
+    _with_db.cache_clear()
+    _admin_db_url_cached.cache_clear()
+
+
 # ── Schema bootstrap ─────────────────────────────────────
 
-def ensure_database_exists(db_url_str: str, db_name: str = "bootstrap") -> None:
-    """Create the database if it doesn't exist."""
+@contextmanager
+def admin_session(url: str, conn: Any = None) -> Iterator[Any]:
+    """One autocommit connection for a run of bootstrap steps.
+
+    Yields ``conn`` untouched when the caller already holds one (it stays
+    responsible for closing it); otherwise opens ``url`` and closes it on exit.
+    """
+    if conn is not None:
+        yield conn
+        return
     if psycopg2 is None:
         raise RuntimeError("psycopg2 is not installed.")
-    admin_url = _with_db(db_url_str, "postgres")
-    conn = psycopg2.connect(admin_url)
-    conn.autocommit = True
+    own = psycopg2.connect(url)
+    own.autocommit = True
     try:
+        yield own
+    finally:
+        own.close()
+
+
+def ensure_database_exists(db_url_str: str, db_name: str = "bootstrap", *, conn: Any = None) -> None:
+    """Create the database if it doesn't exist (``conn``: open admin session)."""
+    if psycopg2 is None:
+        raise RuntimeError("psycopg2 is not installed.")
+    with admin_session(_with_db(db_url_str, "postgres"), conn) as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_name,))
             if not cur.fetchone():
                 cur.execute(f'CREATE DATABASE "{db_name}"')
-    finally:
-        conn.close()
 
 
-def ensure_dev_role(admin_url: str) -> None:
-    """Create the 'dev' role if it doesn't exist."""
-    conn = psycopg2.connect(admin_url)
-    conn.autocommit = True
-    try:
+def ensure_dev_role(admin_url: str, *, conn: Any = None) -> None:
+    """Create the 'dev' role if it doesn't exist (``conn``: open admin session)."""
+    with admin_session(admin_url, conn) as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT 1 FROM pg_roles WHERE rolname = 'dev'")
             if not cur.fetchone():
@@ -173,15 +319,11 @@ def ensure_dev_role(admin_url: str) -> None:
                 cur.execute("ALTER ROLE dev NOSUPERUSER NOCREATEDB NOCREATEROLE NOREPLICATION")
             except psycopg2.Error:
                 logger.warning("Skipping ALTER ROLE dev (insufficient privilege)")
-    finally:
-        conn.close()
 
 
-def ensure_dev_privileges(admin_bootstrap_url: str) -> None:
-    """Grant dev role the minimum required privileges."""
-    conn = psycopg2.connect(admin_bootstrap_url)
-    conn.autocommit = True
-    try:
+def ensure_dev_privileges(admin_bootstrap_url: str, *, conn: Any = None) -> None:
+    """Grant dev role the minimum required privileges (``conn``: open admin session)."""
+    with admin_session(admin_bootstrap_url, conn) as conn:
         with conn.cursor() as cur:
             cur.execute("GRANT CONNECT ON DATABASE bootstrap TO dev")
             cur.execute("GRANT USAGE ON SCHEMA public TO dev")
@@ -195,8 +337,6 @@ def ensure_dev_privileges(admin_bootstrap_url: str) -> None:
                 "ALTER DEFAULT PRIVILEGES IN SCHEMA public "
                 "GRANT USAGE, SELECT, UPDATE ON SEQUENCES TO dev"
             )
-    finally:
-        conn.close()
 
 
 # Verrou consultatif : sérialise l'application du schéma quand N pods démarrent
@@ -206,17 +346,48 @@ def ensure_dev_privileges(admin_bootstrap_url: str) -> None:
 _SCHEMA_APPLY_LOCK_ID = 727270910
 
 
-def apply_schema(db_url_str: str, schema_path: str) -> None:
-    """Apply schema.sql with pre-migration fixups."""
-    if psycopg2 is None:
-        raise RuntimeError("psycopg2 is not installed.")
-    if not os.path.isfile(schema_path):
-        raise FileNotFoundError(f"Schema SQL not found: {schema_path}")
+_SCHEMA_POST_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_plugins_slug_active
+    ON plugins(slug) WHERE status <> 'removed'
+"""
+
+
+def _schema_fingerprint(sql: str) -> str:
+    """SHA-256 of the schema script apply_schema skips when unchanged."""
+    h = hashlib.sha256(sql.encode("utf-8"))
+    h.update(_SCHEMA_POST_SQL.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _read_schema(schema_path: str) -> tuple[str, str]:
+    """(script, fingerprint) for schema_path, re-read only when the file changes."""
+    try:
+        st = os.stat(schema_path)
+        return _read_schema_cached(schema_path, st.st_mtime_ns, st.st_size)
+    except (FileNotFoundError, IsADirectoryError):
+        raise FileNotFoundError(f"Schema SQL not found: {schema_path}") from None
+
+
+@lru_cache(maxsize=4)
+def _read_schema_cached(schema_path: str, _mtime_ns: int, _size: int) -> tuple[str, str]:
     with open(schema_path, encoding="utf-8") as f:
         sql = f.read()
-    conn = psycopg2.connect(db_url_str)
-    conn.autocommit = True
-    try:
+    return sql, _schema_fingerprint(sql)
+
+
+def apply_schema(db_url_str: str, schema_path: str, *, conn: Any = None) -> None:
+    """Apply schema.sql with pre-migration fixups.
+
+    The fixups (cheap, conditional) always run. schema.sql itself is skipped
+    when the same script was already applied: its SHA-256 is recorded in
+    ``_schema_version``. DM_SCHEMA_FORCE_APPLY=true re-applies regardless.
+    ``conn`` reuses an open admin session (see ``admin_session``).
+    """
+    if psycopg2 is None:
+        raise RuntimeError("psycopg2 is not installed.")
+    sql, fingerprint = _read_schema(schema_path)
+    force = os.getenv("DM_SCHEMA_FORCE_APPLY", "").strip().lower() in ("1", "true", "yes", "on")
+    with admin_session(db_url_str, conn) as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT pg_advisory_lock(%s)", (_SCHEMA_APPLY_LOCK_ID,))
             cur.execute("""
@@ -359,30 +530,118 @@ def apply_schema(db_url_str: str, schema_path: str) -> None:
                       );
                     END IF;
                   END IF;
+                  -- Writer groupé : les lignes identiques d'une même fenêtre de
+                  -- flush sont fusionnées en une seule, hits = nb d'occurrences.
+                  IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'device_connections') THEN
+                    IF NOT EXISTS (
+                      SELECT 1 FROM information_schema.columns
+                      WHERE table_name = 'device_connections' AND column_name = 'hits'
+                    ) THEN
+                      ALTER TABLE device_connections ADD COLUMN hits INTEGER NOT NULL DEFAULT 1;
+                    END IF;
+                  END IF;
                 END $$;
             """)
-            cur.execute(sql)
             cur.execute("""
-                CREATE UNIQUE INDEX IF NOT EXISTS uq_plugins_slug_active
-                ON plugins(slug) WHERE status <> 'removed'
+                CREATE TABLE IF NOT EXISTS _schema_version (
+                    hash TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
             """)
-    finally:
-        conn.close()
+            if not force:
+                cur.execute("SELECT 1 FROM _schema_version WHERE hash = %s", (fingerprint,))
+                if cur.fetchone():
+                    logger.info("DB schema unchanged (sha256=%s); skipping schema.sql", fingerprint[:12])
+                    return
+            cur.execute(sql)
+            cur.execute(_SCHEMA_POST_SQL)
+            cur.execute(
+                "INSERT INTO _schema_version (hash) VALUES (%s) ON CONFLICT (hash) DO NOTHING",
+                (fingerprint,),
+            )
+            logger.info("DB schema applied (sha256=%s)", fingerprint[:12])
+
 
+@lru_cache(maxsize=8)
+def _tcp_target(db_url_str: str) -> tuple[str, int] | None:
+    """(host, port) of a single-host URL DSN; None when a TCP probe can't apply
+    (key=value DSN, Unix socket, multi-host list)."""
+    try:
+        parsed = urlparse(db_url_str)
+        host, port = parsed.hostname, parsed.port or 5432
+    except ValueError:
+        return None
+    if not host or "," in parsed.netloc or host.startswith("/"):
+        return None
+    return host, port
+
+
+def _tcp_port_open(target: tuple[str, int], timeout: float = 0.5) -> bool:
+    try:
+        socket.create_connection(target, timeout=timeout).close()
+        return True
+    except OSError:
+        return False
 
-def wait_for_db(db_url_str: str, timeout_seconds: int = 30, interval_seconds: float = 1.0) -> None:
-    """Block until the database is reachable or timeout."""
+
+# libpq messages for a server that is up but refuses these credentials. The
+# postgres image runs its init scripts with TCP disabled, so once the port
+# accepts, the roles are final.
+_AUTH_REJECTION_MARKERS = ("password authentication failed", "no pg_hba.conf entry")
+
+
+def _is_auth_rejection(exc: Exception) -> bool:
+    message = str(exc)
+    return any(marker in message for marker in _AUTH_REJECTION_MARKERS)
+
+
+def wait_for_db(
+    db_url_str: str,
+    timeout_seconds: int = 30,
+    interval_seconds: float = 2.0,
+    *,
+    keep_open: bool = False,
+) -> Any:
+    """Block until the database is reachable or timeout.
+
+    Probes with exponential backoff (50 ms doubling, jittered, capped at
+    ``interval_seconds``) so a database that is already up costs one probe
+    instead of a fixed one-second sleep. While the port is closed, a plain TCP
+    connect (0.5 s timeout) stands in for the libpq handshake; the real
+    ``psycopg2.connect`` only runs once the port accepts.
+
+    A server that answers but rejects the credentials (bad password, no
+    ``pg_hba.conf`` entry) is not going to change its mind within the wait
+    window: that error is raised at once rather than retried until timeout.
+
+    ``keep_open=True`` returns the successful probe connection (autocommit)
+    instead of closing it, so the caller can run its bootstrap steps on it
+    without a second handshake.
+    """
     if psycopg2 is None:
         raise RuntimeError("psycopg2 is not installed.")
-    deadline = time.time() + timeout_seconds
+    deadline = time.monotonic() + timeout_seconds
+    delay = min(0.05, interval_seconds)
     last_exc: Exception | None = None
-    while time.time() < deadline:
+    target = _tcp_target(db_url_str)
+    while time.monotonic() < deadline:
         try:
-            conn = psycopg2.connect(db_url_str)
+            if target is not None and not _tcp_port_open(target):
+                raise psycopg2.OperationalError(f"{target[0]}:{target[1]} not accepting TCP connections")
+            # libpq treats connect_timeout=1 as 2: the shortest meaningful probe.
+            conn = psycopg2.connect(db_url_str, connect_timeout=2)
+            if keep_open:
+                conn.autocommit = True
+                return conn
             conn.close()
-            return
+            return None
         except psycopg2.OperationalError as exc:
+            if _is_auth_rejection(exc):
+                raise
             last_exc = exc
-            time.sleep(interval_seconds)
+            jitter = random.uniform(0.0, delay * 0.1)  # nosec B311: random non-crypto, uniquement pour le jitter de backoff
+            time.sleep(max(0.0, min(delay + jitter, deadline - time.monotonic())))
+            delay = min(delay * 2, interval_seconds)
     if last_exc:
         raise last_exc
+    return None
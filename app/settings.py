@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 
 from pydantic import Field
 
@@ -29,6 +30,11 @@ def _env_default(*keys: str, default: str) -> str:
     return default
 
 
+@lru_cache(maxsize=16)
+def _split_csv(raw: str) -> tuple[str, ...]:
+    return tuple(item.strip() for item in raw.split(",") if item.strip())
+
+
 def _keycloak_realm_url() -> str:
     """Derive the full realm issuer URL from KEYCLOAK_ISSUER_URL + KEYCLOAK_REALM.
 
@@ -56,6 +62,8 @@ class Settings(BaseSettings):
     uvicorn_workers: int = Field(default=1)
     uvicorn_access_log: bool = Field(default=False)
     uvicorn_timeout_keep_alive: int = Field(default=10)
+    # Background /healthz probe period per worker (0 disables it: probes run inline).
+    healthz_refresh_interval_seconds: float = Field(default=5.0)
 
     # Rate limiting léger (en mémoire, par IP). OFF par défaut pour ne rien
     # casser ; à activer via DM_RATELIMIT_ENABLED sur les environnements exposés.
@@ -80,6 +88,8 @@ class Settings(BaseSettings):
     s3_prefix_binaries: str = Field(default="binaries/")
     binaries_mode: str = Field(default="presign")  # "presign" or "proxy" or "local"
     presign_ttl_seconds: int = Field(default=300)
+    # Proxy mode: bytes read from S3 per streamed chunk (memory held per download).
+    s3_stream_chunk_bytes: int = Field(default=8 * 1024 * 1024)
     s3_endpoint_url: str | None = Field(default=None)
     aws_region: str | None = Field(default=None)
     local_binaries_dir: str = Field(default="/data/content/binaries")
@@ -153,6 +163,27 @@ class Settings(BaseSettings):
 
     # Database (optional, used by local tooling)
     database_url: str = Field(default_factory=_default_database_url)
+    # psycopg2 ThreadedConnectionPool sizing (per process). DM_DB_POOL_* wins,
+    # DB_POOL_* accepted for parity with the other unprefixed DB variables.
+    db_pool_min: int = Field(default_factory=lambda: int(_env_default("DB_POOL_MIN", default="2")))
+    db_pool_max: int = Field(default_factory=lambda: int(_env_default("DB_POOL_MAX", default="10")))
+
+    @property
+    def allow_origins_list(self) -> tuple[str, ...]:
+        """Parsed DM_ALLOW_ORIGINS (memoized on the raw CSV, so a runtime
+        setattr of allow_origins is still honoured)."""
+        return _split_csv(str(self.allow_origins or ""))
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide Settings, parsed from the environment once.
+
+    ``get_settings.cache_clear()`` forces a fresh read of the environment on
+    the next call; the module-level ``settings`` stays the instance that was
+    current at import time (the app mutates it in place on runtime reloads).
+    """
+    return Settings()
 
 
-settings = Settings()
+settings = get_settings()
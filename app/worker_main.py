@@ -12,6 +12,7 @@ from . import runtime_config
 runtime_config.bootstrap_env_overrides()
 
 from .main import _run_queue_worker_loop  # noqa: E402 (intentionnel : après bootstrap pré-import)
+from .services import connection_log  # noqa: E402
 from .services.db import db_url_bootstrap  # noqa: E402
 from .settings import settings  # noqa: E402
 
@@ -45,7 +46,15 @@ def main() -> None:
         runtime_config.snapshot_baseline()
         logger.info("Runtime config sync disabled (no DB); worker uses ENV baseline.")
 
-    _run_queue_worker_loop(stop_event=stop_event, once=False)
+    # Les jobs (enroll, télémétrie…) journalisent dans device_connections :
+    # même writer groupé que les pods API (hors lifespan FastAPI ici), au lieu
+    # d'un INSERT synchrone par job. Flush des lignes restantes à l'arrêt.
+    if db_url_bootstrap():
+        connection_log.start()
+    try:
+        _run_queue_worker_loop(stop_event=stop_event, once=False)
+    finally:
+        connection_log.stop()
 
 
 if __name__ == "__main__":
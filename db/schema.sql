@@ -40,7 +40,9 @@ CREATE TABLE IF NOT EXISTS device_connections (
     encryption_key_fingerprint TEXT NOT NULL,
     connected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
     source_ip INET,
-    user_agent TEXT
+    user_agent TEXT,
+    -- Occurrences fusionnées par le writer groupé (lignes identiques d'un flush).
+    hits INTEGER NOT NULL DEFAULT 1
 );
 CREATE INDEX IF NOT EXISTS idx_dc_client ON device_connections(client_uuid, connected_at DESC);
 CREATE INDEX IF NOT EXISTS idx_dc_email ON device_connections(email, connected_at DESC);
@@ -60,6 +62,8 @@ CREATE TABLE IF NOT EXISTS relay_clients (
 );
 CREATE UNIQUE INDEX IF NOT EXISTS uq_relay_active_client ON relay_clients(client_uuid) WHERE revoked_at IS NULL;
 CREATE UNIQUE INDEX IF NOT EXISTS uq_relay_active_id ON relay_clients(relay_client_id) WHERE revoked_at IS NULL;
+-- Relay auth lookup reads revoked rows too (to report "revoked"): needs a full index.
+CREATE INDEX IF NOT EXISTS idx_relay_client_id ON relay_clients(relay_client_id);
 CREATE INDEX IF NOT EXISTS idx_relay_email ON relay_clients(email);
 
 CREATE TABLE IF NOT EXISTS queue_jobs (
@@ -0,0 +1,367 @@
+"""Vérification des access tokens PKCE : client JWKS, cache des claims, pré-contrôles."""
+import base64
+import importlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+
+import pytest
+from fastapi import HTTPException
+
+_JWK_K1 = {"kty": "oct", "kid": "k1", "k": "c2VjcmV0"}
+_JWK_K2 = {"kty": "oct", "kid": "k2", "k": "b3RoZXI"}
+
+
+def _mk_fake_jwt(payload: dict) -> str:
+    header = {"alg": "none", "typ": "JWT"}
+    def _enc(obj: dict) -> str:
+        raw = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    return f"{_enc(header)}.{_enc(payload)}.sig"
+
+
+def _load_module():
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+    os.environ["DM_STORE_ENROLL_LOCALLY"] = "false"
+    os.environ["DM_STORE_ENROLL_S3"] = "false"
+    os.environ["DM_RELAY_SECRET_PEPPER"] = "unit-test-pepper"
+    os.environ["DM_AUTH_VERIFY_ACCESS_TOKEN"] = "false"
+
+    sys.modules.pop("app.main", None)
+    sys.modules.pop("app.settings", None)
+    return importlib.import_module("app.main")
+
+
+class _FakeIdP:
+    """Endpoint JWKS simulé, servi à PyJWKClient via urllib.request.build_opener."""
+
+    def __init__(self):
+        self.keys = [_JWK_K1]
+        self.up = True
+        self.headers = {}
+        self.attempts = 0
+        self.fetches = 0
+
+    def open(self, req, timeout=None):
+        self.attempts += 1
+        if not self.up:
+            raise urllib.error.URLError("connection refused")
+        self.fetches += 1
+        resp = io.BytesIO(json.dumps({"keys": self.keys}).encode("utf-8"))
+        resp.headers = dict(self.headers)
+        return resp
+
+
+@pytest.fixture
+def mod():
+    return _load_module()
+
+
+@pytest.fixture
+def idp(monkeypatch, mod):
+    fake = _FakeIdP()
+    monkeypatch.setattr(mod.urllib_request, "build_opener", lambda *h: fake)
+    return fake
+
+
+# ---------------------------------------------------------------------------
+# _get_jwks_client : publication du client, rafraîchissement de fond
+# ---------------------------------------------------------------------------
+
+def test_jwks_client_is_built_once_under_concurrency(monkeypatch, mod):
+    built, fetched = [], []
+
+    class _Client:
+        def __init__(self, uri, **kw):
+            built.append(uri)
+
+        def get_jwk_set(self, refresh=False):
+            fetched.append(1)
+
+    def _slow_uri(issuer):
+        time.sleep(0.05)
+        return f"{issuer}/certs"
+
+    monkeypatch.setattr(mod, "_JwksClient", _Client)
+    monkeypatch.setattr(mod, "_resolve_jwks_uri", _slow_uri)
+    monkeypatch.setattr(mod, "_AUTH_JWKS_CLIENT_CACHE", {})
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(mod._get_jwks_client("https://kc/realms/x")))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert built == ["https://kc/realms/x/certs"]
+    # Pas de préchargement sur le chemin requête : le premier get_signing_key
+    # du client partagé fait l'unique fetch.
+    assert fetched == []
+    assert len({id(c) for c in clients}) == 1
+
+
+def test_jwks_refresh_fetches_outside_the_build_lock_and_raises(monkeypatch, mod):
+    in_fetch, release = threading.Event(), threading.Event()
+
+    class _Client:
+        def __init__(self, uri, **kw):
+            self.uri = uri
+
+        def get_jwk_set(self, refresh=False):
+            if self.uri.startswith("https://kc/realms/a"):
+                in_fetch.set()
+                release.wait(5)
+            raise mod.PyJWKClientConnectionError("idp down")
+
+    monkeypatch.setattr(mod, "_JwksClient", _Client)
+    monkeypatch.setattr(mod, "_resolve_jwks_uri", lambda issuer: f"{issuer}/certs")
+    monkeypatch.setattr(mod, "_AUTH_JWKS_CLIENT_CACHE", {})
+    errors = []
+
+    def _refresh_a():
+        try:
+            mod._get_jwks_client("https://kc/realms/a", refresh=True)
+        except mod.PyJWKClientConnectionError as exc:
+            errors.append(exc)
+
+    t = threading.Thread(target=_refresh_a)
+    t.start()
+    assert in_fetch.wait(5)
+    # Le fetch de l'issuer A est en cours : le client de B se construit quand même.
+    assert mod._get_jwks_client("https://kc/realms/b").uri == "https://kc/realms/b/certs"
+    release.set()
+    t.join()
+    # L'échec du rechargement n'est plus avalé : _jwks_refresher le journalise.
+    assert len(errors) == 1
+
+
+def test_jwks_refresh_reloads_a_still_valid_client(monkeypatch, mod):
+    refreshes = []
+
+    class _Client:
+        uri = "https://kc/realms/x/certs"
+
+        def get_jwk_set(self, refresh=False):
+            refreshes.append(refresh)
+
+    client = _Client()
+    monkeypatch.setattr(mod, "_resolve_jwks_uri", lambda issuer: f"{issuer}/certs")
+    monkeypatch.setattr(mod, "_AUTH_JWKS_CLIENT_CACHE", {"https://kc/realms/x": (mod.time.monotonic() + 600, client)})
+    assert mod._get_jwks_client("https://kc/realms/x") is client
+    assert refreshes == []
+    # Échéance monotone : un saut de l'horloge murale n'expire pas le client.
+    wall = mod.time.time()
+    monkeypatch.setattr(mod.time, "time", lambda: wall + 86400)
+    assert mod._get_jwks_client("https://kc/realms/x") is client
+    assert refreshes == []
+    assert mod._get_jwks_client("https://kc/realms/x", refresh=True) is client
+    assert refreshes == [True]
+
+
+# ---------------------------------------------------------------------------
+# _JwksClient (PyJWKClient) contre le faux IdP
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize(("headers", "expected"), [
+    ({"Cache-Control": "public, max-age=3600"}, 3600),
+    ({"Cache-Control": "max-age=3600", "Age": "600"}, 3000),
+    ({"Cache-Control": "max-age=5"}, 60),
+    ({"Cache-Control": "max-age=999999"}, 86400),
+    ({"Cache-Control": "max-age=3600", "Age": "bogus"}, 3600),
+    ({"Cache-Control": "no-cache"}, None),
+    ({}, None),
+])
+def test_jwks_cache_lifetime_from_cache_control(mod, headers, expected):
+    assert mod._jwks_cache_lifetime(headers) == expected
+
+
+def test_jwks_client_cache_follows_idp_max_age(monkeypatch, mod, idp):
+    monkeypatch.setattr(mod, "_JWKS_REFRESH_MIN_INTERVAL", 0)
+    idp.headers = {"Cache-Control": "max-age=7200", "Age": "200"}
+    client = mod._JwksClient("https://kc/certs", lifespan=600)
+    client.get_jwk_set()
+    assert 6900 < client._current[0] - time.monotonic() <= 7000
+    # Sans max-age : durée configurée.
+    idp.headers = {}
+    client.get_jwk_set(refresh=True)
+    assert 500 < client._current[0] - time.monotonic() <= 600
+    # Payload invalide : rejeté par la validation de PyJWKClient.
+    idp.keys = []
+    with pytest.raises(mod.jwt.PyJWKSetError):
+        client.get_jwk_set(refresh=True)
+
+
+def test_jwks_client_serves_last_good_set_when_idp_is_down(monkeypatch, mod, idp):
+    monkeypatch.setattr(mod, "_JWKS_REFRESH_MIN_INTERVAL", 0)
+    client = mod._JwksClient("https://kc/certs", lifespan=600)
+    client.get_jwk_set()
+    idp.up = False
+    assert client.get_jwk_set(refresh=True).keys[0].key_id == "k1"
+    # Set périmé resservi sans retenter l'IdP à chaque requête…
+    assert client.get_jwk_set().keys[0].key_id == "k1"
+    assert idp.attempts == 2
+    # … jusqu'au prochain essai, _JWKS_STALE_RETRY_SECONDS plus tard.
+    assert client._current[0] - time.monotonic() <= mod._JWKS_STALE_RETRY_SECONDS
+    idp.up = True
+    client.get_jwk_set(refresh=True)
+    assert client._current[0] - time.monotonic() > mod._JWKS_STALE_RETRY_SECONDS
+    idp.up = False
+    client._current = None
+    with pytest.raises(mod.PyJWKClientConnectionError):
+        client.get_jwk_set(refresh=True)
+
+
+def test_jwks_client_drops_keys_removed_by_the_idp(monkeypatch, mod, idp):
+    monkeypatch.setattr(mod, "_JWKS_REFRESH_MIN_INTERVAL", 0)
+    idp.keys = [_JWK_K1, _JWK_K2]
+    client = mod._JwksClient("https://kc/certs", lifespan=600)
+    assert client.get_signing_key("k2").key_id == "k2"
+    assert client.get_signing_key("k1").key_id == "k1"
+    assert idp.fetches == 1
+    # k1 retirée côté IdP : plus acceptée après le refresh suivant.
+    idp.keys = [_JWK_K2]
+    client.get_jwk_set(refresh=True)
+    with pytest.raises(mod.jwt.PyJWKClientError):
+        client.get_signing_key("k1")
+
+
+def test_jwks_signing_key_lookup_reads_only_the_token_header(mod, idp):
+    client = mod._JwksClient("https://kc/certs", lifespan=600)
+    header = base64.urlsafe_b64encode(b'{"alg":"HS256","kid":"k1"}').decode().rstrip("=")
+    # Payload non-JSON : seul l'en-tête est décodé pour trouver la clé.
+    first = client.get_signing_key_from_jwt(f"{header}.bm90LWpzb24.c2ln")
+    second = client.get_signing_key_from_jwt(f"{header}.bm90LWpzb24.c2ln")
+    assert first.key_id == "k1"
+    assert first.key is second.key  # objet clé construit une fois par JWK Set
+
+
+def test_known_kids_are_served_from_the_index_without_pyjwkclient(monkeypatch, mod, idp):
+    idp.keys = [_JWK_K1, _JWK_K2, {"kty": "oct", "kid": "enc", "use": "enc", "k": "ZW5j"}]
+    client = mod._JwksClient("https://kc/certs", lifespan=600)
+    assert client.get_signing_key("k1").key_id == "k1"
+    assert set(client._current[3]) == {"k1", "k2"}  # clé de chiffrement exclue
+
+    def _base_path(self, kid):
+        raise AssertionError("PyJWKClient.get_signing_key reached")
+
+    monkeypatch.setattr(mod.PyJWKClient, "get_signing_key", _base_path)
+    assert client.get_signing_key("k2") is client._current[3]["k2"]
+    # Index expiré avec son JWK Set : retour par PyJWKClient (refetch).
+    client._current = (time.monotonic() - 1, *client._current[1:])
+    with pytest.raises(AssertionError):
+        client.get_signing_key("k2")
+
+
+def test_unknown_kid_refetches_at_most_once_per_interval(mod, idp):
+    client = mod._JwksClient("https://kc/certs", lifespan=600)
+    errors = []
+
+    def _forged():
+        try:
+            client.get_signing_key("forged")
+        except mod.PyJWKClientError:
+            errors.append(1)
+
+    threads = [threading.Thread(target=_forged) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 8
+    # Fetch initial seulement : les kids forgés dans l'intervalle ne
+    # déclenchent aucun refetch contre l'IdP.
+    assert idp.fetches == 1
+
+    # Intervalle écoulé : une clé tout juste publiée (rotation) est trouvée
+    # au prix d'un seul refetch.
+    client._last_attempt -= mod._JWKS_REFRESH_MIN_INTERVAL
+    idp.keys = [_JWK_K1, _JWK_K2]
+    assert client.get_signing_key("k2").key_id == "k2"
+    assert idp.fetches == 2
+
+
+# ---------------------------------------------------------------------------
+# _verify_access_token : cache des claims, pré-contrôles, paramètres
+# ---------------------------------------------------------------------------
+
+def test_verified_access_token_claims_are_memoized_until_exp(monkeypatch, mod):
+    decodes = []
+
+    class _Key:
+        key = "k"
+
+    def _decode(token, key, **kw):
+        decodes.append(token)
+        return {"iss": "https://kc/realms/x", "email": "a@b", "exp": time.time() + 3600}
+
+    monkeypatch.setattr(mod.settings, "auth_verify_access_token", True)
+    monkeypatch.setattr(mod, "_resolve_auth_issuer_url", lambda: "https://kc/realms/x")
+    monkeypatch.setattr(mod, "_get_jwks_client", lambda issuer: object())
+    monkeypatch.setattr(mod, "_fetch_jwks_signing_key", lambda client, token: _Key())
+    class _Decoder:
+        decode = staticmethod(_decode)
+
+    monkeypatch.setattr(mod, "_JWT_DECODERS", {True: _Decoder, False: _Decoder})
+    monkeypatch.setattr(mod, "_AUTH_TOKEN_CACHE", {})
+
+    assert mod._email_from_access_token("tok-1") == "a@b"
+    assert mod._email_from_access_token("tok-1") == "a@b"
+    assert decodes == ["tok-1"]
+    assert all(b"tok-1" not in k[0] for k in mod._AUTH_TOKEN_CACHE)
+    mod._email_from_access_token("tok-2")
+    assert decodes == ["tok-1", "tok-2"]
+    # Entrée expirée (exp dépassé) : re-vérifiée.
+    key = next(iter(mod._AUTH_TOKEN_CACHE))
+    mod._AUTH_TOKEN_CACHE[key] = (time.time() - 1, {})
+    mod._email_from_access_token("tok-1")
+    assert decodes == ["tok-1", "tok-2", "tok-1"]
+
+
+def test_expired_or_foreign_tokens_rejected_before_jwks_lookup(monkeypatch, mod):
+    def _no_jwks(issuer):
+        raise AssertionError("JWKS/RSA must not be reached")
+
+    monkeypatch.setattr(mod.settings, "auth_verify_access_token", True)
+    monkeypatch.setattr(mod.settings, "auth_issuer_url", "https://kc/realms/x")
+    monkeypatch.setattr(mod.settings, "auth_leeway_seconds", 30)
+    monkeypatch.setattr(mod, "_get_jwks_client", _no_jwks)
+    monkeypatch.setattr(mod, "_AUTH_TOKEN_CACHE", {})
+
+    expired = _mk_fake_jwt({"iss": "https://kc/realms/x", "exp": time.time() - 60})
+    foreign = _mk_fake_jwt({"iss": "https://evil/realms/x", "exp": time.time() + 600})
+    with pytest.raises(HTTPException) as exc:
+        mod._verify_access_token(expired)
+    assert exc.value.status_code == 401
+    with pytest.raises(HTTPException, match="issuer") as exc:
+        mod._verify_access_token(foreign)
+    assert exc.value.status_code == 401
+
+    # Dans la tolérance (leeway) : la vérification complète a lieu.
+    within_leeway = _mk_fake_jwt({"iss": "https://kc/realms/x/", "exp": time.time() - 10})
+    with pytest.raises(HTTPException) as exc:
+        mod._verify_access_token(within_leeway)
+    assert exc.value.status_code == 503  # _no_jwks atteint → erreur backend
+
+
+def test_jwt_decoders_carry_verification_options(mod):
+    for aud, decoder in mod._JWT_DECODERS.items():
+        assert decoder.options["verify_aud"] is aud
+        assert decoder.options["verify_exp"] is True and decoder.options["verify_signature"] is True
+        assert decoder.options["verify_iat"] is False and decoder.options["verify_iss"] is False
+
+
+def test_auth_verification_params_follow_settings(monkeypatch, mod):
+    monkeypatch.setattr(mod.settings, "auth_issuer_url", "https://kc/realms/x/")
+    monkeypatch.setattr(mod.settings, "auth_allowed_algorithms_csv", "RS256, ES256")
+    first = mod._auth_verification_params()
+    assert first[0] == "https://kc/realms/x" and first[2] == ("RS256", "ES256")
+    assert mod._auth_verification_params() is first
+    monkeypatch.setattr(mod.settings, "auth_allowed_algorithms_csv", "")
+    assert mod._auth_verification_params()[2] == ("RS256",)
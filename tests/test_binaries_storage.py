@@ -46,13 +46,52 @@ def test_serve_binary_path_presign_redirects_without_touching_disk(monkeypatch,
     response = m._serve_binary_path(missing_path, "plugin-1.0.0.oxt")
 
     assert response is not None
-    assert response.status_code == 302
+    assert response.status_code == 307
+    assert response.headers["cache-control"] == f"private, max-age={m.settings.presign_ttl_seconds - 60}"
     fake_client.generate_presigned_url.assert_called_once()
     _, kwargs = fake_client.generate_presigned_url.call_args
     assert kwargs["Params"]["Key"] == missing_path
     assert kwargs["Params"]["Bucket"] == "my-bucket"
 
 
+def test_presigned_url_reused_within_half_ttl_with_remaining_max_age(monkeypatch):
+    m.settings.binaries_mode = "presign"
+    m.settings.s3_bucket = "my-bucket"
+    monkeypatch.setattr(m.settings, "presign_ttl_seconds", 300)
+    fake_client = MagicMock()
+    fake_client.generate_presigned_url.side_effect = lambda *a, **kw: f"https://s3/signed-{len(fake_client.mock_calls)}"
+    monkeypatch.setattr(m, "s3_client", lambda: fake_client)
+    now = [1_000_200.0]  # début de fenêtre (fenêtres de 150 s)
+    monkeypatch.setattr(m.time, "time", lambda: now[0])
+
+    first = m._serve_binary_path("binaries/x.oxt", "x.oxt")
+    now[0] += 100
+    second = m._serve_binary_path("binaries/x.oxt", "x.oxt")
+    assert second.headers["location"] == first.headers["location"]
+    assert fake_client.generate_presigned_url.call_count == 1
+    # max-age = validité RESTANTE de l'URL (300 - 100 - marge 60).
+    assert second.headers["cache-control"] == "private, max-age=140"
+
+    now[0] += 60  # fenêtre suivante → nouvelle signature
+    m._serve_binary_path("binaries/x.oxt", "x.oxt")
+    assert fake_client.generate_presigned_url.call_count == 2
+
+
+def test_presign_cache_purged_on_runtime_config_reload(monkeypatch):
+    m.settings.binaries_mode = "presign"
+    m.settings.s3_bucket = "my-bucket"
+    fake_client = MagicMock()
+    fake_client.generate_presigned_url.return_value = "https://s3/signed"
+    monkeypatch.setattr(m, "s3_client", lambda: fake_client)
+
+    m._serve_binary_path("binaries/x.oxt", "x.oxt")
+    assert m._presign_cached.cache_info().currsize > 0
+    assert m._presign_cached.cache_clear in m.runtime_config._RELOAD_HOOKS
+    m._presign_cached.cache_clear()
+    m._serve_binary_path("binaries/x.oxt", "x.oxt")
+    assert fake_client.generate_presigned_url.call_count == 2
+
+
 def test_serve_binary_path_local_mode_unchanged(tmp_path):
     m.settings.binaries_mode = "local"
     local_file = tmp_path / "plugin-1.0.0.oxt"
@@ -61,6 +100,7 @@ def test_serve_binary_path_local_mode_unchanged(tmp_path):
     response = m._serve_binary_path(str(local_file), "plugin-1.0.0.oxt")
     assert response is not None
     assert response.status_code == 200
+    assert response.chunk_size == 1024 * 1024
 
 
 def test_persist_plugin_binary_uploads_to_s3_without_local_write(monkeypatch, tmp_path):
@@ -101,3 +141,247 @@ def test_healthz_skips_write_test_when_store_enroll_locally_false(monkeypatch):
     assert res.status_code == 200
     checks = res.json()["checks"]
     assert checks["local_storage"] == {"status": "skipped"}
+
+
+def test_serve_binary_path_proxy_streams_chunks_with_object_headers(monkeypatch):
+    from datetime import UTC, datetime
+
+    m.settings.binaries_mode = "proxy"
+    m.settings.s3_bucket = "my-bucket"
+    body = MagicMock()
+    body.iter_chunks.return_value = iter([b"abc", b"def"])
+    fake_client = MagicMock()
+    fake_client.get_object.return_value = {
+        "Body": body,
+        "ContentType": "application/zip",
+        "ContentLength": 6,
+        "ETag": '"etag-1"',
+        "LastModified": datetime(2026, 1, 2, 3, 4, 5, tzinfo=UTC),
+    }
+    monkeypatch.setattr(m, "s3_client", lambda: fake_client)
+
+    response = m._serve_binary_path("binaries/x.oxt", "x.oxt")
+
+    assert response.media_type == "application/zip"
+    assert response.headers["content-length"] == "6"
+    assert response.headers["etag"] == '"etag-1"'
+    assert response.headers["last-modified"] == "Fri, 02 Jan 2026 03:04:05 GMT"
+    assert response.headers["content-disposition"] == 'attachment; filename="x.oxt"'
+    body.iter_chunks.assert_called_once_with(chunk_size=8 * 1024 * 1024)
+    # Le StreamingBody est libéré (connexion rendue au pool botocore) après envoi.
+    response.background.func()
+    body.close.assert_called_once()
+
+
+def test_healthz_caches_healthy_result_briefly(monkeypatch):
+    monkeypatch.setattr(m.settings, "store_enroll_locally", False)
+    monkeypatch.setattr(m.settings, "store_enroll_s3", False)
+    monkeypatch.setattr(m.settings, "binaries_mode", "local")
+    probes = []
+
+    class _Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql):
+            probes.append(sql)
+
+    class _Conn:
+        def cursor(self):
+            return _Cur()
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(m, "_db_url_bootstrap", lambda: "postgresql://x/bootstrap")
+    monkeypatch.setattr(m, "_pooled_conn", lambda create=True: None)
+    monkeypatch.setattr(m.psycopg2, "connect", lambda *a, **kw: _Conn())
+    monkeypatch.setattr(m, "_HEALTHZ_CACHE", None)
+    client = TestClient(m.app)
+
+    first = client.get("/healthz")
+    second = client.get("/healthz")
+    assert first.json()["title"] == "OK"
+    assert second.headers.get("x-cache") == "HIT"
+    assert second.content == first.content
+    assert len(probes) == 1
+    assert "x-cache" not in client.get("/healthz?fresh=1").headers
+    assert len(probes) == 2
+
+
+def test_healthz_runs_probes_concurrently(monkeypatch):
+    import threading
+
+    # Chaque sonde attend les deux autres : séquentielles, la barrière expire.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def _probe(*args):
+        barrier.wait()
+        return {"status": "ok"}, None
+
+    monkeypatch.setattr(m, "_healthz_check_local", _probe)
+    monkeypatch.setattr(m, "_healthz_check_s3", _probe)
+    monkeypatch.setattr(m, "_healthz_check_db", _probe)
+    monkeypatch.setattr(m, "_HEALTHZ_CACHE", None)
+
+    res = TestClient(m.app).get("/healthz?fresh=1")
+
+    assert res.json()["title"] == "OK"
+    assert res.json()["checks"] == {"local_storage": {"status": "ok"}, "s3": {"status": "ok"}, "db": {"status": "ok"}}
+
+
+def test_healthz_local_probe_reuses_a_recent_success(monkeypatch, tmp_path):
+    opened = []
+    real_open = open
+
+    def spy_open(path, *a, **kw):
+        opened.append(path)
+        return real_open(path, *a, **kw)
+
+    monkeypatch.setattr(m.settings, "store_enroll_locally", True)
+    monkeypatch.setattr(m.settings, "enroll_dir", str(tmp_path))
+    monkeypatch.setattr(m, "_LOCAL_PROBE_OK", None)
+    monkeypatch.setattr("builtins.open", spy_open)
+    assert m._healthz_check_local() == ({"status": "ok"}, None)
+    assert m._healthz_check_local() == ({"status": "ok"}, None)
+    assert len(opened) == 1
+
+    # Autre répertoire (reload de config) → nouvelle écriture de test.
+    other = tmp_path / "other"
+    monkeypatch.setattr(m.settings, "enroll_dir", str(other))
+    assert m._healthz_check_local() == ({"status": "ok"}, None)
+    assert len(opened) == 2
+
+    # Expiré → on ré-écrit ; un échec n'est pas mis en cache.
+    monkeypatch.setattr(m, "_LOCAL_PROBE_OK", (m.time.monotonic() - m._LOCAL_PROBE_TTL, str(other)))
+    monkeypatch.setattr(m, "_ensure_dir", lambda d: (_ for _ in ()).throw(OSError("ro fs")))
+    assert m._healthz_check_local()[0]["status"] == "error"
+    assert m._LOCAL_PROBE_OK is None
+
+
+def test_healthz_reports_a_crashing_probe_without_hiding_the_others(monkeypatch):
+    def _ok(*args):
+        return {"status": "ok"}, None
+
+    def _boom(*args):
+        raise RuntimeError("s3 probe crashed")
+
+    monkeypatch.setattr(m, "_healthz_check_local", _ok)
+    monkeypatch.setattr(m, "_healthz_check_s3", _boom)
+    monkeypatch.setattr(m, "_healthz_check_db", _ok)
+    monkeypatch.setattr(m, "_HEALTHZ_CACHE", None)
+
+    res = TestClient(m.app).get("/healthz?fresh=1")
+
+    assert res.status_code == 200
+    body = res.json()
+    assert body["checks"]["local_storage"] == {"status": "ok"}
+    assert body["checks"]["db"] == {"status": "ok"}
+    assert body["checks"]["s3"] == {"status": "error", "detail": "s3 probe crashed"}
+    assert body["errors"] == ["s3 check failed: RuntimeError('s3 probe crashed')"]
+
+
+def _run_one_healthz_refresh(calls: list, expected_calls: int) -> None:
+    import asyncio
+
+    async def _one_refresh():
+        task = asyncio.ensure_future(m._healthz_refresher())
+        while len(calls) < expected_calls:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(_one_refresh())
+
+
+def test_healthz_serves_background_refresh_without_probing(monkeypatch):
+    calls = []
+
+    def _probe(*args):
+        calls.append(1)
+        return {"status": "ok"}, None
+
+    monkeypatch.setattr(m, "_healthz_check_local", _probe)
+    monkeypatch.setattr(m, "_healthz_check_s3", _probe)
+    monkeypatch.setattr(m, "_healthz_check_db", _probe)
+    monkeypatch.setattr(m, "_HEALTHZ_CACHE", None)
+    monkeypatch.setattr(m, "_HEALTHZ_LAST_REQUEST", m.time.monotonic())
+
+    _run_one_healthz_refresh(calls, 3)
+    assert m._HEALTHZ_CACHE is not None
+    monkeypatch.setattr(m, "_healthz_refresher_task", object())
+    res = TestClient(m.app).get("/healthz")
+    # Résultat sain produit par la tâche de fond : servi sans nouvelle sonde.
+    assert res.headers.get("x-cache") == "HIT"
+    assert len(calls) == 3
+
+
+def test_healthz_background_refresh_never_caches_a_failure(monkeypatch):
+    calls = []
+    state = {"ok": False}
+
+    def _probe(*args):
+        calls.append(1)
+        return ({"status": "ok"}, None) if state["ok"] else ({"status": "error", "detail": "down"}, "db down")
+
+    monkeypatch.setattr(m, "_healthz_check_local", _probe)
+    monkeypatch.setattr(m, "_healthz_check_s3", _probe)
+    monkeypatch.setattr(m, "_healthz_check_db", _probe)
+    monkeypatch.setattr(m, "_HEALTHZ_CACHE", (m.time.monotonic(), m._healthz_cache_key(), b"{}"))
+    monkeypatch.setattr(m, "_HEALTHZ_LAST_REQUEST", m.time.monotonic())
+
+    _run_one_healthz_refresh(calls, 3)
+    # L'échec purge l'entrée saine au lieu d'être servi depuis le cache.
+    assert m._HEALTHZ_CACHE is None
+    monkeypatch.setattr(m, "_healthz_refresher_task", object())
+    state["ok"] = True
+    res = TestClient(m.app).get("/healthz")
+    # La reprise est vue aussitôt : sonde en ligne, pas de HIT.
+    assert res.headers.get("x-cache") is None
+    assert "errors" not in res.json()
+    assert len(calls) == 6
+
+
+def test_healthz_background_refresh_idles_without_healthz_traffic(monkeypatch):
+    import asyncio
+
+    calls = []
+    monkeypatch.setattr(m, "_healthz_probe", lambda: calls.append(1))
+    monkeypatch.setattr(m, "_HEALTHZ_LAST_REQUEST", None)
+    monkeypatch.setattr(m.settings, "healthz_refresh_interval_seconds", 0.01)
+
+    async def _few_cycles():
+        task = asyncio.ensure_future(m._healthz_refresher())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(_few_cycles())
+    assert calls == []
+
+
+def test_get_binary_defers_sync_log_insert_when_writer_is_stopped(monkeypatch):
+    m.settings.binaries_mode = "proxy"
+    m.settings.s3_bucket = "my-bucket"
+    events = []
+    body = MagicMock()
+    body.iter_chunks.return_value = iter([b"abc"])
+    body.close.side_effect = lambda: events.append("close")
+    fake_client = MagicMock()
+    fake_client.get_object.return_value = {"Body": body, "ContentLength": 3}
+    monkeypatch.setattr(m, "s3_client", lambda: fake_client)
+    monkeypatch.setattr(m, "_log_device_connection", lambda **kw: events.append(kw["action"]))
+
+    monkeypatch.setattr(m._connection_log, "is_running", lambda: False)
+    res = TestClient(m.app).get("/binaries/x.oxt")
+    assert res.content == b"abc"
+    # Body S3 fermé PUIS INSERT différé : aucune des deux tâches n'est perdue.
+    assert events == ["close", "BINARY_GET"]
+
+    events.clear()
+    monkeypatch.setattr(m._connection_log, "is_running", lambda: True)
+    body.iter_chunks.return_value = iter([b"abc"])
+    TestClient(m.app).get("/binaries/x.oxt")
+    assert events == ["BINARY_GET", "close"]
@@ -0,0 +1,64 @@
+"""REST campagnes (/api/campaigns/*) : le travail DB bloquant ne tourne jamais
+sur la boucle asyncio (il figerait toutes les requêtes du worker)."""
+
+import threading
+
+from fastapi.testclient import TestClient
+
+import app.main as m
+
+
+def test_campaign_action_runs_db_work_off_the_event_loop(monkeypatch):
+    threads = []
+
+    class _Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            pass
+
+        def fetchone(self):
+            return (7,)
+
+    class _Conn:
+        autocommit = False
+
+        def cursor(self):
+            return _Cur()
+
+        def close(self):
+            pass
+
+    def _connect(*a, **kw):
+        threads.append(threading.current_thread().name)
+        return _Conn()
+
+    monkeypatch.setenv("DM_QUEUE_ADMIN_TOKEN", "t0k")
+    monkeypatch.setattr(m, "_db_url", lambda: "postgresql://x/y")
+    monkeypatch.setattr(m.psycopg2, "connect", _connect)
+
+    res = TestClient(m.app).patch("/api/campaigns/7/pause", headers={"X-Admin-Token": "t0k"})
+
+    assert res.json() == {"ok": True, "campaign_id": 7, "status": "paused"}
+    assert len(threads) == 1 and threads[0].startswith("AnyIO worker thread")
+
+
+def test_update_status_parses_the_raw_body_once(monkeypatch):
+    parsed = []
+    real = m._fast_json_loads
+    monkeypatch.setattr(m.settings, "relay_enabled", False)
+    monkeypatch.setattr(m, "_fast_json_loads", lambda data: parsed.append(data) or real(data))
+    client = TestClient(m.app)
+
+    res = client.post("/update/status", content=b'{"status": "bogus", "client_uuid": "u"}')
+    assert res.status_code == 400
+    assert res.json()["error"].startswith("status must be one of")
+    assert parsed == [b'{"status": "bogus", "client_uuid": "u"}']
+
+    res = client.post("/update/status", content=b"{not json")
+    assert res.status_code == 400
+    assert res.json() == {"ok": False, "error": "Invalid JSON"}
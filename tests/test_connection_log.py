@@ -0,0 +1,146 @@
+"""Batched device_connections writer (app.services.connection_log)."""
+import pytest
+
+from app.services import connection_log
+
+
+@pytest.fixture()
+def written(monkeypatch):
+    batches: list[list[tuple]] = []
+    monkeypatch.setattr(connection_log, "log_many", lambda rows, conn=None: batches.append(list(rows)))
+    yield batches
+    connection_log.stop()
+
+
+def test_submit_refused_when_writer_stopped(written):
+    assert connection_log.submit("a@b", "uuid", "CONFIG_GET", "fp", None, None) is False
+    assert written == []
+
+
+def test_rows_are_batched_and_flushed_on_stop(written):
+    connection_log.start()
+    for i in range(3):
+        assert connection_log.submit("a@b", f"uuid-{i}", "CONFIG_GET", "fp", "10.0.0.1", "ua")
+    connection_log.stop()
+    rows = [row for batch in written for row in batch]
+    assert [r[1] for r in rows] == ["uuid-0", "uuid-1", "uuid-2"]
+    # connected_at capturé au submit (5e colonne), pas au flush.
+    assert all(r[4] is not None for r in rows)
+    assert not connection_log.is_running()
+
+
+def test_failed_batch_does_not_kill_writer(monkeypatch):
+    def boom(rows, conn=None):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(connection_log, "log_many", boom)
+    connection_log.start()
+    try:
+        assert connection_log.submit("a@b", "uuid", "BINARY_GET", "fp", None, None)
+        connection_log.flush_pending()
+        assert connection_log.is_running()
+    finally:
+        connection_log.stop()
+
+
+def test_full_queue_drops_oldest_row(written, monkeypatch):
+    import queue
+
+    monkeypatch.setattr(connection_log, "_queue", queue.Queue(maxsize=2))
+    monkeypatch.setattr(connection_log, "is_running", lambda: True)
+    for i in range(3):
+        assert connection_log.submit("a@b", f"uuid-{i}", "CONFIG_GET", "fp", None, None)
+    assert connection_log.flush_pending() == 2
+    assert [r[1] for batch in written for r in batch] == ["uuid-1", "uuid-2"]
+    assert connection_log._dropped == 0  # remis à zéro par le flush
+
+
+def test_identical_rows_are_coalesced_with_a_hit_count():
+    from datetime import UTC, datetime
+
+    t0, t1 = datetime(2026, 1, 1, tzinfo=UTC), datetime(2026, 1, 1, 0, 0, 1, tzinfo=UTC)
+    anon = ("system@local", "00000000-0000-0000-0000-000000000000", "CONFIG_GET", "none")
+    rows = [
+        (*anon, t0, None, None),
+        ("a@b", "uuid-1", "ENROLL", "fp", t0, "10.0.0.1", "ua"),
+        (*anon, t1, None, None),
+        (*anon[:2], "BINARY_GET", "none", t1, None, None),
+    ]
+    assert connection_log._coalesce(rows) == [
+        (*anon, t0, None, None, 2),
+        ("a@b", "uuid-1", "ENROLL", "fp", t0, "10.0.0.1", "ua", 1),
+        (*anon[:2], "BINARY_GET", "none", t1, None, None, 1),
+    ]
+
+
+def test_large_batches_use_copy_with_escaped_fields(monkeypatch):
+    from datetime import UTC, datetime
+
+    calls = []
+
+    class Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def copy_expert(self, sql, buf):
+            calls.append(("copy", sql, buf.getvalue()))
+
+    class Conn:
+        def cursor(self):
+            return Cur()
+
+    monkeypatch.setattr(connection_log, "COPY_MIN_ROWS", 2)
+    t0 = datetime(2026, 1, 1, tzinfo=UTC)
+    rows = [
+        ("a@b", "uuid-1", "ENROLL", "fp", t0, "10.0.0.1", "Mozilla\t5.0\\x\n"),
+        ("a@b", "uuid-2", "ENROLL", "fp", t0, None, None),
+    ]
+    connection_log._insert(Conn(), rows)
+
+    (kind, sql, payload), = calls
+    assert kind == "copy" and "FROM STDIN" in sql
+    assert payload.splitlines() == [
+        "a@b\tuuid-1\tENROLL\tfp\t2026-01-01T00:00:00+00:00\t10.0.0.1\tMozilla\\t5.0\\\\x\\n\t1",
+        "a@b\tuuid-2\tENROLL\tfp\t2026-01-01T00:00:00+00:00\t\\N\t\\N\t1",
+    ]
+
+
+def test_single_row_flush_uses_prepared_statement(monkeypatch):
+    from datetime import UTC, datetime
+
+    calls = []
+
+    class Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    class Conn:
+        def cursor(self):
+            return Cur()
+
+    monkeypatch.setattr(connection_log.db, "execute_prepared",
+                        lambda cur, name, sql, params: calls.append((name, params)))
+    t0 = datetime(2026, 1, 1, tzinfo=UTC)
+    row = ("a@b", "uuid-1", "CONFIG_GET", None, t0, None, None)
+    connection_log._insert(Conn(), [row, row])
+
+    assert calls == [("dm_log_connection_row", (*row, 2))]
+
+
+def test_submit_defers_datetime_conversion_to_flush(written):
+    from datetime import datetime
+
+    connection_log.start()
+    assert connection_log.submit("a@b", "uuid", "CONFIG_GET", None, None, None)
+    connection_log.stop()
+    (row,), = written
+    assert isinstance(row[4], float)
+    (merged,) = connection_log._coalesce([row, row])
+    assert isinstance(merged[4], datetime) and abs(merged[4].timestamp() - row[4]) < 1e-5
+    assert merged[-1] == 2
@@ -0,0 +1,43 @@
+"""CORS `*` : middleware ASGI allégé, mêmes réponses que CORSMiddleware."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.middleware.cors import CORSMiddleware
+
+from app.main import _CORS_ALLOW_METHODS, _WildcardCorsMiddleware
+
+
+def _client(wildcard: bool) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    if wildcard:
+        app.add_middleware(_WildcardCorsMiddleware, allow_methods=_CORS_ALLOW_METHODS)
+    else:
+        app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=False,
+                           allow_methods=list(_CORS_ALLOW_METHODS), allow_headers=["*"])
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("headers", [
+    {"Origin": "http://a", "Access-Control-Request-Method": "GET"},
+    {"Origin": "http://a", "Access-Control-Request-Method": "POST",
+     "Access-Control-Request-Headers": "x-client-uuid, content-type"},
+    {"Origin": "http://a", "Access-Control-Request-Method": "DELETE"},
+])
+def test_preflight_matches_starlette(headers):
+    got = _client(True).options("/ping", headers=headers)
+    ref = _client(False).options("/ping", headers=headers)
+    assert (got.status_code, got.text) == (ref.status_code, ref.text)
+    for name in ("access-control-allow-origin", "access-control-allow-methods",
+                 "access-control-allow-headers", "access-control-max-age"):
+        assert got.headers.get(name) == ref.headers.get(name)
+
+
+def test_simple_request_gets_allow_origin_only_with_origin():
+    client = _client(True)
+    assert client.get("/ping", headers={"Origin": "http://a"}).headers["access-control-allow-origin"] == "*"
+    assert "access-control-allow-origin" not in client.get("/ping").headers
@@ -51,6 +51,23 @@ def test_mint_token_jti_changes_but_cuid_is_stable():
     assert p1["cuid"] == p2["cuid"] == "u-1"
 
 
+def test_mint_and_verify_share_a_signer_that_follows_key_rotation():
+    import pytest
+    from fastapi import HTTPException
+
+    mod = _load_module()
+    with patch.object(mod.settings, "telemetry_token_signing_key", "k-test"):
+        token, _ = mod._mint_telemetry_token(device="m", profile="int", client_uuid="u-1")
+        assert mod._verify_telemetry_token(token)["cuid"] == "u-1"
+        assert mod._telemetry_signer("k-test") is mod._telemetry_signer("k-test")
+    with patch.object(mod.settings, "telemetry_token_signing_key", "k-rotated"):
+        with pytest.raises(HTTPException) as exc:
+            mod._verify_telemetry_token(token)
+        assert exc.value.status_code == 401
+    with patch.object(mod.settings, "telemetry_token_signing_key", "  "):
+        assert mod._mint_telemetry_token(device="m", profile="int") == ("", None)
+
+
 class _ScriptedCur:
     """Cursor scripté : fetchone selon un fragment SQL."""
 
@@ -91,4 +108,5 @@ def test_dashboard_metrics_active_from_installations_not_connections():
     active_sql = next(s for s in cur.executed if "plugin_installations" in s)
     assert "COUNT(DISTINCT client_uuid)" in active_sql and "last_seen_at" in active_sql
     inter_sql = next(s for s in cur.executed if "device_connections" in s)
-    assert "COUNT(*)" in inter_sql, "interactions = volume brut, pas un distinct pollué"
+    # Volume brut : chaque ligne pèse ses occurrences fusionnées (hits).
+    assert "SUM(hits)" in inter_sql, "interactions = volume brut, pas un distinct pollué"
@@ -0,0 +1,352 @@
+"""app.services.db: pool sizing and URL helpers (no live Postgres needed)."""
+import importlib
+
+import pytest
+
+from app.services import db as svc_db
+
+
+def _settings():
+    # Résolu à l'appel : d'autres modules de test rechargent app.settings.
+    return importlib.import_module("app.settings").settings
+
+
+def test_pool_bounds_from_settings(monkeypatch):
+    monkeypatch.setattr(_settings(), "db_pool_min", 4)
+    monkeypatch.setattr(_settings(), "db_pool_max", 30)
+    assert svc_db.pool_bounds() == (4, 30)
+
+
+def test_pool_bounds_clamps_min_above_max(monkeypatch):
+    monkeypatch.setattr(_settings(), "db_pool_min", 40)
+    monkeypatch.setattr(_settings(), "db_pool_max", 10)
+    assert svc_db.pool_bounds() == (10, 10)
+
+
+def test_with_db_replaces_database_name():
+    svc_db._reset_url_cache()
+    url = "postgresql://dev:dev@pg:5432/app?sslmode=require"
+    assert svc_db._with_db(url, "bootstrap") == "postgresql://dev:dev@pg:5432/bootstrap?sslmode=require"
+    assert svc_db._with_db(url, "bootstrap") == "postgresql://dev:dev@pg:5432/bootstrap?sslmode=require"
+    assert svc_db._with_db.cache_info().hits >= 1
+
+
+def test_admin_db_url_follows_env_changes(monkeypatch):
+    for key in svc_db._ADMIN_ENV_KEYS:
+        monkeypatch.delenv(key, raising=False)
+    base = "postgresql://dev:dev@pg:5432/bootstrap"
+    assert svc_db.admin_db_url(base) is None
+    monkeypatch.setenv("POSTGRES_PASSWORD", "s3cret")
+    assert svc_db.admin_db_url(base) == "postgresql://postgres:s3cret@pg:5432/bootstrap"
+    monkeypatch.setenv("DATABASE_ADMIN_URL", "postgresql://root:x@other/postgres")
+    assert svc_db.admin_db_url(base) == "postgresql://root:x@other/postgres"
+
+
+def test_url_caches_are_purged_on_runtime_config_reload():
+    import app.main  # noqa: F401  (registers the reload hooks)
+    from app import runtime_config
+
+    svc_db._with_db("postgresql://u:old@h/db", "bootstrap")
+    assert svc_db._with_db.cache_info().currsize > 0
+    assert svc_db._reset_url_cache in runtime_config._RELOAD_HOOKS
+    svc_db._reset_url_cache()
+    assert svc_db._with_db.cache_info().currsize == 0
+    assert svc_db._admin_db_url_cached.cache_info().currsize == 0
+
+
+def test_to_dollar_params():
+    sql, n = svc_db._to_dollar_params("SELECT 1 FROM t WHERE a = %s AND b = %s")
+    assert sql == "SELECT 1 FROM t WHERE a = $1 AND b = $2"
+    assert n == 2
+
+
+def test_execute_prepared_plain_execute_for_fake_cursor():
+    class FakeCursor:
+        def __init__(self):
+            self.executed = []
+
+        def execute(self, sql, params=None):
+            self.executed.append((sql, params))
+
+    cur = FakeCursor()
+    svc_db.execute_prepared(cur, "dm_x", "SELECT 1 WHERE a = %s", ("v",))
+    assert cur.executed == [("SELECT 1 WHERE a = %s", ("v",))]
+
+
+def test_execute_prepared_recovers_from_a_lost_statement(monkeypatch):
+    class FakeConn:
+        autocommit = True
+
+    class Lost(Exception):
+        pass
+
+    class FakePsycopg2:
+        Error = Exception
+
+        class extensions:
+            connection = FakeConn
+
+        class errors:
+            InvalidSqlStatementName = Lost
+
+    class FakeCursor:
+        def __init__(self, conn):
+            self.connection = conn
+            self.executed = []
+            self.server_names = set()
+
+        def execute(self, sql, params=None):
+            self.executed.append(sql)
+            if sql.startswith("PREPARE "):
+                self.server_names.add(sql.split()[1])
+            elif sql.startswith("EXECUTE ") and sql.split()[1] not in self.server_names:
+                raise Lost("prepared statement does not exist")
+
+    monkeypatch.setattr(svc_db, "psycopg2", FakePsycopg2)
+    cur = FakeCursor(FakeConn())
+    sql = "SELECT 1 WHERE a = %s"
+    svc_db.execute_prepared(cur, "dm_x", sql, ("v",))
+    assert cur.executed == ["PREPARE dm_x AS SELECT 1 WHERE a = $1", "EXECUTE dm_x (%s)"]
+
+    # Session remise à zéro côté serveur : repli sans préparation, puis
+    # nouveau PREPARE à l'appel suivant.
+    cur.server_names.clear()
+    cur.executed.clear()
+    svc_db.execute_prepared(cur, "dm_x", sql, ("v",))
+    assert cur.executed == ["EXECUTE dm_x (%s)", sql]
+    cur.executed.clear()
+    svc_db.execute_prepared(cur, "dm_x", sql, ("v",))
+    assert cur.executed == ["PREPARE dm_x AS SELECT 1 WHERE a = $1", "EXECUTE dm_x (%s)"]
+
+
+def test_wait_for_db_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(svc_db, "_tcp_port_open", lambda target: True)
+    attempts = []
+    sleeps = []
+
+    class FakeConn:
+        def close(self):
+            pass
+
+    def fake_connect(url, connect_timeout=None):
+        attempts.append(url)
+        if len(attempts) < 5:
+            raise svc_db.psycopg2.OperationalError("down")
+        return FakeConn()
+
+    monkeypatch.setattr(svc_db.psycopg2, "connect", fake_connect)
+    monkeypatch.setattr(svc_db.time, "sleep", sleeps.append)
+    svc_db.wait_for_db("postgresql://x/y", timeout_seconds=30, interval_seconds=0.3)
+    assert len(attempts) == 5
+    # 50 ms → 100 ms → 200 ms → plafond 300 ms (+ jitter ≤ 10 %).
+    for got, base in zip(sleeps, [0.05, 0.1, 0.2, 0.3], strict=True):
+        assert base <= got <= base * 1.1 + 1e-9
+
+
+def test_apply_schema_skips_unchanged_script(monkeypatch, tmp_path):
+    schema = tmp_path / "schema.sql"
+    schema.write_text("CREATE TABLE IF NOT EXISTS t (id int);", encoding="utf-8")
+    applied: set[str] = set()
+    executed: list[str] = []
+
+    class Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            executed.append(sql)
+            self._row = None
+            if sql.startswith("SELECT 1 FROM _schema_version"):
+                self._row = (1,) if params[0] in applied else None
+            elif sql.startswith("INSERT INTO _schema_version"):
+                applied.add(params[0])
+
+        def fetchone(self):
+            return self._row
+
+    class Conn:
+        autocommit = False
+
+        def cursor(self):
+            return Cur()
+
+        def close(self):
+            pass
+
+    monkeypatch.delenv("DM_SCHEMA_FORCE_APPLY", raising=False)
+    monkeypatch.setattr(svc_db.psycopg2, "connect", lambda url: Conn())
+    svc_db.apply_schema("postgresql://x/bootstrap", str(schema))
+    assert executed.count(schema.read_text(encoding="utf-8")) == 1
+    svc_db.apply_schema("postgresql://x/bootstrap", str(schema))
+    assert executed.count(schema.read_text(encoding="utf-8")) == 1
+    monkeypatch.setenv("DM_SCHEMA_FORCE_APPLY", "true")
+    svc_db.apply_schema("postgresql://x/bootstrap", str(schema))
+    assert executed.count(schema.read_text(encoding="utf-8")) == 2
+
+
+def test_read_schema_is_memoized_until_the_file_changes(tmp_path):
+    import os
+
+    schema = tmp_path / "schema.sql"
+    schema.write_text("SELECT 1;", encoding="utf-8")
+    sql, fp = svc_db._read_schema(str(schema))
+    assert svc_db._read_schema(str(schema)) == (sql, fp)
+    schema.write_text("SELECT 22;", encoding="utf-8")
+    os.utime(schema, ns=(0, 10**9))  # mtime distinct même sur FS grossier
+    assert svc_db._read_schema(str(schema))[0] == "SELECT 22;"
+    assert svc_db._read_schema(str(schema))[1] != fp
+    with pytest.raises(FileNotFoundError, match="Schema SQL not found"):
+        svc_db._read_schema(str(tmp_path / "missing.sql"))
+
+
+@pytest.mark.parametrize("url", [
+    "postgresql://dev:dev@pg:5432/app",
+    "postgresql://dev:dev@pg:5432/app?sslmode=require&application_name=dm",
+    "postgres://pg/app#frag",
+    "postgresql://pg",
+    "postgresql://pg/",
+    "postgresql://u:p%2Fw@[::1]:5432/app",
+])
+def test_with_db_matches_urlparse(url):
+    from urllib.parse import urlparse, urlunparse
+    svc_db._reset_url_cache()
+    expected = urlunparse(urlparse(url)._replace(path="/bootstrap"))
+    assert svc_db._with_db(url, "bootstrap") == expected
+
+
+def test_bootstrap_steps_share_one_admin_session(monkeypatch):
+    connects: list[str] = []
+    closed: list[bool] = []
+
+    class Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            pass
+
+        def fetchone(self):
+            return (1,)
+
+    class Conn:
+        autocommit = False
+
+        def cursor(self):
+            return Cur()
+
+        def close(self):
+            closed.append(True)
+
+    def fake_connect(url):
+        connects.append(url)
+        return Conn()
+
+    monkeypatch.setattr(svc_db.psycopg2, "connect", fake_connect)
+    url = "postgresql://postgres:pw@pg:5432/postgres"
+    with svc_db.admin_session(url) as conn:
+        svc_db.ensure_dev_role(url, conn=conn)
+        svc_db.ensure_database_exists(url, "bootstrap", conn=conn)
+        assert closed == []
+    assert connects == [url]
+    assert closed == [True]
+
+
+def test_pool_conn_replaces_dead_connection_and_drops_broken_one():
+    class Conn:
+        def __init__(self, closed):
+            self.closed = closed
+            self.autocommit = True
+
+    class Pool:
+        def __init__(self):
+            self.idle = [Conn(0), Conn(1)]  # pop() → la connexion morte d'abord
+            self.returned = []
+
+        def getconn(self):
+            return self.idle.pop()
+
+        def putconn(self, conn, close=False):
+            self.returned.append((conn.closed, close))
+
+    pool = Pool()
+    with svc_db.PoolConn(pool) as conn:
+        assert conn.closed == 0
+        conn.closed = 2  # backend perdu pendant la requête
+    assert pool.returned == [(1, True), (2, True)]
+
+
+def test_wait_for_db_probes_tcp_before_connecting(monkeypatch):
+    port_open = iter([False, False, True])
+    connects = []
+
+    class FakeConn:
+        def close(self):
+            pass
+
+    monkeypatch.setattr(svc_db, "_tcp_port_open", lambda target: next(port_open))
+    monkeypatch.setattr(svc_db.time, "sleep", lambda s: None)
+    monkeypatch.setattr(svc_db.psycopg2, "connect",
+                        lambda url, connect_timeout=None: connects.append(url) or FakeConn())
+    svc_db.wait_for_db("postgresql://u:p@db:5433/x", timeout_seconds=30)
+    # Pas de handshake libpq tant que le port est fermé.
+    assert connects == ["postgresql://u:p@db:5433/x"]
+
+
+@pytest.mark.parametrize(("url", "target"), [
+    ("postgresql://u:p@db:5433/x", ("db", 5433)),
+    ("postgresql://u:p@db/x", ("db", 5432)),
+    ("postgresql://u:p@h1:5432,h2:5432/x", None),
+    ("host=db dbname=x", None),
+    ("postgresql:///x?host=/var/run/postgresql", None),
+])
+def test_tcp_target(url, target):
+    assert svc_db._tcp_target(url) == target
+
+
+def test_wait_for_db_can_hand_over_the_probe_connection(monkeypatch):
+    monkeypatch.setattr(svc_db, "_tcp_port_open", lambda target: True)
+    class FakeConn:
+        autocommit = False
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    probe = FakeConn()
+    monkeypatch.setattr(svc_db.psycopg2, "connect", lambda url, connect_timeout=None: probe)
+    assert svc_db.wait_for_db("postgresql://x/y", timeout_seconds=5, keep_open=True) is probe
+    assert probe.autocommit is True and probe.closed is False
+    assert svc_db.wait_for_db("postgresql://x/y", timeout_seconds=5) is None
+    assert probe.closed is True
+
+
+def test_wait_for_db_does_not_retry_rejected_credentials(monkeypatch):
+    monkeypatch.setattr(svc_db, "_tcp_port_open", lambda target: True)
+    attempts = []
+
+    def fake_connect(url, connect_timeout=None):
+        attempts.append(url)
+        raise svc_db.psycopg2.OperationalError('FATAL:  password authentication failed for user "dev"')
+
+    monkeypatch.setattr(svc_db.psycopg2, "connect", fake_connect)
+    monkeypatch.setattr(svc_db.time, "sleep", lambda s: None)
+    with pytest.raises(svc_db.psycopg2.OperationalError, match="password authentication failed"):
+        svc_db.wait_for_db("postgresql://x/y", timeout_seconds=30)
+    assert len(attempts) == 1
+
+
+def test_get_settings_is_memoized_until_cleared(monkeypatch):
+    mod = importlib.import_module("app.settings")
+    assert mod.get_settings() is mod.get_settings()
+    monkeypatch.setenv("DM_DB_POOL_MAX", "7")
+    mod.get_settings.cache_clear()
+    try:
+        assert mod.get_settings().db_pool_max == 7
+    finally:
+        mod.get_settings.cache_clear()
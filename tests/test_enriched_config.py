@@ -289,3 +289,275 @@ def test_update_null_when_current():
         assert body.get("update") is None, f"Expected null update, got: {body.get('update')}"
     finally:
         patcher.stop()
+
+
+# ---------------------------------------------------------------------------
+# Test 6: generic response cached as encoded bytes; file templates memoized
+# ---------------------------------------------------------------------------
+
+def test_generic_config_cache_hit_serves_identical_bytes():
+    mod = _load_module()
+    mod._config_cache_clear()
+    patcher = _install_db_mock(mod, {"cohorts": [], "feature_flags": [],
+                                     "feature_flag_overrides": [], "campaigns": []})
+    try:
+        client = TestClient(mod.app)
+        first = client.get("/config/config.json?profile=prod")
+        second = client.get("/config/config.json?profile=prod")
+        assert first.headers["x-cache"] == "MISS"
+        assert second.headers["x-cache"] == "HIT"
+        assert second.headers["content-type"] == "application/json"
+        assert second.content == first.content
+    finally:
+        patcher.stop()
+        mod._config_cache_clear()
+
+
+def test_config_etag_answers_304_on_matching_if_none_match():
+    mod = _load_module()
+    mod._config_cache_clear()
+    patcher = _install_db_mock(mod, {"cohorts": [], "feature_flags": [],
+                                     "feature_flag_overrides": [], "campaigns": []})
+    try:
+        client = TestClient(mod.app)
+        first = client.get("/config/config.json?profile=prod")
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')  # octets différents (generated_at) : validateur faible
+        hit = client.get("/config/config.json?profile=prod", headers={"If-None-Match": etag})
+        assert hit.status_code == 304 and hit.content == b""
+        assert hit.headers["etag"] == etag and hit.headers["x-cache"] == "HIT"
+        stale = client.get("/config/config.json?profile=prod", headers={"If-None-Match": '"other"'})
+        assert stale.status_code == 200 and stale.content == first.content
+
+        # Rendu non mis en cache (en-tête client) : même contenu hors
+        # generated_at → même ETag, donc 304 aussi.
+        fresh = client.get("/config/config.json?profile=prod", headers={"X-Plugin-Version": "1.0.0"})
+        again = client.get("/config/config.json?profile=prod", headers={
+            "X-Plugin-Version": "1.0.0", "If-None-Match": f'{fresh.headers["etag"].removeprefix("W/")}, "x"'})
+        assert again.status_code == 304 and again.headers["cache-control"] == "no-store"
+    finally:
+        patcher.stop()
+        mod._config_cache_clear()
+
+
+def test_config_bad_profile_returns_preencoded_400():
+    mod = _load_module()
+    res = TestClient(mod.app).get("/config/config.json?profile=" + "x" * 51)
+    assert res.status_code == 400
+    assert res.headers["content-type"] == "application/json"
+    assert res.json() == {"ok": False, "error": "profile must be 'dev' or 'prod' or 'int' "}
+
+
+def test_client_specific_headers_bypass_the_shared_config_cache():
+    mod = _load_module()
+    mod._config_cache_clear()
+    patcher = _install_db_mock(mod, {"cohorts": [], "feature_flags": [],
+                                     "feature_flag_overrides": [], "campaigns": []})
+    try:
+        client = TestClient(mod.app)
+        client.get("/config/config.json?profile=prod")
+        for header in ("X-Plugin-Version", "X-Client-UUID", "X-User-Email", "X-Relay-Client", "X-Client-Id"):
+            res = client.get("/config/config.json?profile=prod", headers={header: "x"})
+            assert res.headers["x-cache"] == "MISS", header
+            assert res.headers["cache-control"] == "no-store", header
+        # En-tête présent mais vide : pas d'identité → cache partagé.
+        res = client.get("/config/config.json?profile=prod", headers={"X-Client-UUID": "  "})
+        assert res.headers["x-cache"] == "HIT"
+    finally:
+        patcher.stop()
+        mod._config_cache_clear()
+
+
+def test_template_file_reparsed_only_when_mtime_changes(tmp_path):
+    mod = _load_module()
+    path = tmp_path / "config.prod.json"
+    path.write_text('{"configVersion": 1, "config": {"a": 1}}', encoding="utf-8")
+    first = mod._load_template_file(str(path))
+    assert mod._load_template_file(str(path)) is first
+    path.write_text('{"configVersion": 1, "config": {"a": 2}}', encoding="utf-8")
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    assert mod._load_template_file(str(path))["config"] == {"a": 2}
+
+
+def test_config_template_path_resolved_once_per_ttl(monkeypatch, tmp_path):
+    mod = _load_module()
+    mod._config_cache_clear()
+    (tmp_path / "config.prod.json").write_text('{"configVersion": 1, "config": {"a": 1}}', encoding="utf-8")
+    monkeypatch.setattr(mod.settings, "config_dir", str(tmp_path))
+    isfile_calls = []
+    real_isfile = mod.os.path.isfile
+    monkeypatch.setattr(mod.os.path, "isfile", lambda p: isfile_calls.append(p) or real_isfile(p))
+    now = [1000.0]
+    monkeypatch.setattr(mod.time, "monotonic", lambda: now[0])
+
+    first = mod._load_config_template("prod", device="libreoffice")
+    probes = len(isfile_calls)
+    assert first["config"] == {"a": 1} and probes >= 1
+    assert mod._load_config_template("prod", device="libreoffice") is first
+    assert len(isfile_calls) == probes, "cache chaud : aucune cascade isfile"
+
+    # Fichier plus prioritaire ajouté à chaud : vu après le TTL.
+    (tmp_path / "libreoffice").mkdir()
+    (tmp_path / "libreoffice" / "config.prod.json").write_text(
+        '{"configVersion": 1, "config": {"a": 2}}', encoding="utf-8")
+    now[0] += mod._CONFIG_PATH_TTL_SECONDS + 1
+    assert mod._load_config_template("prod", device="libreoffice")["config"] == {"a": 2}
+    mod._config_cache_clear()
+
+
+def test_missing_config_template_cached_negatively(monkeypatch, tmp_path):
+    mod = _load_module()
+    mod._config_cache_clear()
+    monkeypatch.setattr(mod.settings, "config_dir", str(tmp_path))
+    monkeypatch.setattr(mod, "_repo_root", lambda: str(tmp_path))
+    resolutions = []
+    real_resolve = mod._resolve_config_template_path
+    monkeypatch.setattr(mod, "_resolve_config_template_path",
+                        lambda *a: resolutions.append(a) or real_resolve(*a))
+
+    for _ in range(3):
+        assert mod._load_config_template("prod", device="nope") == {"configVersion": 1, "config": {}}
+    assert len(resolutions) == 1
+    mod._config_cache_clear()
+
+
+def test_substitute_env_copies_and_substitutes_deep_structures(monkeypatch):
+    mod = _load_module()
+    monkeypatch.setenv("DM_TEST_HOST", "dm.example")
+    template = {"a": {"url": "https://${{DM_TEST_HOST}}/x", "n": 3},
+                "l": ["${DM_TEST_HOST}", {"plain": "no-vars"}]}
+    deep = current = {}
+    for _ in range(3000):  # au-delà de la limite de récursion par défaut
+        current["k"] = {}
+        current = current["k"]
+    current["v"] = "${{DM_TEST_HOST}}"
+    template["deep"] = deep
+
+    out = mod._substitute_env(template)
+    assert out["a"] == {"url": "https://dm.example/x", "n": 3}
+    assert out["l"] == ["dm.example", {"plain": "no-vars"}]
+    node = out["deep"]
+    while "k" in node:
+        node = node["k"]
+    assert node["v"] == "dm.example"
+    # Le template (potentiellement en cache partagé) n'est jamais modifié.
+    assert template["a"]["url"] == "https://${{DM_TEST_HOST}}/x"
+    assert out["l"][1] is not template["l"][1]
+
+
+def test_substitute_env_json_pass_escapes_values_and_leaves_keys(monkeypatch):
+    mod = _load_module()
+    monkeypatch.setenv("DM_TEST_QUOTED", 'a "quoted"\\ value\n')
+    template = {"${{DM_TEST_QUOTED}}": "k", "v": ["x-${{DM_TEST_QUOTED}}", 1, None]}
+    mod._compile_json_template.cache_clear()
+    out = mod._substitute_env(template)
+    assert out == {"${{DM_TEST_QUOTED}}": "k", "v": ['x-a "quoted"\\ value\n', 1, None]}
+    mod._substitute_env(template)
+    assert mod._compile_json_template.cache_info().misses == 1
+    plain = {"a": {"b": ["no placeholders"]}}
+    assert mod._substitute_env(plain) == plain
+    assert mod._compile_json_template.cache_info().currsize == 1
+
+
+def test_template_string_compiled_once_and_rendered_from_env(monkeypatch):
+    mod = _load_module()
+    mod._compile_template_str.cache_clear()
+    monkeypatch.setenv("DM_TEST_A", "alpha")
+    monkeypatch.delenv("DM_TEST_B", raising=False)
+    tpl = "x-${{DM_TEST_A}}-${DM_TEST_B}-${{lower}}-$"
+    assert mod._substitute_env_in_str(tpl) == "x-alpha--${{lower}}-$"
+    monkeypatch.setenv("DM_TEST_B", "beta")
+    assert mod._substitute_env_in_str(tpl) == "x-alpha-beta-${{lower}}-$"
+    assert mod._compile_template_str.cache_info().misses == 1
+    # "$" sans placeholder : même objet renvoyé, aucun join.
+    literal = "cost: $5 ${{lower}}"
+    assert mod._substitute_env_in_str(literal) is literal
+
+
+def test_json_string_rest_regex_stops_at_the_unescaped_quote():
+    mod = _load_module()
+    rest = mod._JSON_STRING_REST_RE
+    for text, end in [
+        ('abc"', 4),
+        ('a\\"b"', 5),
+        ('a\\\\"b"', 4),
+        ('\\n' + "A" * 5000 + '\\n":1', 5005),
+    ]:
+        assert rest.match(text).end() == end
+    assert rest.match('unterminated \\"') is None
+    # Clé à placeholder sur une longue chaîne : toujours laissée littérale.
+    key = "${{DM_TEST_X}}" + "z" * 5000
+    assert mod._substitute_env({key: "v"}) == {key: "v"}
+
+
+def test_substitute_env_json_escapes_each_variable_once_per_env_value(monkeypatch):
+    mod = _load_module()
+    mod._config_cache_clear()
+    monkeypatch.setenv("DM_TEST_REPEAT", "r")
+    escapes = []
+    real = mod._json_escape_value
+    monkeypatch.setattr(mod, "_json_escape_value", lambda value: escapes.append(value) or real(value))
+    template = {"a": "${{DM_TEST_REPEAT}}", "b": ["${{DM_TEST_REPEAT}}/x", {"c": "${DM_TEST_REPEAT}"}]}
+    assert mod._substitute_env(template) == {"a": "r", "b": ["r/x", {"c": "r"}]}
+    assert escapes == ["r"]
+    # Même environnement : rendu servi par le LRU, arbre neuf à chaque appel.
+    first = mod._substitute_env(template)
+    assert mod._substitute_env(template) is not first
+    assert escapes == ["r"]
+    monkeypatch.setenv("DM_TEST_REPEAT", "s")
+    assert mod._substitute_env(template)["a"] == "s"
+    assert escapes == ["r", "s"]
+    mod._config_cache_clear()
+    assert mod._render_json_template.cache_info().currsize == 0
+
+
+def test_keycloak_group_access_uses_memoized_token_groups():
+    import base64
+    import json
+
+    from starlette.requests import Request
+
+    mod = _load_module()
+    mod._jwt_payload_groups.cache_clear()
+
+    def _req(groups):
+        payload = base64.urlsafe_b64encode(json.dumps({"groups": groups}).encode()).decode().rstrip("=")
+        auth = f"Bearer h.{payload}.sig".encode()
+        return Request({"type": "http", "headers": [(b"authorization", auth)]})
+
+    row = {"id": 1, "access_mode": "keycloak_group", "required_group": "beta"}
+    assert mod._check_plugin_access(row, _req(["alpha", "beta"]), cur=None) is True
+    assert mod._check_plugin_access(row, _req(["alpha", "beta"]), cur=None) is True
+    assert mod._jwt_payload_groups.cache_info().hits == 1
+    assert mod._check_plugin_access(row, _req(["alpha"]), cur=None) is False
+    # Chaîne : groupe unique, plus de correspondance par sous-chaîne.
+    assert mod._check_plugin_access(row, _req("beta-testers"), cur=None) is False
+    assert mod._check_plugin_access(row, _req("beta"), cur=None) is True
+    garbage = Request({"type": "http", "headers": [(b"authorization", b"Bearer not-a-jwt")]})
+    assert mod._check_plugin_access(row, garbage, cur=None) is False
+
+
+def test_resolve_device_matches_slug_or_alias_in_one_round_trip():
+    mod = _load_module()
+
+    class _Cur:
+        def __init__(self, row):
+            self.row = row
+            self.executed = []
+
+        def execute(self, sql, params=None):
+            self.executed.append(params)
+
+        def fetchone(self):
+            return self.row
+
+    cur = _Cur(("libreoffice", "libreoffice", 1))
+    assert mod._resolve_device("libreoffice", cur) == ("libreoffice", "libreoffice", 1, "slug")
+    assert cur.executed == [("libreoffice", "libreoffice", "libreoffice")]
+
+    cur = _Cur(("mirai-libreoffice", "libreoffice", 2))
+    assert mod._resolve_device("lo", cur) == ("mirai-libreoffice", "libreoffice", 2, "alias")
+    assert len(cur.executed) == 1
+
+    assert mod._resolve_device("matisse", _Cur(None)) == ("matisse", "matisse", None, "fallback")
+    assert mod._resolve_device("nope", _Cur(None)) == (None, None, None, "unknown")
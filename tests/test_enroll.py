@@ -2,10 +2,14 @@ import base64
 import importlib
 import json
 import os
+import re
 import sys
 
 from fastapi.testclient import TestClient
 
+# plugin_uuid canonique : _normalize_client_uuid le renvoie inchangé.
+_PLUGIN_UUID = "b9bdf6ad-3b1f-4f1a-9f07-4f8606c3fe5a"
+
 
 def _mk_fake_jwt(payload: dict) -> str:
     header = {"alg": "none", "typ": "JWT"}
@@ -30,11 +34,11 @@ def _load_app(*, verify_access_token: bool = False):
     os.environ["DM_RELAY_ALLOWED_TARGETS_CSV"] = "keycloak,config,llm"
     os.environ["DM_AUTH_VERIFY_ACCESS_TOKEN"] = "true" if verify_access_token else "false"
 
+    # Les pop ci-dessus suffisent à obtenir un module neuf : un reload en plus
+    # réexécuterait tout app.main (routes, middlewares) une seconde fois.
     sys.modules.pop("app.main", None)
     sys.modules.pop("app.settings", None)
-    mod = importlib.import_module("app.main")
-    importlib.reload(mod)
-    return mod.app
+    return importlib.import_module("app.main").app
 
 
 def test_enroll_requires_pkce_access_token():
@@ -42,7 +46,7 @@ def test_enroll_requires_pkce_access_token():
     client = TestClient(app)
     payload = {
         "device_name": "libreoffice",
-        "plugin_uuid": "b9bdf6ad-3b1f-4f1a-9f07-4f8606c3fe5a",
+        "plugin_uuid": _PLUGIN_UUID,
     }
     res = client.post("/enroll", json=payload)
     assert res.status_code == 401
@@ -56,7 +60,7 @@ def test_enroll_returns_relay_credentials_after_pkce():
     token = _mk_fake_jwt({"email": "user@example.com", "exp": 4102444800})
     payload = {
         "device_name": "libreoffice",
-        "plugin_uuid": "b9bdf6ad-3b1f-4f1a-9f07-4f8606c3fe5a",
+        "plugin_uuid": _PLUGIN_UUID,
     }
     res = client.post("/enroll", json=payload, headers={"Authorization": f"Bearer {token}"})
     assert res.status_code == 201
@@ -74,7 +78,7 @@ def test_enroll_requires_auth_backend_when_verification_enabled():
     token = _mk_fake_jwt({"email": "user@example.com", "exp": 4102444800})
     payload = {
         "device_name": "libreoffice",
-        "plugin_uuid": "b9bdf6ad-3b1f-4f1a-9f07-4f8606c3fe5a",
+        "plugin_uuid": _PLUGIN_UUID,
     }
     res = client.post("/enroll", json=payload, headers={"Authorization": f"Bearer {token}"})
     # In unit tests, no OIDC/JWKS backend is configured/reachable, so the API
@@ -93,3 +97,216 @@ def test_enroll_missing_fields():
     body = res.json()
     assert body.get("ok") is False
     assert "Missing required fields" in body.get("error", "")
+
+
+def test_enroll_records_db_after_response(monkeypatch):
+    app = _load_app()
+    mod = sys.modules["app.main"]
+    recorded = []
+    monkeypatch.setattr(mod, "_get_queue_manager", lambda: None)
+    monkeypatch.setattr(mod, "_mint_or_rotate_relay_credentials",
+                        lambda **kw: {"client_id": "rc_test", "client_key": "k", "expires_at": 0})
+    monkeypatch.setattr(mod, "_record_enroll_db", lambda **kw: recorded.append(kw))
+    client = TestClient(app)
+    token = _mk_fake_jwt({"email": "user@example.com", "exp": 4102444800})
+    payload = {
+        "device_name": "libreoffice",
+        "plugin_uuid": _PLUGIN_UUID,
+    }
+    res = client.post("/enroll", json=payload, headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 201
+    # Tâche de fond : provisioning + log DB une seule fois, hors chemin critique.
+    assert len(recorded) == 1
+    assert recorded[0]["client_uuid"] == _PLUGIN_UUID
+    assert recorded[0]["email"] == "user@example.com"
+
+
+def test_enroll_constant_error_bodies_are_unchanged():
+    app = _load_app()
+    client = TestClient(app)
+    token = _mk_fake_jwt({"email": "user@example.com", "exp": 4102444800})
+    auth = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    cases = [
+        (b"", auth, 400, "Empty body"),
+        (b"{nope", auth, 400, "Body is not valid JSON"),
+        (b"[1]", auth, 400, "Body must be a JSON object"),
+        (b" \n[1]", auth, 400, "Body must be a JSON object"),
+        (b'"device"', auth, 400, "Body must be a JSON object"),
+        (b" \t\r\n", auth, 400, "Body is not valid JSON"),
+        (b"<html></html>", auth, 400, "Body is not valid JSON"),
+        (b'{"device_name": "d", "plugin_uuid": "u"}', {"Content-Type": "application/json"},
+         401, "Missing or invalid PKCE access token."),
+    ]
+    for body, headers, status, error in cases:
+        res = client.post("/enroll", content=body, headers=headers)
+        assert res.status_code == status
+        assert res.headers["content-type"] == "application/json"
+        assert res.json() == {"ok": False, "error": error}
+
+
+def test_enroll_rejects_non_json_bodies_without_parsing(monkeypatch):
+    app = _load_app()
+    mod = sys.modules["app.main"]
+    monkeypatch.setattr(mod, "_fast_json_loads",
+                        lambda body: (_ for _ in ()).throw(AssertionError("parser called")))
+    client = TestClient(app)
+    for body in (b"device_name=d&plugin_uuid=u", b"GET / HTTP/1.1", b"\x00\x01"):
+        res = client.post("/enroll", content=body)
+        assert res.status_code == 400
+        assert res.json() == {"ok": False, "error": "Body is not valid JSON"}
+
+
+def test_enroll_reads_fingerprint_agent_and_idempotency_headers(monkeypatch):
+    app = _load_app()
+    mod = sys.modules["app.main"]
+    calls = []
+    monkeypatch.setattr(mod, "_enroll_persist_sync",
+                        lambda **kw: calls.append(kw) or ({}, {}, True, "job-1"))
+    client = TestClient(app)
+    token = _mk_fake_jwt({"email": "user@example.com", "exp": 4102444800})
+    payload = {
+        "device_name": "libreoffice",
+        "plugin_uuid": _PLUGIN_UUID,
+        "encryption_key_fingerprint": "body-fp",
+    }
+    res = client.post("/enroll", json=payload, headers={
+        "Authorization": f"Bearer {token}",
+        "User-Agent": "mirai/1.0",
+        "X-Request-Id": "req-7",
+    })
+    assert res.status_code == 201
+    assert calls[0]["fingerprint"] == "body-fp"
+    assert calls[0]["user_agent"] == "mirai/1.0"
+    assert calls[0]["dedupe_key"] == f"enroll:{_PLUGIN_UUID}:req-7"
+
+    client.post("/enroll", json=payload, headers={
+        "Authorization": f"Bearer {token}",
+        "X-Encryption-Key-Fingerprint": "hdr-fp",
+        "X-Idempotency-Key": "idem-1",
+        "X-Request-Id": "req-8",
+    })
+    assert calls[1]["fingerprint"] == "hdr-fp"
+    assert calls[1]["dedupe_key"].endswith(":idem-1")
+
+
+def test_enroll_rejects_oversized_body_before_reading_it(monkeypatch):
+    app = _load_app()
+    mod = sys.modules["app.main"]
+    monkeypatch.setattr(mod, "MAX_BODY_BYTES", 64)
+    client = TestClient(app)
+    res = client.post("/enroll", content=b"{" + b" " * 100 + b"}",
+                      headers={"Content-Type": "application/json"})
+    assert res.status_code == 413
+
+    # Sans Content-Length (chunked) : la lecture en flux s'arrête à la limite.
+    def _chunks():
+        yield b"{"
+        yield b" " * 100
+        yield b"}"
+
+    res = client.post("/enroll", content=_chunks(), headers={"Content-Type": "application/json"})
+    assert res.status_code == 413
+
+
+def test_read_body_limited_returns_single_chunk_without_copy():
+    import asyncio
+
+    _load_app()
+    mod = sys.modules["app.main"]
+
+    class _Req:
+        def __init__(self, parts):
+            self.headers = {}
+            self._parts = parts
+
+        async def stream(self):
+            for part in self._parts:
+                yield part
+
+    single = b'{"device_name": "x"}'
+    assert asyncio.run(mod._read_body_limited(_Req([single, b""]), 1024)) is single
+    assert asyncio.run(mod._read_body_limited(_Req([b"ab", b"", b"cd"]), 1024)) == b"abcd"
+    assert asyncio.run(mod._read_body_limited(_Req([b"ab", b"cd"]), 3)) is None
+
+
+def test_enroll_dir_is_created_once_and_recreated_if_removed(monkeypatch, tmp_path):
+    import shutil
+
+    _load_app()
+    mod = sys.modules["app.main"]
+    enroll_dir = str(tmp_path / "enroll")
+    monkeypatch.setattr(mod.settings, "enroll_dir", enroll_dir)
+    monkeypatch.setattr(mod.settings, "store_enroll_locally", True)
+    monkeypatch.setattr(mod.settings, "store_enroll_s3", False)
+    kwargs = dict(email="a@b", client_uuid="u", fingerprint="fp", device_name="d",
+                  source_ip=None, user_agent=None, record_db=False)
+
+    first = mod._persist_enroll_side_effects(body=b"{}", **kwargs)
+    assert enroll_dir in mod._READY_DIRS
+    assert re.fullmatch(r"\d{13}-[0-9a-f]{16}\.json", os.path.basename(first["local"]))
+    shutil.rmtree(enroll_dir)
+    second = mod._persist_enroll_side_effects(body=b"{}", **kwargs)
+    assert os.path.isfile(first["local"]) is False
+    assert os.path.isfile(second["local"])
+
+
+def test_enroll_local_and_s3_writes_run_concurrently(monkeypatch, tmp_path):
+    import threading
+
+    _load_app()
+    mod = sys.modules["app.main"]
+    monkeypatch.setattr(mod.settings, "enroll_dir", str(tmp_path))
+    monkeypatch.setattr(mod.settings, "store_enroll_locally", True)
+    monkeypatch.setattr(mod.settings, "store_enroll_s3", True)
+    monkeypatch.setattr(mod.settings, "s3_bucket", "bkt")
+    both_started = threading.Barrier(2, timeout=5)
+    real_write = mod._write_bytes
+
+    class _S3:
+        def put_object(self, **kw):
+            both_started.wait()  # bloque tant que l'écriture disque n'a pas démarré
+
+    def slow_write(path, data):
+        both_started.wait()
+        real_write(path, data)
+
+    monkeypatch.setattr(mod, "s3_client", lambda: _S3())
+    monkeypatch.setattr(mod, "_write_bytes", slow_write)
+    stored = mod._persist_enroll_side_effects(
+        body=b"{}", email="a@b", client_uuid="u", fingerprint="fp", device_name="d",
+        source_ip=None, user_agent=None, record_db=False,
+    )
+    assert os.path.isfile(stored["local"])
+    assert stored["s3"] == f"s3://bkt/enroll/{os.path.basename(stored['local'])}"
+
+
+def test_write_bytes_matches_open_wb(tmp_path):
+    _load_app()
+    mod = sys.modules["app.main"]
+    path = str(tmp_path / "payload.json")
+    mod._write_bytes(path, b"x" * 100_000)
+    mod._write_bytes(path, b'{"ok": true}')  # tronqué comme "wb"
+    with open(path, "rb") as f:
+        assert f.read() == b'{"ok": true}'
+    with open(tmp_path / "ref", "wb"):
+        pass
+    assert os.stat(path).st_mode == os.stat(tmp_path / "ref").st_mode
+
+
+def test_extract_identity_reads_headers_in_one_pass():
+    from starlette.requests import Request as _Request
+
+    _load_app()
+    mod = sys.modules["app.main"]
+    scope = {"type": "http", "headers": [
+        (b"x-client-uuid", b"hdr-uuid"),
+        (b"x-user-email", b""),
+        (b"x-user-email", b"late@b"),
+    ]}
+    email, client_uuid, fp = mod._extract_identity(_Request(scope), {"email": "body@b", "encryption_key_fingerprint": "fp"})
+    # Première occurrence (vide) retenue comme Headers.get → repli sur le body.
+    assert (email, client_uuid, fp) == ("body@b", "hdr-uuid", "fp")
+    assert mod._extract_identity(_Request({"type": "http", "headers": []})) == (
+        "unknown@local", "00000000-0000-0000-0000-000000000000", "unknown")
+    anon = mod._extract_identity(_Request({"type": "http", "headers": [(b"x-user-email", b"")]}), {})
+    assert anon is mod._extract_identity(_Request({"type": "http", "headers": []}))
@@ -0,0 +1,22 @@
+"""app.fastjson : orjson optionnel, sortie équivalente à JSONResponse."""
+import json
+
+from fastapi.responses import JSONResponse
+
+from app import fastjson
+
+
+def test_response_matches_stdlib_shape():
+    content = {"é": "ü", "n": [1, 2.5, None, True], 3: "int-key"}
+    body = fastjson.FastJSONResponse(content).body
+    assert json.loads(body) == json.loads(JSONResponse(content).body)
+    assert b" " not in body  # forme compacte, comme JSONResponse
+
+
+def test_unsupported_value_falls_back_to_stdlib():
+    big = 2**70  # hors plage orjson, accepté par json
+    assert json.loads(fastjson.FastJSONResponse({"v": big}).body) == {"v": big}
+
+
+def test_loads_accepts_bytes():
+    assert fastjson.loads('{"a": "é"}'.encode()) == {"a": "é"}
@@ -135,6 +135,32 @@ def test_resolve_forced_flags_min_plugin_version_gating():
     assert unknown == {}, "version inconnue → fail-safe"
 
 
+def test_resolve_cohorts_email_pattern_compiled_once_and_invalid_ignored():
+    mod = _load_module()
+    mod._cohort_email_regex.cache_clear()
+    rows = [
+        (1, "email_pattern", {"pattern": r".*@Example\.org$"}),
+        (2, "email_pattern", {"pattern": "(unclosed"}),
+        (3, "email_pattern", {"pattern": ""}),
+    ]
+    for _ in range(3):
+        ids = mod._resolve_device_cohorts(_FakeCur(rows), email="alice@example.org", client_uuid="u")
+        assert ids == [1]
+    info = mod._cohort_email_regex.cache_info()
+    assert info.misses == 3 and info.hits == 6
+
+
+def test_resolve_cohorts_keycloak_group_matches_case_insensitively():
+    mod = _load_module()
+    mod._KC_GROUP_CACHE.clear()
+    members = mod._kc_group_cache_store("beta", ["Alice@Example.org", "bob@example.org"])
+    assert members == {"alice@example.org", "bob@example.org"}
+    rows = [(7, "keycloak_group", {"group_name": "beta"})]
+    assert mod._resolve_device_cohorts(_FakeCur(rows), email="ALICE@example.org", client_uuid="u") == [7]
+    assert mod._resolve_device_cohorts(_FakeCur(rows), email="carol@example.org", client_uuid="u") == []
+    mod._KC_GROUP_CACHE.clear()
+
+
 # ---------------------------------------------------------------------------
 # E2E (/config, DB mockée) : per-profil, override cohorte, gating
 # ---------------------------------------------------------------------------
@@ -118,6 +118,25 @@ def test_backend_registry_routes_by_model_map():
     assert recorder.requests[-1].url.host == "backend.test"
 
 
+def test_backend_registry_parses_spec_once_but_reads_tokens_live(monkeypatch):
+    from app.llm import backends
+
+    backends._parse_backends_spec.cache_clear()
+    monkeypatch.setenv("LLM_BACKENDS", json.dumps({
+        "backends": {"b": {"base_url": "https://backend-b.test/v1/", "token_env": "LLM_API_TOKEN_B"}},
+        "model_map": {"b-*": "b"},
+    }))
+    monkeypatch.setenv("LLM_API_TOKEN_B", "old")  # nosec B105: valeur factice
+    assert backends.BackendRegistry.from_env().resolve("b-chat").api_token == "old"
+    monkeypatch.setenv("LLM_API_TOKEN_B", "new")  # nosec B105: valeur factice
+    registry = backends.BackendRegistry.from_env()
+    assert registry.resolve("b-chat") == backends.Backend("b", "https://backend-b.test/v1", "new")
+    assert backends._parse_backends_spec.cache_info().hits == 1
+
+    monkeypatch.setenv("LLM_BACKENDS", "{not json")
+    assert backends.BackendRegistry.from_env().model_map == {}
+
+
 # ── Streaming : le pipeline forwarde chunk par chunk (zéro bufferisation) ────
 
 def test_wrap_stream_forwards_chunk_by_chunk():
@@ -65,3 +65,24 @@ def test_configure_logging_installs_json_formatter_when_dm_log_format_json(monke
     finally:
         root.removeHandler(installed)
         root.addHandler(stdout_handler)
+
+
+def test_trace_id_and_request_id_are_the_same_value():
+    from fastapi import Request
+
+    from app.observability import request_id_middleware
+
+    seen = {}
+
+    async def call_next(request: Request):
+        from starlette.responses import Response
+
+        seen["trace"] = request.state.trace_id
+        seen["rid"] = request.state.request_id
+        return Response()
+
+    import asyncio
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"x-request-id", b"x" * 100)]}
+    res = asyncio.run(request_id_middleware(Request(scope), call_next))
+    assert seen["trace"] == seen["rid"] == res.headers["X-Request-ID"] == "x" * 64
@@ -124,6 +124,9 @@ def client(mod):
 # Tests: Liveness & Health
 # ---------------------------------------------------------------------------
 
+_HEALTH_CHECK_STATUSES = frozenset({"ok", "error", "skipped"})
+
+
 class TestLiveness:
     def test_livez_always_200(self, client):
         resp = client.get("/livez")
@@ -134,6 +137,9 @@ class TestLiveness:
         assert resp.status_code in (200, 503)
         data = resp.json()
         assert "status" in data
+        bad = {name: check.get("status") for name, check in data["checks"].items()
+               if check.get("status") not in _HEALTH_CHECK_STATUSES}
+        assert not bad, f"Invalid check statuses: {bad}"
 
 
 # ---------------------------------------------------------------------------
@@ -210,6 +216,35 @@ class TestHealthFull:
         assert data["status"] == "error"
         assert data["services"]["postgres"]["status"] == "error"
 
+    def test_health_full_probes_run_concurrently(self, client, mod, monkeypatch):
+        import threading
+        import urllib.request
+
+        # Les 4 sondes ne passent la barrière qu'ensemble : en série, la
+        # première attendrait seule jusqu'au timeout et tout serait en erreur.
+        barrier = threading.Barrier(4, timeout=5)
+
+        class _Resp:
+            def close(self):
+                pass
+
+        def _urlopen(*a, **kw):
+            barrier.wait()
+            return _Resp()
+
+        def _connect(*a, **kw):
+            barrier.wait()
+            return _make_conn(_make_cursor({"SELECT 1": [(1,)]}))
+
+        monkeypatch.setenv("DM_AUTH_JWKS_URL", "http://kc/jwks")
+        monkeypatch.setenv("LLM_BASE_URL", "http://llm/v1")
+        monkeypatch.setattr(urllib.request, "urlopen", _urlopen)
+        with patch.object(mod.psycopg2, "connect", side_effect=_connect):
+            resp = client.get("/ops/health/full")
+        services = resp.json()["services"]
+        assert list(services) == ["postgres", "keycloak", "llm", "relay"]
+        assert {name: svc["status"] for name, svc in services.items()} == dict.fromkeys(services, "ok")
+
 
 # ---------------------------------------------------------------------------
 # Tests: Config Cache
@@ -246,28 +281,21 @@ class TestConfigCache:
 # ---------------------------------------------------------------------------
 
 class TestVersionComparison:
-    def test_parse_version_tuple_3_segments(self, mod):
-        assert mod._parse_version_tuple("1.2.3") == (1, 2, 3)
-
-    def test_parse_version_tuple_5_segments(self, mod):
-        assert mod._parse_version_tuple("0.0.1.0.4") == (0, 0, 1, 0, 4)
-
-    def test_parse_version_tuple_1_segment(self, mod):
-        assert mod._parse_version_tuple("42") == (42,)
-
-    def test_parse_version_tuple_invalid(self, mod):
-        assert mod._parse_version_tuple("abc") == (0,)
-
-    def test_version_comparison_5_segments(self, mod):
-        """Regression: versions with 5 segments must compare correctly."""
-        v1 = mod._parse_version_tuple("0.0.1.0.3")
-        v2 = mod._parse_version_tuple("0.0.1.0.4")
-        assert v1 < v2
-
-    def test_version_comparison_mixed_lengths(self, mod):
-        v1 = mod._parse_version_tuple("1.0")
-        v2 = mod._parse_version_tuple("1.0.1")
-        assert v1 < v2
+    @pytest.mark.parametrize(("raw", "expected"), [
+        ("1.2.3", (1, 2, 3)),
+        ("0.0.1.0.4", (0, 0, 1, 0, 4)),
+        ("42", (42,)),
+        ("abc", (0,)),
+    ])
+    def test_parse_version_tuple(self, mod, raw, expected):
+        assert mod._parse_version_tuple(raw) == expected
+
+    @pytest.mark.parametrize(("older", "newer"), [
+        ("0.0.1.0.3", "0.0.1.0.4"),  # regression: 5 segments
+        ("1.0", "1.0.1"),  # mixed lengths
+    ])
+    def test_version_comparison(self, mod, older, newer):
+        assert mod._parse_version_tuple(older) < mod._parse_version_tuple(newer)
 
 
 # ---------------------------------------------------------------------------
@@ -293,18 +321,15 @@ class TestCatalogAPI:
             resp = client.get("/catalog/api/plugins")
         assert resp.headers.get("access-control-allow-origin") == "*"
 
-    def test_catalog_api_plugin_not_found(self, client, mod):
+    @pytest.mark.parametrize("path", [
+        "/catalog/api/plugins/nonexistent",
+        "/catalog/api/plugins/nonexistent/icon.png",
+    ])
+    def test_catalog_unknown_plugin_not_found(self, client, mod, path):
         cur = _make_cursor({})
         conn = _make_conn(cur)
         with patch.object(mod.psycopg2, "connect", return_value=conn):
-            resp = client.get("/catalog/api/plugins/nonexistent")
-        assert resp.status_code == 404
-
-    def test_catalog_icon_not_found(self, client, mod):
-        cur = _make_cursor({})
-        conn = _make_conn(cur)
-        with patch.object(mod.psycopg2, "connect", return_value=conn):
-            resp = client.get("/catalog/api/plugins/nonexistent/icon.png")
+            resp = client.get(path)
         assert resp.status_code == 404
 
 
@@ -313,13 +338,9 @@ class TestCatalogAPI:
 # ---------------------------------------------------------------------------
 
 class TestDeployAPI:
-    def test_deploy_requires_token(self, client):
-        resp = client.post("/api/plugins/test/deploy")
-        assert resp.status_code == 401
-
-    def test_deploy_rejects_bad_token(self, client):
-        resp = client.post("/api/plugins/test/deploy",
-                           headers={"X-Admin-Token": "wrong-token"})
+    @pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong-token"}])
+    def test_deploy_rejects_missing_or_bad_token(self, client, headers):
+        resp = client.post("/api/plugins/test/deploy", headers=headers)
         assert resp.status_code == 401
 
     def test_deploy_requires_binary(self, client):
@@ -328,6 +349,18 @@ class TestDeployAPI:
         # 400 or 422 (no binary provided)
         assert resp.status_code in (400, 422)
 
+    @pytest.mark.parametrize(("form", "filename", "error"), [
+        ({"device_type": "../etc", "version": "1.0"}, "a.oxt", "invalid device_type"),
+        ({"device_type": "libreoffice", "version": ".1"}, "a.oxt", "invalid version"),
+        ({"device_type": "libreoffice", "version": "1.0"}, "a b.oxt", "invalid filename"),
+    ])
+    def test_artifact_upload_rejects_unsafe_path_segments(self, client, form, filename, error):
+        resp = client.post("/api/artifacts", data=form,
+                           files={"binary": (filename, b"zip")},
+                           headers={"X-Admin-Token": "test-admin-token"})
+        assert resp.status_code == 400
+        assert resp.json()["error"] == error
+
 
 # ---------------------------------------------------------------------------
 # Tests: Download Route
@@ -390,10 +423,7 @@ class TestSecurityHeaders:
         assert resp.headers.get("x-content-type-options") == "nosniff"
         assert resp.headers.get("referrer-policy") == "strict-origin-when-cross-origin"
 
-    def test_files_api_requires_token(self, client):
-        resp = client.get("/api/files")
-        assert resp.status_code == 403
-
-    def test_files_api_rejects_bad_token(self, client):
-        resp = client.get("/api/files", headers={"x-admin-token": "wrong"})
+    @pytest.mark.parametrize("headers", [{}, {"x-admin-token": "wrong"}])
+    def test_files_api_rejects_missing_or_bad_token(self, client, headers):
+        resp = client.get("/api/files", headers=headers)
         assert resp.status_code == 403
@@ -43,6 +43,8 @@ def _load_module(
     os.environ["DM_RUNTIME_MODE"] = "api"
     os.environ["DM_BINARIES_MODE"] = binaries_mode
     os.environ["DM_S3_BUCKET"] = s3_bucket
+    os.environ.pop("DATABASE_URL", None)
+    os.environ.pop("DATABASE_ADMIN_URL", None)
 
     sys.modules.pop("app.main", None)
     sys.modules.pop("app.settings", None)
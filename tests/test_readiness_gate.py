@@ -6,7 +6,7 @@ import app.runtime_config as rc
 from app.main import app
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def client():
     return TestClient(app)
 
@@ -1,4 +1,5 @@
 import base64
+import contextlib
 import importlib
 import json
 import os
@@ -161,3 +162,49 @@ def test_relay_authorize_telemetry_with_proxy_token():
     body = allowed.json()
     assert body.get("ok") is True
     assert body.get("target") == "telemetry"
+
+
+def test_effective_relay_targets_normalizes_and_extends_config():
+    mod = _load_module()
+    targets, ordered = mod._effective_relay_targets((" Config ", "keycloak", ""))
+    assert targets == {"config", "keycloak", "telemetry", "llm"}
+    assert ordered == ("config", "keycloak", "llm", "telemetry")
+    assert mod._effective_relay_targets(("keycloak",))[0] == {"keycloak"}
+
+
+def test_relay_lookup_borrows_a_pooled_connection(monkeypatch):
+    mod = _load_module()
+    executed, borrowed = [], []
+
+    class _Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params):
+            executed.append(params)
+
+        def fetchone(self):
+            return ("u-1", "a@b", "hash", ["config"], 0, None)
+
+    class _Conn:
+        def cursor(self):
+            return _Cur()
+
+    @contextlib.contextmanager
+    def _pooled():
+        borrowed.append(1)
+        yield _Conn()
+
+    def _no_direct(*a, **kw):
+        raise AssertionError("direct psycopg2.connect on the relay hot path")
+
+    monkeypatch.setattr(mod, "psycopg2", type("_Pg", (), {"connect": staticmethod(_no_direct)}))
+    monkeypatch.setattr(mod, "_db_url_bootstrap", lambda: "postgresql://db/x")
+    monkeypatch.setattr(mod, "_db_conn", _pooled)
+    row = mod._lookup_relay_client("rc-1")
+    assert borrowed == [1] and executed == [("rc-1",)]
+    assert row == {"client_uuid": "u-1", "email": "a@b", "relay_key_hash": "hash",
+                   "allowed_targets": ["config"], "expires_at": 0, "revoked": False}
@@ -1,15 +1,26 @@
 """Cloud-native readiness — retries bornées (backoff + jitter) sur les appels
 réseau transitoires (JWKS/Keycloak, LLM), jamais sur une erreur 4xx."""
 
+import functools
 import urllib.error
 
 import httpx
 import pytest
+import tenacity
 
 from app import resilience
 
 
-def test_retries_on_connection_error_then_succeeds():
+@pytest.fixture(autouse=True)
+def backoff_sleeps(monkeypatch):
+    """Backoff enregistré au lieu d'être dormi : la politique est vérifiée sans
+    payer ~6 s de sommeil réel par exécution de la suite."""
+    sleeps: list[float] = []
+    monkeypatch.setattr(resilience, "retry", functools.partial(tenacity.retry, sleep=sleeps.append))
+    return sleeps
+
+
+def test_retries_on_connection_error_then_succeeds(backoff_sleeps):
     calls = {"n": 0}
 
     @resilience.retry_transient()
@@ -21,9 +32,13 @@ def test_retries_on_connection_error_then_succeeds():
 
     assert flaky() == "ok"
     assert calls["n"] == 3
+    # initial=0.5 puis ×2, chacun + jitter ≤ 1 s.
+    assert len(backoff_sleeps) == 2
+    assert 0.5 <= backoff_sleeps[0] <= 1.5
+    assert 1.0 <= backoff_sleeps[1] <= 2.0
 
 
-def test_gives_up_after_max_attempts():
+def test_gives_up_after_max_attempts(backoff_sleeps):
     calls = {"n": 0}
 
     @resilience.retry_transient(attempts=3)
@@ -34,6 +49,7 @@ def test_gives_up_after_max_attempts():
     with pytest.raises(TimeoutError):
         always_fails()
     assert calls["n"] == 3
+    assert len(backoff_sleeps) == 2  # pas de sommeil après la dernière tentative
 
 
 def test_does_not_retry_client_errors():
@@ -94,3 +94,69 @@ def test_admin_base_redirect_does_not_require_auth():
     client = TestClient(_admin_app(), follow_redirects=False)
     r = client.get("/admin")
     assert r.status_code == 307
+
+
+def test_oidc_callback_exchanges_and_verifies_off_the_event_loop():
+    """Échange du code + vérif de l'ID Token (I/O + RSA) : threadpool, pas la
+    boucle ; puis 302 vers /admin/ en chemin absolu."""
+    import threading
+    from unittest.mock import patch
+
+    import app.admin.router as router_mod
+
+    seen = {}
+
+    def _fake_exchange(token_url, token_params, jwks_uri, expected_iss):
+        seen["thread"] = threading.current_thread()
+        seen["args"] = (token_url, token_params["code"], jwks_uri, expected_iss)
+        return {"id_token": "idt"}, {"sub": "s", "email": "a@b"}
+
+    cfg = {"jwks_uri": "https://kc/certs", "issuer": "https://kc/realms/x"}
+    client = TestClient(_admin_app(), follow_redirects=False)
+    with patch.object(router_mod, "_get_oidc_config", return_value=cfg), \
+         patch.object(router_mod, "_get_token_endpoint", return_value="https://kc/token"), \
+         patch.object(router_mod, "_has_admin_group", return_value=True), \
+         patch.object(router_mod, "_exchange_code_and_verify", _fake_exchange):
+        client.cookies.set("dm_oidc_state", "st")
+        r = client.get("/admin/callback?code=c&state=st")
+
+    assert r.status_code == 302
+    assert r.headers["location"] == "/admin/"
+    assert seen["args"] == ("https://kc/token", "c", "https://kc/certs", "https://kc/realms/x")
+    assert seen["thread"] is not threading.main_thread()
+
+
+def test_admin_jwks_client_shared_per_uri():
+    import app.admin.router as router_mod
+
+    router_mod._admin_jwks_client.cache_clear()
+    first = router_mod._admin_jwks_client("https://kc/realms/x/certs")
+    assert router_mod._admin_jwks_client("https://kc/realms/x/certs") is first
+    assert router_mod._admin_jwks_client("https://kc/realms/y/certs") is not first
+    router_mod._admin_jwks_client.cache_clear()
+
+
+def test_files_upload_writes_binary_off_the_event_loop(monkeypatch, tmp_path):
+    import threading
+
+    from app.admin import router as admin_router
+
+    monkeypatch.setenv("DM_QUEUE_ADMIN_TOKEN", "tok")
+    monkeypatch.setenv("DM_LOCAL_BINARIES_DIR", str(tmp_path))
+    writer_threads = []
+    real_write = admin_router._write_upload_file
+
+    def spy(full, data):
+        writer_threads.append(threading.current_thread())
+        real_write(full, data)
+
+    monkeypatch.setattr(admin_router, "_write_upload_file", spy)
+    client = TestClient(_admin_app())
+    r = client.put(
+        "/admin/api/files/upload/libreoffice/x-1.0.oxt",
+        headers={"x-admin-token": "tok"},
+        files={"file": ("x-1.0.oxt", b"PK\x03\x04payload")},
+    )
+    assert r.status_code == 200 and r.json()["size"] == 11
+    assert (tmp_path / "libreoffice" / "x-1.0.oxt").read_bytes() == b"PK\x03\x04payload"
+    assert writer_threads and writer_threads[0] is not threading.main_thread()
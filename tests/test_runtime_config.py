@@ -8,7 +8,9 @@ import app.runtime_config as rc
 
 @pytest.fixture(autouse=True)
 def _reset_state(monkeypatch):
-    # Fresh baseline each test; clear module state.
+    # Fresh baseline each test; clear module state (restored afterwards so the
+    # forced baseline does not leak into the next test module).
+    saved = (dict(rc._BASELINE_PY), dict(rc._OVERRIDES_META), rc._baseline_ready)
     monkeypatch.setenv("API_BASE", "https://api.example")
     monkeypatch.setenv("DM_BOOTSTRAP_URLS", "https://a,https://b")
     monkeypatch.setenv("DM_CONFIG_SECRET_KEY", "unit-test-master-key")
@@ -17,6 +19,11 @@ def _reset_state(monkeypatch):
     rc._baseline_ready = False
     rc.snapshot_baseline(force=True)
     yield
+    rc._BASELINE_PY.clear()
+    rc._BASELINE_PY.update(saved[0])
+    rc._OVERRIDES_META.clear()
+    rc._OVERRIDES_META.update(saved[1])
+    rc._baseline_ready = saved[2]
 
 
 def test_baseline_snapshot_str_and_list():
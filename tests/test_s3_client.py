@@ -0,0 +1,28 @@
+"""app.s3.s3_client : un client partagé, reconstruit si ses paramètres changent."""
+from app import s3
+
+
+def test_client_reused_until_credentials_change(monkeypatch):
+    s3._cached_client.cache_clear()
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "key-1")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret-1")
+    first = s3.s3_client()
+    assert s3.s3_client() is first
+    assert first.meta.config.max_pool_connections == 50
+    assert first.meta.config.tcp_keepalive is True
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "key-2")
+    assert s3.s3_client() is not first
+    s3._cached_client.cache_clear()
+
+
+def test_startup_check_prewarms_the_shared_client(monkeypatch):
+    import app.main as m
+
+    built = []
+    monkeypatch.setattr(m.settings, "store_enroll_s3", True)
+    monkeypatch.setattr(m.settings, "s3_bucket", "bucket")
+    monkeypatch.setattr(m.boto3, "client", lambda *a, **kw: (_ for _ in ()).throw(RuntimeError("offline")))
+    monkeypatch.setattr(m, "s3_client", lambda: built.append(True))
+    m._s3_connectivity_check_worker()
+    assert built == [True]
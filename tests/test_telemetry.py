@@ -129,3 +129,67 @@ def test_telemetry_relay_accepts_valid_token(monkeypatch):
     )
     assert res.status_code == 202
     assert res.text == "ok"
+
+
+def test_telemetry_relay_reads_identity_and_dedupe_headers_in_one_pass(monkeypatch):
+    mod = _load_module()
+    seen = {}
+
+    def _fake_relay(**kw):
+        seen.update(kw)
+        return Response(status_code=202)
+
+    monkeypatch.setattr(mod, "_telemetry_relay_sync", _fake_relay)
+    res = TestClient(mod.app).post(
+        "/telemetry/v1/traces",
+        content=b"{}",
+        headers={
+            "Content-Type": "application/x-protobuf",
+            "User-Agent": "plugin/1.0",
+            "X-Plugin-UUID": " b9bdf6ad-3b1f-4f1a-9f07-4f8606c3fe5a ",
+            "X-Request-ID": "req-1",
+        },
+    )
+    assert res.status_code == 202
+    client_uuid = "b9bdf6ad-3b1f-4f1a-9f07-4f8606c3fe5a"
+    assert seen["client_uuid"] == client_uuid
+    assert seen["content_type"] == "application/x-protobuf"
+    assert seen["user_agent"] == "plugin/1.0"
+    assert seen["dedupe_key"] == f"telemetry:{client_uuid}:req-1"
+
+
+def test_telemetry_rejects_oversized_body_before_reading_it(monkeypatch):
+    mod = _load_module()
+    monkeypatch.setattr(mod, "TELEMETRY_MAX_BODY_BYTES", 64)
+    seen = []
+    real_read = mod._read_body_limited
+
+    async def spy(request, limit):
+        seen.append(limit)
+        return await real_read(request, limit)
+
+    monkeypatch.setattr(mod, "_read_body_limited", spy)
+    client = TestClient(mod.app)
+    res = client.post("/telemetry/v1/traces", content=b"{" + b" " * 100 + b"}",
+                      headers={"Content-Type": "application/json"})
+    assert res.status_code == 413
+    assert seen == [64]
+
+
+def test_telemetry_direct_path_persists_spans_after_the_response(monkeypatch):
+    import asyncio
+
+    mod = _load_module()
+    persisted = []
+    monkeypatch.setattr(mod, "_log_device_connection", lambda **kw: None)
+    monkeypatch.setattr(mod, "_enqueue_telemetry_payload", lambda **kw: (False, None))
+    monkeypatch.setattr(mod, "_forward_telemetry_to_upstream",
+                        lambda body, **kw: Response(content=b"{}", status_code=200))
+    monkeypatch.setattr(mod, "_persist_telemetry_spans", lambda body, uuid: persisted.append(uuid))
+    resp = mod._telemetry_relay_sync(
+        body=b"{}", content_type="application/json", user_agent=None,
+        client_uuid="u-1", dedupe_key=None, source_ip=None,
+    )
+    assert persisted == []
+    asyncio.run(resp.background())
+    assert persisted == ["u-1"]